@@ -0,0 +1,629 @@
+#!/usr/bin/env python3
+import argparse
+import copy
+import heapq
+import logging
+import pickle
+import random
+import socket
+import time
+from gen import generate_sudoku
+import src.p2p_loadbalancer as p2p_loadbalancer
+from src.p2p_loadbalancer import SudokuDynamicSplitter, PendingRanges, TaskID, WTManager
+from src.sudoku_algorithm import SudokuAlgorithm
+from src.sudoku_engine import ENGINES, get_engine
+from src.sudoku_job import SudokuJob
+from src.sudoku_space import SPACES
+from src.sudoku_filter import FILTERS
+from src.sudoku_canonical import canonicalize
+from src.sudoku_engine import solve_grid
+from src.p2p_protocol import P2PProtocol, P2PProtocolBadFormat
+from src.p2p_encoding import EncodingError, encode_message, decode_message, frame, encode_batch, VERSION, COMMAND_CODES, MAX_VARINT_SIZE
+from src.p2p_server import P2PServer
+from src.p2p_stats import StatsDeltas
+import src.p2p_gossip as p2p_gossip
+from src.p2p_gossip import Membership, GossipCounters, DEAD, log_size
+
+
+def build_corpus(size, empty_boxes, seed):
+    """Generate the same corpus of puzzles for a given seed."""
+    random.seed(seed)
+    return [generate_sudoku(empty_boxes).grid for _ in range(size)]
+
+
+def bench_engines(args):
+    """Compare the solver engines on the same corpus (whole range of each puzzle)."""
+    corpus = build_corpus(args.corpus, args.empty, args.seed)
+    engines = args.engines or list(ENGINES)
+
+    print(f"Corpus: {args.corpus} puzzles with {args.empty} empty cells (seed {args.seed}), {args.space} space")
+    for name in engines:
+        engine = get_engine(name)
+        solved = 0
+        begin = time.time()
+        for sudoku in corpus:
+            splitter = SudokuDynamicSplitter(copy.deepcopy(sudoku), 0, args.space)
+            job = SudokuJob(splitter.sudoku, splitter.start, splitter.end, SudokuAlgorithm(handicap=args.handicap), engine, args.space)
+            if job.solve() is not None:
+                solved += 1
+        elapsed = time.time() - begin
+        print(f"{name:>12}: {elapsed:10.4f}s total, {elapsed / len(corpus) * 1000:10.3f}ms/puzzle, solved {solved}/{len(corpus)}")
+
+
+def bench_spaces(args):
+    """Compare the number of combinations (validations) of each search space."""
+    corpus = build_corpus(args.corpus, args.empty, args.seed)
+
+    print(f"Corpus: {args.corpus} puzzles with {args.empty} empty cells (seed {args.seed})")
+    for name in SPACES:
+        combinations = 0
+        begin = time.time()
+        for sudoku in corpus:
+            splitter = SudokuDynamicSplitter(copy.deepcopy(sudoku), 0, name)
+            combinations += splitter.end - splitter.start
+        elapsed = time.time() - begin
+        print(f"{name:>12}: {combinations / len(corpus):14.4g} combinations/puzzle (built in {elapsed / len(corpus) * 1000:.3f}ms/puzzle)")
+
+
+def bench_validations(args):
+    """Validations per second of each engine over the same range of combinations."""
+    sudoku = build_corpus(1, args.empty, args.seed)[0]
+    splitter = SudokuDynamicSplitter(sudoku, 0, args.space)
+    end = min(splitter.start + args.range, splitter.end)
+
+    print(f"Range of {end - splitter.start} combinations of a puzzle with {args.empty} empty cells, {args.space} space, {args.prefilter} pre-filter")
+    for name in args.engines:
+        engine = get_engine(name, block_size=args.block_size)
+        job = SudokuJob(sudoku, splitter.start, end, SudokuAlgorithm(handicap=args.handicap), engine, args.space, prefilter=args.prefilter)
+        begin = time.time()
+        job.solve()
+        elapsed = time.time() - begin
+        print(f"{name:>12}: {elapsed:10.4f}s, {(end - splitter.start) / elapsed:14.1f} validations/s, {job.checks} checks")
+
+
+def random_symmetry(sudoku):
+    """Equivalent puzzle: relabelled digits, permuted bands/rows/stacks/columns and maybe transposed."""
+    digits = [0] + random.sample(range(1, 10), 9)
+    rows = [band * 3 + row for band in random.sample(range(3), 3) for row in random.sample(range(3), 3)]
+    cols = [stack * 3 + col for stack in random.sample(range(3), 3) for col in random.sample(range(3), 3)]
+    equivalent = [[digits[sudoku[r][c]] for c in cols] for r in rows]
+    if random.random() < 0.5:
+        equivalent = [[equivalent[r][c] for r in range(9)] for c in range(9)]
+    return equivalent
+
+
+def bench_canonical(args):
+    """Time of the canonicalization and how often equivalent puzzles get the same key."""
+    corpus = build_corpus(args.corpus, args.empty, args.seed)
+
+    same, elapsed = 0, 0
+    for sudoku in corpus:
+        key, _ = canonicalize(sudoku)
+        for _ in range(args.variants):
+            equivalent = random_symmetry(sudoku)
+            begin = time.time()
+            equivalent_key, _ = canonicalize(equivalent)
+            elapsed += time.time() - begin
+            same += equivalent_key == key
+
+    total = len(corpus) * args.variants
+    print(f"Corpus: {args.corpus} puzzles with {args.empty} empty cells (seed {args.seed}), {args.variants} equivalent puzzles each")
+    print(f"{elapsed / total * 1e6:10.1f}us/canonicalization, same key for {same}/{total} equivalent puzzles")
+
+
+def bench_ranges(args):
+    """Operations on many outstanding ranges: abandoned, answered by dead workers, carved and purged."""
+    random.seed(args.seed)
+    # disjoint ranges with gaps (not merged), abandoned in random order
+    ranges = [TaskID(start % args.sudokus, start * 10, start * 10 + random.randint(1, 9)) for start in range(args.ranges)]
+    random.shuffle(ranges)
+    answered = random.sample(ranges, len(ranges) // 10)
+
+    pending = PendingRanges()
+    timings = []
+
+    begin = time.time()
+    for task_id in ranges:
+        pending.add(task_id)
+    timings.append(("add", len(ranges), time.time() - begin))
+
+    begin = time.time()
+    for task_id in answered:
+        pending.remove(task_id)
+    timings.append(("remove", len(answered), time.time() - begin))
+
+    begin = time.time()
+    taken = 0
+    while len(pending) > args.ranges // 2:
+        pending.take(args.task_size)
+        taken += 1
+    timings.append(("take", taken, time.time() - begin))
+
+    begin = time.time()
+    for sudoku_id in range(args.sudokus):
+        pending.purge(sudoku_id)
+    timings.append(("purge", args.sudokus, time.time() - begin))
+
+    print(f"{args.ranges} outstanding ranges of {args.sudokus} sudokus")
+    for name, operations, elapsed in timings:
+        print(f"{name:>12}: {operations:8d} operations, {elapsed / max(operations, 1) * 1e6:10.2f}us/operation")
+
+
+def bench_scheduling(args):
+    """Cost of assigning tasks to the best ready workers as the cluster grows."""
+    random.seed(args.seed)
+    sudoku = build_corpus(1, 40, args.seed)[0]
+
+    print(f"{args.rounds} scheduling rounds (every worker gets a task and replies)")
+    for size in args.workers:
+        manager = WTManager(logging.getLogger("benchmark"))
+        workers = [manager.add_worker(f"worker:{port}", socket=None) for port in range(size)]
+        manager.add_pending_task(sudoku)
+
+        assigned, elapsed = 0, 0
+        for _ in range(args.rounds):
+            begin = time.time()
+            tasks = manager.get_tasks_to_send()
+            elapsed += time.time() - begin
+            assigned += len(tasks)
+
+            # every worker replies (with a new response time)
+            for task in tasks:
+                manager.finish_task(task.task_id, worker_time=random.random())
+                task.worker.task_response_time = random.random()
+
+        print(f"{size:8d} workers: {elapsed / assigned * 1e6:10.2f}us/task")
+
+
+class SimulatedClock:
+    """Replaces the time module of the load balancer (or the gossip) in the simulations."""
+
+    def __init__(self):
+        self.now = 0.0
+
+    def time(self) -> float:
+        return self.now
+
+
+def bench_sizing(args):
+    """Deterministic simulation of the task sizing: workers with different rates solve a sudoku
+    (optionally the first worker slows down at the end, a straggler for the speculative copies)."""
+    random.seed(args.seed)
+    clock = SimulatedClock()
+    p2p_loadbalancer.time = clock # the load balancer only reads the time, the events set it
+
+    manager = WTManager(logging.getLogger("benchmark"), task_time=args.task_time)
+    workers = [manager.add_worker(f"worker:{port}", socket=None) for port in range(len(args.rates))]
+    rates = {worker: rate for worker, rate in zip(workers, args.rates)}
+    if args.calibrated:
+        for worker in workers:
+            worker.calibrate(rates[worker])
+    if args.no_backups:
+        manager.get_backup_tasks = lambda: []
+    sudoku = manager.get_sudoku(manager.add_pending_task(build_corpus(1, args.empty, args.seed)[0]))
+    first, total = sudoku.start, sudoku.end - sudoku.start
+
+    # worker -> time it is busy until, events: (reply time, order, task id, seconds in the worker)
+    busy_until = {worker: 0.0 for worker in workers}
+    events, order = [], 0
+    durations = {worker: [] for worker in workers}
+    last_reply = {worker: 0.0 for worker in workers}
+    counted, backups = 0, 0
+
+    while not manager.isDone():
+        isTail = sudoku.start - first >= 0.9 * total
+        for task in manager.get_tasks_to_send():
+            worker = task.worker
+            backups += task.task_id in manager.backup_tasks and manager.backup_tasks[task.task_id] is task
+            arrival = clock.now + args.rtt / 2
+            service = (task.task_id.end - task.task_id.start) / rates[worker] * (1 + random.uniform(-args.jitter, args.jitter))
+            if isTail and worker is workers[0]:
+                service *= args.straggler
+            start = max(arrival, busy_until[worker])
+            busy_until[worker] = start + service
+            order += 1
+            heapq.heappush(events, (busy_until[worker] + args.rtt / 2, order, task.task_id, busy_until[worker] - arrival, worker))
+            durations[worker].append(service)
+
+        if not events:
+            break
+        clock.now, _, task_id, worker_time, worker = heapq.heappop(events)
+        manager.finish_task(task_id, worker_time=worker_time, worker=worker)
+        if not manager.is_lost_reply(worker.worker_address, task_id):
+            counted += task_id.end - task_id.start
+        last_reply[worker] = clock.now
+        manager.pop_done_sudokus()
+
+    p2p_loadbalancer.time = time
+    ideal = total / sum(args.rates)
+    print(f"{total} combinations, {len(workers)} workers, target task time {args.task_time}s, round trip {args.rtt}s, jitter {args.jitter}")
+    biases = {}
+    for worker in workers:
+        tasks = durations[worker]
+        steady = tasks[len(tasks) // 4:len(tasks) * 3 // 4] or tasks # without the start and the tail
+        error = sum(abs(duration - args.task_time) for duration in steady) / len(steady) / args.task_time # includes the jitter
+        biases[worker] = sum(steady) / len(steady) / args.task_time - 1 # the jitter averages out
+        print(f"{worker.worker_address:>10}: rate {rates[worker]:>9.0f} (estimated {worker.rate or 0:>9.0f}), {len(tasks):4d} tasks, "
+              f"first {', '.join(f'{duration:.3f}s' for duration in tasks[:3])}, steady error {error * 100:5.1f}% (bias {biases[worker] * 100:+5.1f}%), last reply {last_reply[worker]:8.2f}s")
+    print(f"Makespan {clock.now:.2f}s (ideal {ideal:.2f}s), last replies spread {max(last_reply.values()) - min(last_reply.values()):.2f}s")
+    print(f"{backups} speculative copies, {counted} validations counted ({counted - total:+d} against the range)")
+
+    assert counted == total, "the range was not counted exactly once"
+    for worker, bias in biases.items():
+        assert abs(bias) <= args.tolerance, f"{worker.worker_address} did not converge to the target task time (bias {bias * 100:+.1f}%)"
+    print(f"Task times converged to {args.task_time}s (bias within {args.tolerance * 100:.0f}%)")
+
+
+def bench_concurrency(args):
+    """Deterministic simulation of concurrent requests: a hard sudoku and easy ones submitted right after it
+    (completion time of each one, sharing the workers round robin or in arrival order)."""
+    random.seed(args.seed)
+    clock = SimulatedClock()
+    p2p_loadbalancer.time = clock
+
+    manager = WTManager(logging.getLogger("benchmark"))
+    workers = [manager.add_worker(f"worker:{port}", socket=None) for port in range(len(args.rates))]
+    rates = {worker: rate for worker, rate in zip(workers, args.rates)}
+    for worker in workers:
+        worker.calibrate(rates[worker])
+    if args.fifo:
+        manager.next_sudoku = lambda sudokus: sudokus[0] # the oldest sudoku with tasks first
+    hard = manager.add_pending_task(build_corpus(1, args.empty, args.seed)[0])
+    easy = [manager.add_pending_task(sudoku) for sudoku in build_corpus(args.requests, args.easy_empty, args.seed + 1)]
+
+    busy_until = {worker: 0.0 for worker in workers}
+    events, order = [], 0
+    done = {}
+    while not manager.isDone():
+        for task in manager.get_tasks_to_send():
+            worker = task.worker
+            arrival = clock.now + args.rtt / 2
+            service = (task.task_id.end - task.task_id.start) / rates[worker]
+            start = max(arrival, busy_until[worker])
+            busy_until[worker] = start + service
+            order += 1
+            heapq.heappush(events, (busy_until[worker] + args.rtt / 2, order, task.task_id, busy_until[worker] - arrival, worker))
+
+        if not events:
+            break
+        clock.now, _, task_id, worker_time, worker = heapq.heappop(events)
+        manager.finish_task(task_id, worker_time=worker_time, worker=worker)
+        for sudoku in manager.pop_done_sudokus():
+            done[sudoku.sudoku_id] = clock.now
+
+    p2p_loadbalancer.time = time
+    easy_times = sorted(done[sudoku_id] for sudoku_id in easy)
+    print(f"{len(workers)} workers, 1 sudoku with {args.empty} empty cells and {args.requests} with {args.easy_empty}, {'arrival order' if args.fifo else 'round robin'}")
+    print(f"Hard sudoku done at {done[hard]:.2f}s")
+    if easy_times:
+        print(f"Easy sudokus done: first {easy_times[0]:.2f}s, median {easy_times[len(easy_times) // 2]:.2f}s, last {easy_times[-1]:.2f}s")
+
+
+def sample_messages(nodes, cache_entries, seed):
+    """One message of each type, the flooding ones with `nodes` nodes and `cache_entries` solved puzzles."""
+    random.seed(seed)
+    sudokus = build_corpus(max(1, cache_entries), 10, seed)
+    sudoku = sudokus[0]
+    values = solve_grid(sudoku)
+    solution = [values[r * 9:(r + 1) * 9] for r in range(9)]
+    addresses = [f"10.0.{i // 256}.{i % 256}:7000" for i in range(nodes)]
+    sender = "10.1.0.1:7000"
+    task_id = TaskID(12, 1111111111, 1111150000)
+
+    pending_stats = {"all": {"solved": 120, "internal_solved": 3, "invalid": 7, "internal_invalid": 0}}
+    workers_stats = [{"address": address, "validations": random.randint(0, 10**9), "internal_validations": random.randint(0, 10**6),
+                      "checks": random.randint(0, 10**4), "internal_checks": random.randint(0, 100)} for address in addresses]
+    stats = {"all": {"solved": 123, "invalid": 7}, "nodes": [{"address": address, "validations": random.randint(0, 10**9), "checks": random.randint(0, 10**4)} for address in addresses]}
+    cache = [(puzzle, [values[r * 9:(r + 1) * 9] for r in range(9)] if i % 2 == 0 else None) for i, puzzle in enumerate(sudokus[:cache_entries])]
+    sparse = build_corpus(1, 72, seed)[0] # its digits range (9^72) goes far beyond 64 bits
+
+    return [
+        P2PProtocol.flooding_hello(sender, addresses, pending_stats, workers_stats, 4, cache, 35123.5),
+        P2PProtocol.flooding_confirmation(sender, stats),
+        P2PProtocol.join_request(sender),
+        P2PProtocol.join_reply(addresses, 35123.5),
+        P2PProtocol.join_reply([], None),
+        P2PProtocol.solve_request(sender, task_id, sudoku, "candidates"),
+        P2PProtocol.solve_request(sender, TaskID(14, 9**72 - 9**70, 9**72), sparse, "digits"),
+        P2PProtocol.solve_reply(sender, task_id, solution, 38889, 12, 0.734),
+        P2PProtocol.solve_reply(sender, task_id, validations=38889, checks=0, elapsed=None),
+        P2PProtocol.solve_progress(sender, [(task_id, 1111120000, 31), (TaskID(13, 5, 900), 400, 0)]),
+        P2PProtocol.cancel(sender, 12),
+        P2PProtocol.cancel(sender, 12, task_id),
+        P2PProtocol.gossip(sender, False, False, [{"address": address, "incarnation": 1760000000 + i, "state": ["alive", "suspect", "dead"][i % 3], "cores": 4, "rate": 35123.5 if i % 2 else None} for i, address in enumerate(addresses[:32])],
+                           [{"owner": f"{address}@1760000000", "version": 7, "solved": 3, "invalid": 1, "nodes": stats["nodes"][:3]} for address in addresses[:32]], cache),
+        P2PProtocol.gossip(sender, True, True, [], []),
+    ]
+
+
+def bench_wire(args):
+    """Round trip checks of the binary encoding of every message type, and its size and speed against pickle."""
+    messages = sample_messages(args.nodes, args.cache, args.seed)
+
+    # round trips (and truncated payloads are rejected)
+    for msg in messages:
+        payload = encode_message(msg.data)
+        assert decode_message(payload) == msg.data, f"{msg.data['command']} does not round trip"
+        for size in range(0, len(payload), max(1, len(payload) // 100)): # (some of the) truncated payloads
+            try:
+                decode_message(payload[:size])
+                raise AssertionError(f"Truncated {msg.data['command']} was decoded")
+            except EncodingError:
+                pass
+    # varints longer than MAX_VARINT_SIZE bytes are rejected (the count of a BATCH)
+    try:
+        decode_message(bytes([VERSION, COMMAND_CODES["BATCH"], 0]) + b"\x80" * MAX_VARINT_SIZE + b"\x01")
+        raise AssertionError("Varint too long was decoded")
+    except EncodingError:
+        pass
+    # a batch of every message (and a batch inside a batch is rejected)
+    batch = encode_batch([msg.to_bytes() for msg in messages])
+    assert [msg.data for msg in P2PProtocol.decode_msgs(batch)] == [msg.data for msg in messages], "BATCH does not round trip"
+    try:
+        P2PProtocol.decode_msgs(encode_batch([batch]))
+        raise AssertionError("Nested BATCH was decoded")
+    except P2PProtocolBadFormat:
+        pass
+    print(f"Round trips: {len(messages)} messages and their BATCH OK (flooding with {args.nodes} nodes and {args.cache} cache entries)")
+
+    print(f"{'message':>22} {'pickle':>14} {'binary':>14} {'pickle':>12} {'binary':>12}")
+    for msg in messages:
+        timings = []
+        for encode, decode in [(pickle.dumps, pickle.loads), (encode_message, decode_message)]:
+            begin = time.time()
+            for _ in range(args.rounds):
+                payload = encode(msg.data)
+                decode(payload)
+            timings.append((len(payload), (time.time() - begin) / args.rounds * 1e6))
+        (pickle_size, pickle_time), (binary_size, binary_time) = timings
+        print(f"{msg.data['command']:>22} {pickle_size:>8d} bytes {binary_size:>8d} bytes {pickle_time:>9.2f}us {binary_time:>9.2f}us")
+
+
+def bench_stream(args):
+    """Messages per second through a local P2PServer connection (with the messages split in chunks of `-k` bytes, or `-b` per frame)."""
+    server = P2PServer(logging.getLogger("benchmark"), "127.0.0.1", 0)
+    server.start()
+    messages = sample_messages(args.nodes, 0, args.seed)
+    messages = [messages[i % len(messages)] for i in range(args.messages)]
+
+    client = socket.create_connection(server._socket.getsockname())
+    client.setblocking(False)
+    begin = time.time()
+    if args.chunk > 0:
+        # the frames cut at arbitrary places (short reads of the server)
+        data = b"".join(frame(msg.to_bytes()) for msg in messages)
+        client.setblocking(True)
+        for offset in range(0, len(data), args.chunk):
+            client.sendall(data[offset:offset + args.chunk])
+    elif args.batch > 1:
+        # the way the node sends the messages of a loop iteration to a peer
+        payloads = [msg.to_bytes() for msg in messages]
+        for offset in range(0, len(payloads), args.batch):
+            server.send_batch(client, payloads[offset:offset + args.batch])
+    else:
+        for msg in messages:
+            server.send(client, msg) # the rest is queued when the socket is full
+
+    for msg in messages:
+        received = server.request_queue.get(timeout=10)
+        assert received.data == msg.data, f"{msg.data['command']} arrived different"
+    elapsed = time.time() - begin
+    client.close()
+    print(f"{args.messages} messages in order in {elapsed:.2f}s: {args.messages / elapsed:.0f} messages/s")
+
+
+def bench_flooding(args):
+    """Bytes of the flooding hellos between two peers, full lists vs deltas (checks the rebuilt lists)."""
+    random.seed(args.seed)
+    pending_stats = {"all": {"solved": 0, "internal_solved": 0, "invalid": 0, "internal_invalid": 0}}
+    workers_stats = [{"address": f"10.0.{i // 256}.{i % 256}:7000", "validations": 0, "internal_validations": 0, "checks": 0, "internal_checks": 0} for i in range(args.nodes)]
+    sender, receiver = StatsDeltas(), StatsDeltas()
+    full_bytes, delta_bytes, resyncs = 0, 0, 0
+
+    for round in range(args.rounds):
+        if round == args.restart:
+            receiver = StatsDeltas() # the peer restarted (without joining again)
+
+        # the entries of a few nodes change in each round
+        for st_info in workers_stats:
+            st_info["validations"] += st_info["internal_validations"]
+            st_info["internal_validations"] = 0
+        for st_info in random.sample(workers_stats, min(args.changed, len(workers_stats))):
+            st_info["internal_validations"] = random.randint(1, 10**6)
+
+        full = P2PProtocol.flooding_hello("10.1.0.1:7000", [], pending_stats.copy(), workers_stats)
+        sync, changed = sender.delta("peer", workers_stats)
+        msg = P2PProtocol.flooding_hello("10.1.0.1:7000", [], pending_stats.copy(), changed, sync=sync)
+        full_bytes += len(full.to_bytes())
+        delta_bytes += len(msg.to_bytes())
+
+        data = decode_message(msg.to_bytes())
+        nodes = receiver.merge("sender", data["args"]["sync"], data["args"]["stats"]["nodes"])
+        if receiver.last_received["sender"] == 0:
+            resyncs += 1 # diverged, the next hello is a full list
+        else:
+            key = lambda st_info: st_info["address"]
+            assert sorted(nodes, key=key) == sorted(workers_stats, key=key), f"Round {round}: wrong rebuilt list"
+
+        # the hello of the peer acknowledges the last version
+        peer_sync, _ = receiver.delta("sender", [])
+        sender.merge("peer", peer_sync, [])
+
+    print(f"{args.rounds} rounds, {args.nodes} nodes, {args.changed} changed per round: full {full_bytes / args.rounds:.0f} bytes/hello, deltas {delta_bytes / args.rounds:.0f} bytes/hello ({resyncs} resyncs)")
+
+
+def bench_gossip(args):
+    """Deterministic simulation of the gossip mode: the nodes join through the first one, every node counts a
+    solved sudoku and the last node dies. Rounds until every node agrees, and messages/bytes per node and round."""
+    random.seed(args.seed)
+    clock = SimulatedClock()
+    p2p_gossip.time = clock # the membership only reads the time
+
+    addresses = [f"10.0.{i // 256}.{i % 256}:7000" for i in range(args.nodes)]
+    members = {address: Membership(address) for address in addresses}
+    counters = {address: GossipCounters(address) for address in addresses}
+    alive = set(addresses)
+    messages, total_bytes = 0, 0
+
+    def send(sender, receiver, reply, full):
+        nonlocal messages, total_bytes
+        msg = P2PProtocol.gossip(sender, reply, full, members[sender].piggyback(args.piggyback, full),
+                                 counters[sender].piggyback(args.piggyback, members[sender].retransmit_limit(), full))
+        messages += 1
+        total_bytes += len(frame(msg.to_bytes()))
+        members[receiver].answered(sender)
+        for member in msg.data["args"]["members"]:
+            members[receiver].apply(member)
+        counters[receiver].merge(msg.data["args"]["counters"])
+
+    def exchange(sender, receiver, full=False):
+        members[sender].probe_sent(receiver)
+        if receiver in alive:
+            send(sender, receiver, False, full)
+            send(receiver, sender, True, full)
+
+    for address in addresses[1:]:
+        exchange(address, addresses[0], full=True) # join (everything with the anchor)
+    for address in addresses:
+        counters[address].add(1, 0, {address: {"validations": 1000, "checks": 1}})
+
+    victim = addresses[-1]
+    joined = counted = detected = None
+    for round in range(1, args.rounds + 1):
+        clock.now = float(round)
+        if round == args.kill:
+            alive.discard(victim)
+        for address in sorted(alive):
+            membership = members[address]
+            membership.check_timeouts(2, 3 * log_size(membership.size()))
+            fanout = args.fanout or log_size(membership.size())
+            for i, peer in enumerate(membership.select_peers(fanout)):
+                exchange(address, peer, full=(i == 0 and round % 10 == 0))
+
+        everyone = [address for address in alive if address != victim]
+        if joined is None and all(len(members[address].members) == args.nodes for address in everyone):
+            joined = round
+        if counted is None and all(counters[address].totals()[0] == args.nodes for address in everyone):
+            counted = round
+        if detected is None and round >= args.kill and all(members[address].state(victim) == DEAD for address in everyone):
+            detected = round
+        if joined and counted and detected:
+            break
+
+    p2p_gossip.time = time
+    fanout = args.fanout or log_size(args.nodes)
+    print(f"{args.nodes} nodes, fanout {fanout}: membership after {joined} rounds, stats after {counted} rounds, "
+          f"dead node detected by everyone {detected - args.kill if detected else None} rounds after its death")
+    print(f"{messages / round / len(alive):.1f} messages and {total_bytes / round / len(alive):.0f} bytes per node and round "
+          f"(the flooding sends {2 * (args.nodes - 1)} messages per node and round)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+                    prog='benchmark.py',
+                    description='Local benchmarks of the node components')
+    subparsers = parser.add_subparsers(dest="benchmark", required=True)
+
+    engines_parser = subparsers.add_parser("engines", help="Compare the solver engines")
+    engines_parser.add_argument("-e", "--engines", nargs="*", choices=list(ENGINES), help="Engines to compare (default all)")
+    engines_parser.add_argument("-n", "--empty", type=int, help="Empty cells per puzzle", default=3)
+    engines_parser.add_argument("-c", "--corpus", type=int, help="Number of puzzles", default=5)
+    engines_parser.add_argument("-s", "--seed", type=int, help="Corpus seed", default=42)
+    engines_parser.add_argument("-d", "--handicap", type=float, help="Handicap of SudokuAlgorithm", default=1)
+    engines_parser.add_argument("-r", "--space", type=str, choices=list(SPACES), help="Search space of the tasks", default="digits")
+    engines_parser.set_defaults(func=bench_engines)
+
+    spaces_parser = subparsers.add_parser("spaces", help="Compare the search spaces sizes")
+    spaces_parser.add_argument("-n", "--empty", type=int, help="Empty cells per puzzle", default=10)
+    spaces_parser.add_argument("-c", "--corpus", type=int, help="Number of puzzles", default=20)
+    spaces_parser.add_argument("-s", "--seed", type=int, help="Corpus seed", default=42)
+    spaces_parser.set_defaults(func=bench_spaces)
+
+    validations_parser = subparsers.add_parser("validations", help="Compare the validations per second of the enumerators")
+    validations_parser.add_argument("-e", "--engines", nargs="*", choices=list(ENGINES), help="Engines to compare", default=["reference", "vectorized"])
+    validations_parser.add_argument("-n", "--empty", type=int, help="Empty cells of the puzzle", default=20)
+    validations_parser.add_argument("-R", "--range", type=int, help="Combinations to validate", default=100000)
+    validations_parser.add_argument("-b", "--block_size", type=int, help="Combinations per block of the vectorized engine", default=4096)
+    validations_parser.add_argument("-s", "--seed", type=int, help="Puzzle seed", default=42)
+    validations_parser.add_argument("-d", "--handicap", type=float, help="Handicap of SudokuAlgorithm", default=1)
+    validations_parser.add_argument("-r", "--space", type=str, choices=list(SPACES), help="Search space of the range", default="digits")
+    validations_parser.add_argument("-x", "--prefilter", type=str, choices=list(FILTERS), help="Pre-filter of the candidates", default="none")
+    validations_parser.set_defaults(func=bench_validations)
+
+    canonical_parser = subparsers.add_parser("canonical", help="Microbenchmark of the puzzle canonicalization")
+    canonical_parser.add_argument("-n", "--empty", type=int, help="Empty cells per puzzle", default=40)
+    canonical_parser.add_argument("-c", "--corpus", type=int, help="Number of puzzles", default=20)
+    canonical_parser.add_argument("-v", "--variants", type=int, help="Equivalent puzzles of each puzzle", default=10)
+    canonical_parser.add_argument("-s", "--seed", type=int, help="Corpus seed", default=42)
+    canonical_parser.set_defaults(func=bench_canonical)
+
+    ranges_parser = subparsers.add_parser("ranges", help="Microbenchmark of the pending ranges set")
+    ranges_parser.add_argument("-n", "--ranges", type=int, help="Outstanding ranges", default=100000)
+    ranges_parser.add_argument("-u", "--sudokus", type=int, help="Sudokus of the ranges", default=10)
+    ranges_parser.add_argument("-t", "--task_size", type=int, help="Combinations per carved task", default=4)
+    ranges_parser.add_argument("-s", "--seed", type=int, help="Ranges seed", default=42)
+    ranges_parser.set_defaults(func=bench_ranges)
+
+    scheduling_parser = subparsers.add_parser("scheduling", help="Microbenchmark of the task assignment")
+    scheduling_parser.add_argument("-w", "--workers", type=int, nargs="*", help="Cluster sizes", default=[10, 100, 1000])
+    scheduling_parser.add_argument("-R", "--rounds", type=int, help="Scheduling rounds", default=100)
+    scheduling_parser.add_argument("-s", "--seed", type=int, help="Puzzle seed", default=42)
+    scheduling_parser.set_defaults(func=bench_scheduling)
+
+    sizing_parser = subparsers.add_parser("sizing", help="Deterministic simulation of the task sizing controller")
+    sizing_parser.add_argument("-r", "--rates", type=float, nargs="*", help="Validations per second of each worker", default=[20000, 50000, 200000])
+    sizing_parser.add_argument("-g", "--task_time", type=float, help="Target duration of the tasks", default=0.75)
+    sizing_parser.add_argument("-t", "--rtt", type=float, help="Round trip of the messages", default=0.02)
+    sizing_parser.add_argument("-j", "--jitter", type=float, help="Relative noise of the task durations", default=0.1)
+    sizing_parser.add_argument("-n", "--empty", type=int, help="Empty cells of the puzzle", default=8)
+    sizing_parser.add_argument("-S", "--straggler", type=float, help="Slowdown of the first worker in the last 10%% of the range", default=1)
+    sizing_parser.add_argument("-B", "--no_backups", action="store_true", help="Disable the speculative copies of the slow tasks")
+    sizing_parser.add_argument("-c", "--calibrated", action="store_true", help="Seed the workers with their rate (startup calibration)")
+    sizing_parser.add_argument("-T", "--tolerance", type=float, help="Maximum relative bias of the steady task times", default=0.1)
+    sizing_parser.add_argument("-s", "--seed", type=int, help="Simulation seed", default=42)
+    sizing_parser.set_defaults(func=bench_sizing)
+
+    concurrency_parser = subparsers.add_parser("concurrency", help="Deterministic simulation of concurrent requests")
+    concurrency_parser.add_argument("-r", "--rates", type=float, nargs="*", help="Validations per second of each worker", default=[20000, 50000, 200000])
+    concurrency_parser.add_argument("-n", "--empty", type=int, help="Empty cells of the hard puzzle", default=8)
+    concurrency_parser.add_argument("-e", "--easy_empty", type=int, help="Empty cells of the easy puzzles", default=4)
+    concurrency_parser.add_argument("-q", "--requests", type=int, help="Easy puzzles submitted after the hard one", default=20)
+    concurrency_parser.add_argument("-t", "--rtt", type=float, help="Round trip of the messages", default=0.02)
+    concurrency_parser.add_argument("-f", "--fifo", action="store_true", help="Serve the sudokus in arrival order (no sharing)")
+    concurrency_parser.add_argument("-s", "--seed", type=int, help="Simulation seed", default=42)
+    concurrency_parser.set_defaults(func=bench_concurrency)
+
+    wire_parser = subparsers.add_parser("wire", help="Round trips and microbenchmark of the binary message encoding against pickle")
+    wire_parser.add_argument("-n", "--nodes", type=int, help="Nodes in the flooding messages", default=100)
+    wire_parser.add_argument("-c", "--cache", type=int, help="Solved puzzles piggybacked on the flooding hello", default=5)
+    wire_parser.add_argument("-R", "--rounds", type=int, help="Encodings and decodings of each message", default=2000)
+    wire_parser.add_argument("-s", "--seed", type=int, help="Messages seed", default=42)
+    wire_parser.set_defaults(func=bench_wire)
+
+    stream_parser = subparsers.add_parser("stream", help="Messages per second through a local P2P server connection")
+    stream_parser.add_argument("-m", "--messages", type=int, help="Messages to send", default=20000)
+    stream_parser.add_argument("-n", "--nodes", type=int, help="Nodes in the flooding messages", default=10)
+    stream_parser.add_argument("-k", "--chunk", type=int, help="Send the frames in chunks of this size (0 sends whole messages)", default=0)
+    stream_parser.add_argument("-b", "--batch", type=int, help="Messages per frame (BATCH)", default=1)
+    stream_parser.add_argument("-s", "--seed", type=int, help="Messages seed", default=42)
+    stream_parser.set_defaults(func=bench_stream)
+
+    flooding_parser = subparsers.add_parser("flooding", help="Bytes of the flooding hellos with full lists and with deltas")
+    flooding_parser.add_argument("-n", "--nodes", type=int, help="Nodes in the stats", default=100)
+    flooding_parser.add_argument("-R", "--rounds", type=int, help="Flooding rounds", default=50)
+    flooding_parser.add_argument("-k", "--changed", type=int, help="Nodes with new validations per round", default=5)
+    flooding_parser.add_argument("-x", "--restart", type=int, help="Round where the peer restarts (-1 never)", default=-1)
+    flooding_parser.add_argument("-s", "--seed", type=int, help="Stats seed", default=42)
+    flooding_parser.set_defaults(func=bench_flooding)
+
+    gossip_parser = subparsers.add_parser("gossip", help="Deterministic simulation of the gossip mode (convergence and traffic)")
+    gossip_parser.add_argument("-n", "--nodes", type=int, help="Nodes", default=200)
+    gossip_parser.add_argument("-f", "--fanout", type=int, help="Members per round (0: log2 of the members)", default=0)
+    gossip_parser.add_argument("-p", "--piggyback", type=int, help="Updates of each kind per message", default=32)
+    gossip_parser.add_argument("-k", "--kill", type=int, help="Round where the last node dies", default=20)
+    gossip_parser.add_argument("-R", "--rounds", type=int, help="Maximum rounds", default=200)
+    gossip_parser.add_argument("-s", "--seed", type=int, help="Simulation seed", default=42)
+    gossip_parser.set_defaults(func=bench_gossip)
+
+    args = parser.parse_args()
+    args.func(args)
@@ -1,7 +1,11 @@
 #!/usr/bin/env python3
 import argparse
+import os
 import src.utils.network as utils_network
 from src.node import Node
+from src.sudoku_engine import ENGINES
+from src.sudoku_space import SPACES
+from src.sudoku_filter import FILTERS
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(
@@ -14,6 +18,16 @@ if __name__ == "__main__":
     parser.add_argument("-d", "--handicap", type=float, help="Handicap for the node", default=1)
     parser.add_argument("-l", "--localhost", action="store_true", help="Run on localhost", default=False)
     parser.add_argument("-t", "--http_threads", type=int, help="HTTP number of threads", default=5)
+    parser.add_argument("-e", "--engine", type=str, choices=list(ENGINES), help="Solver engine of the node", default="reference")
+    parser.add_argument("-r", "--space", type=str, choices=list(SPACES), help="Search space of the tasks split by the node", default="digits")
+    parser.add_argument("-b", "--block_size", type=int, help="Combinations per block of the vectorized engine", default=4096)
+    parser.add_argument("-w", "--cores", type=int, help="Worker processes for the received tasks (0 uses every core)", default=1)
+    parser.add_argument("-c", "--cache_size", type=int, help="Solved puzzles kept in the cache (0 disables it)", default=1000)
+    parser.add_argument("-x", "--prefilter", type=str, choices=list(FILTERS), help="Pre-filter of the candidates before the throttled check", default="none")
+    parser.add_argument("-k", "--calibration", type=float, help="Seconds of the startup benchmark that sizes the first tasks (0 disables it)", default=0.5)
+    parser.add_argument("-g", "--task_time", type=float, help="Target duration of the tasks sent to the workers (seconds)", default=0.75)
+    parser.add_argument("-f", "--store", type=str, help="File of the persistent solved puzzles store", default=None)
+    parser.add_argument("-G", "--gossip", type=int, nargs="?", const=0, help="Gossip mode with this fanout instead of the full mesh flooding (0 or no value: log2 of the members)", default=None)
 
     args = parser.parse_args()
 
@@ -22,8 +36,10 @@ if __name__ == "__main__":
     else:
         host = utils_network.get_ip_address()
 
+    cores = args.cores if args.cores > 0 else os.cpu_count()
+
     try:
-        node = Node(host, args.http_port, args.p2p_port, args.anchor, args.handicap, args.http_threads)
+        node = Node(host, args.http_port, args.p2p_port, args.anchor, args.handicap, args.http_threads, args.engine, args.space, args.block_size, cores, args.cache_size, args.store, args.prefilter, args.calibration, args.task_time, args.gossip)
         node.run()
     except KeyboardInterrupt as e:
         print("\nExiting...")
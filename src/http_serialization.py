@@ -10,10 +10,15 @@ class HttpSerialization:
         content_type = headers.get('Content-Type', 'application/json')
         if 'application/xml' in content_type:
             # Try to parse the XML data
-            return parse_xml(data)['sudoku']
+            sudoku = parse_xml(data)['sudoku']
         else:
             # Try to parse the JSON data
-            return json.loads(data)['sudoku']
+            sudoku = json.loads(data)['sudoku']
+
+        # 9 rows of 9 digits (0 is an empty cell)
+        if not isinstance(sudoku, list) or len(sudoku) != 9 or any(not isinstance(row, list) or len(row) != 9 or any(type(cell) is not int or not 0 <= cell <= 9 for cell in row) for row in sudoku):
+            raise ValueError("The sudoku must be 9 rows of 9 digits.")
+        return sudoku
         
     @staticmethod
     def format_response(headers, data):
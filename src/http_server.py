@@ -1,59 +1,63 @@
 import http.server as http_server
 import socketserver, socket, json
 from queue import Queue
-from threading import Lock, Thread
+from threading import Thread
 from src.sudoku_algorithm import SudokuAlgorithm
 from src.http_serialization import HttpSerialization
 
 class HTTPRequestHandler(http_server.BaseHTTPRequestHandler):
     request_queue = None
-    response_queue = None
     logger = None
     stats = None
     network = None
-    locker = None
+    cache = None
 
     # Suppress http console output (can be removed for debugging)
     def log_message(self, format, *args):
         return
 
     def do_POST(self):
-        with self.locker:  
-            if self.path.endswith("/solve"):
-                try:
-                    length = int(self.headers.get('Content-Length'))
-                    data = self.rfile.read(length).decode('utf8')
-
-                    sudoku = HttpSerialization.parse_request(self.headers, data)
- 
-                    self.logger.warning(f"HTTP request for {sudoku}.")
-                    
-                    # Put the request in the queue
-                    self.request_queue.put(sudoku)
+        if self.path.endswith("/solve"):
+            try:
+                length = int(self.headers.get('Content-Length'))
+                data = self.rfile.read(length).decode('utf8')
+
+                sudoku = HttpSerialization.parse_request(self.headers, data)
+
+                self.logger.warning(f"HTTP request for {sudoku}.")
+
+                # Answer from the cache (without waiting for the other requests)
+                hit, response = self.cache.get(sudoku)
+                if hit:
+                    self.logger.debug(f"HTTP response (cache).")
+                else:
+                    # Put the request in the queue, with its own response queue (requests are solved concurrently)
+                    response_queue = Queue(maxsize=1)
+                    self.request_queue.put((sudoku, response_queue))
 
                     # Wait for the response
-                    response = self.response_queue.get(block=True)
+                    response = response_queue.get(block=True)
                     self.logger.debug(f"HTTP response.")
-                    
-                    self.send_response(200)
-                    self.send_header('Content-type', 'text/html')
-                    self.end_headers()
-
-                    self.wfile.write(((f"\n\n\033[92m{'Solved!!'}\033[00m \n" + str(SudokuAlgorithm(response))) if response is not None else f"\n\n\033[91m{'Not found!'}\033[00m" + "\n").encode("utf8"))
                 
-                # Handle JSON errors    
-                except (json.JSONDecodeError, KeyError) as e:
-                    self.send_response(400)
-                    self.send_header('Content-type', 'text/html')
-                    self.end_headers()
-                    
-                    error_message = f"Invalid request format: {str(e)}\n"
-                    self.wfile.write(error_message.encode("utf8"))
-                    
-            else:
-                self.send_response(404)
+                self.send_response(200)
+                self.send_header('Content-type', 'text/html')
+                self.end_headers()
+
+                self.wfile.write(((f"\n\n\033[92m{'Solved!!'}\033[00m \n" + str(SudokuAlgorithm(response))) if response is not None else f"\n\n\033[91m{'Not found!'}\033[00m" + "\n").encode("utf8"))
+            
+            # Handle JSON/XML errors (and invalid sudokus)    
+            except (ValueError, KeyError) as e:
+                self.send_response(400)
+                self.send_header('Content-type', 'text/html')
                 self.end_headers()
-                self.wfile.write(b"404 Not Found\n")
+                
+                error_message = f"Invalid request format: {str(e)}\n"
+                self.wfile.write(error_message.encode("utf8"))
+                
+        else:
+            self.send_response(404)
+            self.end_headers()
+            self.wfile.write(b"404 Not Found\n")
     
     def do_GET(self):
         # Handle the stats request
@@ -77,29 +81,27 @@ class HTTPRequestHandler(http_server.BaseHTTPRequestHandler):
 
 
 class HTTPServerThread(Thread):
-    def __init__(self, logger, addr, sock, locker, request_queue, response_queue, stats, network):
+    def __init__(self, logger, addr, sock, request_queue, stats, network, cache):
         Thread.__init__(self)
         self.daemon = True # Exit when main thread exits
         self.logger = logger
         self.addr = addr
         self.sock = sock
-        self.locker = locker
         self.stats = stats
         self.network = network
+        self.cache = cache
 
         self.request_queue = request_queue
-        self.response_queue = response_queue
 
         self.start() # Start the thread
         
 
     def run(self):
         HTTPRequestHandler.request_queue = self.request_queue
-        HTTPRequestHandler.response_queue = self.response_queue
         HTTPRequestHandler.logger = self.logger
         HTTPRequestHandler.stats = self.stats
         HTTPRequestHandler.network = self.network
-        HTTPRequestHandler.locker = self.locker
+        HTTPRequestHandler.cache = self.cache
 
         self.server = http_server.HTTPServer(self.addr, HTTPRequestHandler, False) # Start the server
 
@@ -113,18 +115,17 @@ class HTTPServerThread(Thread):
 
 
 class HTTPServer():
-    def __init__(self, logger, host, port, stats, network, max_threads):
+    def __init__(self, logger, host, port, stats, network, max_threads, cache):
         self.logger = logger
         self.addr = (host, int(port))
         self.stats = stats
         self.network = network
-        self.locker = Lock()
+        self.cache = cache
 
         self.max_threads = max_threads
 
-        # Generate request and response http queues (THREAD SAFE!!)
+        # Generate request http queue (THREAD SAFE!!), each request has its response queue
         self.request_queue = Queue()
-        self.response_queue = Queue()
 
         # One socket for all threads
         self.sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
@@ -138,7 +139,7 @@ class HTTPServer():
         
         for i in range(self.max_threads):
             try:
-                HTTPServerThread(self.logger, self.addr, self.sock, self.locker, self.request_queue, self.response_queue, self.stats, self.network)
+                HTTPServerThread(self.logger, self.addr, self.sock, self.request_queue, self.stats, self.network, self.cache)
                 threads_count += f"\033[92m{'.'}\033[00m" # green
             except Exception as e:
                 threads_count += f"\033[91m{'X'}\033[00m" # red
@@ -1,15 +1,23 @@
 import selectors, time, socket, queue, pickle, sys
-from threading import Lock
-from src.p2p_loadbalancer import WTManager, Worker, TaskID
+from threading import Lock, Event
+from src.p2p_loadbalancer import WTManager, Worker, TaskID, WORKER_STATS
 from src.p2p_server import P2PServer
+from src.p2p_stats import StatsDeltas
+from src.p2p_gossip import Membership, GossipCounters, DEAD, log_size
 from src.http_server import HTTPServer
 from src.utils.logger import Logger
 from src.p2p_protocol import P2PProtocol 
 from src.sudoku_job import SudokuJob
+from src.sudoku_pool import SudokuJobPool
+from src.sudoku_cache import SudokuCache
+from src.sudoku_canonical import canonicalize
+from src.sudoku_store import SudokuStore
 from src.sudoku_algorithm import SudokuAlgorithm
+from src.sudoku_engine import get_engine
+from src.sudoku_calibration import measure_rate
 
 class Node:
-    def __init__(self, host, http_port, p2p_port, anchor, handicap, max_threads):
+    def __init__(self, host, http_port, p2p_port, anchor, handicap, max_threads, engine="reference", space="digits", block_size=4096, cores=1, cache_size=1000, store_path=None, prefilter="none", calibration=0.5, task_time=0.75, gossip=None):
 
         self.logger = Logger(f"[{host}]", f"logs/{host}.log")
         self.selector = selectors.DefaultSelector()
@@ -19,10 +27,11 @@ class Node:
             "all": {
                 "solved": 0, 
                 "invalid": 0, 
-                "validations": 0 # sum of nodes validations
+                "validations": 0, # sum of nodes validations (combinations covered)
+                "checks": 0 # sum of nodes checks (candidates that passed the pre-filter)
             },
             "nodes": [
-                # { "address": "host:port", "validations": 0}, ..
+                # { "address": "host:port", "validations": 0, "checks": 0}, ..
             ]
         }
         
@@ -38,25 +47,78 @@ class Node:
         self.network = {}
         
         self.isHandlingHTTP = False
+        self.http_replies = {} # sudoku_id -> (canonical key, [(response queue, transform of the requested puzzle)])
+        self.http_sudokus = {} # canonical key -> sudoku_id of the puzzles in progress (identical requests wait for the same search)
 
         self.handicap = handicap
 
         self.last_flooding = time.time()
         self.TIME_TO_FLOODING = 3 # in seconds
+        self.CONNECT_TIMEOUT = 2 # in seconds, a dead host does not stall the main loop
 
-        self.http_server = HTTPServer(self.logger, host, http_port, self.stats, self.network, max_threads)
+        # Messages of each peer sent together (one frame) at the end of the loop iteration
+        self.outbox = {}                # host_port -> [worker, encoded messages, bytes]
+        self.MAX_BATCH_SIZE = 64 * 1024 # bytes, a bigger batch is sent right away
+
+        # Stats entries of the flooding sent as deltas (only the entries changed since the version acknowledged by each peer)
+        self.hello_deltas = StatsDeltas()
+        self.confirmation_deltas = StatsDeltas()
+
+        store = SudokuStore(store_path) if store_path else None # solved puzzles on disk (read on the first lookup)
+        self.cache = SudokuCache(cache_size, store) # solved puzzles (shared with the peers)
+        self.stats["cache"] = self.cache.get_stats()
+
+        self.http_server = HTTPServer(self.logger, host, http_port, self.stats, self.network, max_threads, self.cache)
         self.p2p_server = P2PServer(self.logger, host, p2p_port)
         self.internal_solved_queue = queue.Queue() # 
         self.solving_locker = Lock()
 
+        # Cancellation of received tasks
+        self.running_jobs = {}          # (host_port, task_id) -> stop event of the job
+        self.cancelled_sudokus = {}     # (host_port, sudoku_id) -> time of the cancel
+        self.CANCELLED_TTL = 60 # in seconds
+
+        # Progress of the received tasks (the requester only assigns again the rest of a task if this node dies)
+        self.progress_jobs = {}         # (host_port, task_id) -> [job, progress already reported]
+        self.last_progress = time.time()
+        self.TIME_TO_PROGRESS = 1 # in seconds
+
         # Workers & Tasks Manager (load balancer)
-        self.wtManager = WTManager(self.logger)
+        self.wtManager = WTManager(self.logger, space, task_time)
         self.myWork = self.wtManager.add_worker(self.p2p_server.replyAddress, socket=None) # add itself as a worker
         self.myWork.Alive = False           # it is not alive, it is the node itself!
+        self.myWork.isLocal = True          # its tasks are solved in the background, like the received ones
         self.myWork.smoothing_factor = 0.9 # TODO: analysis!!!
         self.myWork.task_done()
 
         self.solverConfig = SudokuAlgorithm(logger= self.logger, handicap = self.handicap)
+        self.engine = get_engine(engine, block_size=block_size) # solver engine used by this node jobs
+        self.prefilter = prefilter # candidates rejected before the throttled check
+
+        # Validations per second of a core (advertised to the peers to size the first tasks)
+        self.rate = measure_rate(self.handicap, self.engine, space, self.prefilter, calibration) if calibration > 0 else None
+        if self.rate is not None:
+            self.logger.info(f"Calibrated: {self.rate:.1f} validations/s per core.")
+        elif calibration > 0:
+            self.logger.info(f"Not calibrated: the speed of the {engine} engine depends on the puzzle.")
+        self.myWork.calibrate(self.rate)
+
+        # Process pool for the received tasks (only with more than one core)
+        self.cores = cores
+        self.myWork.cores = cores
+        self.job_pool = SudokuJobPool(self.logger, cores, self.handicap, self.engine, self.prefilter) if cores > 1 else None
+
+        # Gossip mode (None: full mesh flooding): membership and stats counters gossiped with `fanout` members per round
+        self.gossip_fanout = gossip # 0: log2 of the members
+        self.membership = Membership(self.p2p_server.replyAddress, cores, self.rate) if gossip is not None else None
+        self.counters = GossipCounters(f"{self.p2p_server.replyAddress}@{self.membership.incarnation}") if gossip is not None else None
+        self.last_gossip = time.time()
+        self.gossip_rounds = 0
+        self.TIME_TO_GOSSIP = 1         # in seconds
+        self.PROBE_TIMEOUT = 2          # in seconds, a member that does not answer is suspected
+        self.SUSPICION_ROUNDS = 3       # times log2(N) rounds before a suspected member is dead
+        self.FULL_SYNC_ROUNDS = 10      # one exchange with everything every few rounds
+        self.MAX_PIGGYBACK = 32         # updates of each kind per message
     
 
     def connectWorker(self, host_port) -> Worker:
@@ -66,8 +128,10 @@ class Node:
 
             # create a socket connection
             sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            sock.settimeout(self.CONNECT_TIMEOUT)
             sock.connect((host_port.split(":")[0], int(host_port.split(":")[1])))
             sock.setblocking(False)
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1) # the messages are already batched, Nagle would only delay them
 
             # get worker
             worker = self.wtManager.workersDict.get(host_port)
@@ -85,18 +149,123 @@ class Node:
             return None 
 
     def send_msg(self, worker, msg):
-        """Send a message through a socket."""
+        """Queue a message to a peer (sent with the others of this loop iteration)."""
         host_port = worker.worker_address
         sock = worker.socket
+        if sock is None and self.membership is not None and worker is not self.myWork:
+            # gossip mode: the members are connected when a message is sent to them
+            worker = self.connectWorker(host_port)
+            sock = worker.socket if worker is not None else None
         if sock is None:
             return
 
         try:
-            P2PProtocol.send_msg(sock, msg)
-            self.logger.debug(f"P2P-sent: {msg.data['command']}")  
+            payload = msg.to_bytes()
         except Exception as e:
-            self.logger.error(f"Worker {host_port} is dead ({msg.data['command']}).")
-            self.wtManager.kill_worker(host_port, close_socket=True) # the worker is dead, kill the socket!
+            self.logger.error(f"Failed to encode {msg.data['command']} to {host_port}: {e}")
+            return
+        batch = self.outbox.setdefault(host_port, [worker, [], 0])
+        batch[1].append(payload)
+        batch[2] += len(payload)
+        self.logger.debug(f"P2P-queued: {msg.data['command']}")
+        if batch[2] >= self.MAX_BATCH_SIZE:
+            self.flushMessages(host_port)
+
+    def flushMessages(self, host_port=None):
+        """Send the queued messages of a peer (or of every peer), one frame per peer."""
+        for host_port in ([host_port] if host_port is not None else list(self.outbox)):
+            worker, payloads, _ = self.outbox.pop(host_port)
+            if worker.socket is None:
+                continue # killed after the messages were queued
+
+            try:
+                self.p2p_server.send_batch(worker.socket, payloads) # the rest is queued if the socket is full
+                self.logger.debug(f"P2P-sent: {len(payloads)} messages to {host_port}")
+            except Exception as e:
+                self.logger.error(f"Worker {host_port} is dead ({len(payloads)} messages).")
+                self.wtManager.kill_worker(host_port, close_socket=True) # the worker is dead, kill the socket!
+
+    def cancelTasks(self, tasks):
+        """Tell the workers to stop the tasks of a solved sudoku (or the speculative copies that lost the race)."""
+        notified = set()
+        for task in tasks:
+            worker = task.worker
+            if worker is self.myWork:
+                self.cancelJobs(self.p2p_server.replyAddress, task.task_id.sudoku_id, task.task_id) # its own task
+                continue
+
+            if task.isLost:
+                msg = P2PProtocol.cancel(self.p2p_server.replyAddress, task.task_id.sudoku_id, task.task_id)
+                self.send_msg(worker, msg)
+                self.logger.debug(f"P2P: Cancel task {task.task_id} on {worker.worker_address}.")
+                continue
+
+            if (worker.worker_address, task.task_id.sudoku_id) in notified:
+                continue
+            notified.add((worker.worker_address, task.task_id.sudoku_id))
+
+            msg = P2PProtocol.cancel(self.p2p_server.replyAddress, task.task_id.sudoku_id)
+            self.send_msg(worker, msg)
+            self.logger.debug(f"P2P: Cancel sudoku {task.task_id.sudoku_id} on {worker.worker_address}.")
+
+    def cancelJobs(self, host_port, sudoku_id, task_id=None):
+        """Stop the running and queued jobs of a sudoku (or a single task) requested by a node (they reply with the validations already done)."""
+        for (job_host_port, job_task_id), stop_event in self.running_jobs.items():
+            if job_host_port == host_port and (job_task_id == task_id or (task_id is None and job_task_id.sudoku_id == sudoku_id)):
+                stop_event.set()
+                self.logger.debug(f"Task {job_task_id} cancelled by {host_port}.")
+
+    def startJob(self, host_port, task_id, sudoku, space):
+        """Solve a task in the background (the pool or a solving thread), the reply is put in the internal solved queue."""
+        start, end = task_id.get_start_end()
+        sudoku_job = SudokuJob(sudoku, start, end, self.solverConfig, self.engine, space, stop_event=Event(), prefilter=self.prefilter)
+
+        if self.job_pool is not None:
+            self.running_jobs[(host_port, task_id)] = self.job_pool.run(sudoku_job, self.internal_solved_queue, task_id, host_port)
+        else:
+            self.running_jobs[(host_port, task_id)] = sudoku_job.stop_event
+            self.progress_jobs[(host_port, task_id)] = [sudoku_job, start] # the pooled jobs are split, they do not report progress
+            sudoku_job.run(self.solving_locker, self.internal_solved_queue, task_id, host_port)
+
+    def finishTask(self, worker, task_id, solution, validations, checks, elapsed):
+        """A worker (or the node itself) replied a task."""
+        cancelled_tasks = self.wtManager.finish_task(task_id, solution, elapsed, worker) 
+        self.cancelTasks(cancelled_tasks)
+
+        if self.wtManager.is_lost_reply(worker.worker_address, task_id):
+            # a speculative copy of the task replied first, its range is already counted
+            self.logger.debug(f"Discard validations of task {task_id} from {worker.worker_address}. [Lost the race]")
+        else:
+            # # update flooding stats (partial if the task was cancelled)
+            worker.pending_stats["uncommitted_validations"] += validations
+            worker.pending_stats["uncommitted_checks"] += checks
+            self.logger.critical(f"Increment validations on worker {worker.worker_address}.")
+
+    def isCancelled(self, host_port, sudoku_id):
+        """Check if a sudoku of a node was cancelled."""
+        cancel_time = self.cancelled_sudokus.get((host_port, sudoku_id))
+        return cancel_time is not None and (time.time() - cancel_time) < self.CANCELLED_TTL
+
+    def sendProgress(self):
+        """Report the progress of the running tasks (one message per requester, only the tasks that advanced)."""
+        progress = {}
+        for (host_port, task_id), job_progress in self.progress_jobs.items():
+            sudoku_job, reported = job_progress
+            if sudoku_job.progress > reported:
+                job_progress[1] = sudoku_job.progress
+                progress.setdefault(host_port, []).append((task_id, sudoku_job.progress, sudoku_job.checks))
+
+        for host_port, tasks_progress in progress.items():
+            worker = self.wtManager.workersDict.get(host_port)
+            if worker is not None:
+                self.send_msg(worker, P2PProtocol.solve_progress(self.p2p_server.replyAddress, tasks_progress))
+        self.last_progress = time.time()
+
+    def sendFloodingHello(self, worker, aliveNodes, worker_stats, cache_entries=None):
+        """Send the pending stats to a worker (only the entries changed since the version it acknowledged)."""
+        sync, changed = self.hello_deltas.delta(worker.worker_address, worker_stats)
+        msg = P2PProtocol.flooding_hello(self.p2p_server.replyAddress, aliveNodes, self.pending_stats.copy(), changed, self.cores, cache_entries, self.rate, sync)
+        self.send_msg(worker, msg)
 
     def isToSendFlooding(self):
         """Check if it is time to send a flooding message."""
@@ -112,10 +281,11 @@ class Node:
                 isChanged = True
 
         for worker in self.wtManager.workersDict.values():
-            new_value = worker.pending_stats["validations"] + worker.pending_stats["internal_validations"] + worker.pending_stats["external_validations"]
-            if new_value != worker.stats["validations"]:
-                worker.stats["validations"] = new_value
-                isChanged = True
+            for baseName in WORKER_STATS:
+                new_value = worker.pending_stats[baseName] + worker.pending_stats["internal_"+baseName] + worker.pending_stats["external_"+baseName]
+                if new_value != worker.stats[baseName]:
+                    worker.stats[baseName] = new_value
+                    isChanged = True
 
         return isChanged        
 
@@ -127,8 +297,9 @@ class Node:
             self.pending_stats["all"]["uncommitted_"+baseName] = 0
 
         for worker in self.wtManager.workersDict.values():
-            worker.pending_stats["internal_validations"] = worker.pending_stats["uncommitted_validations"]
-            worker.pending_stats["uncommitted_validations"] = 0
+            for baseName in WORKER_STATS:
+                worker.pending_stats["internal_"+baseName] = worker.pending_stats["uncommitted_"+baseName]
+                worker.pending_stats["uncommitted_"+baseName] = 0
 
     def updateWithReceivedStats(self, stats):
         """Update Stats with Received Stats."""
@@ -154,17 +325,18 @@ class Node:
                 worker = self.wtManager.add_worker(host_port, socket=None) # not connected yet. Is dead with high probability!
                 worker.Alive = False
 
-            myWorkerBaseValue = worker.pending_stats["validations"]
-            baseValueReceived = st_info["validations"]
-            incrementedValueReceived = st_info["internal_validations"]
+            for baseName in WORKER_STATS:
+                myWorkerBaseValue = worker.pending_stats[baseName]
+                baseValueReceived = st_info[baseName]
+                incrementedValueReceived = st_info["internal_"+baseName]
 
-            if baseValueReceived > myWorkerBaseValue:
-                worker.pending_stats["validations"] = baseValueReceived
-                worker.pending_stats["internal_validations"] = 0
-                worker.pending_stats["external_validations"] = incrementedValueReceived   
-                self.pending_stats["numberOfResults"] = -1 
-            elif baseValueReceived == myWorkerBaseValue:
-                worker.pending_stats["external_validations"] += incrementedValueReceived
+                if baseValueReceived > myWorkerBaseValue:
+                    worker.pending_stats[baseName] = baseValueReceived
+                    worker.pending_stats["internal_"+baseName] = 0
+                    worker.pending_stats["external_"+baseName] = incrementedValueReceived   
+                    self.pending_stats["numberOfResults"] = -1 
+                elif baseValueReceived == myWorkerBaseValue:
+                    worker.pending_stats["external_"+baseName] += incrementedValueReceived
 
         self.pending_stats["numberOfResults"] += 1 # In case of `-1` the value will be 0, otherwise it will be incremented
         
@@ -193,81 +365,166 @@ class Node:
             if worker is None:
                 worker = self.wtManager.add_worker(host_port, socket=None)
 
-            myWorkerBaseValue = worker.pending_stats["validations"] + worker.pending_stats["internal_validations"] + worker.pending_stats["external_validations"]
-            baseValueReceived = st_info["validations"]
-            worker.stats["validations"] = myWorkerBaseValue
+            for baseName in WORKER_STATS:
+                myWorkerBaseValue = worker.pending_stats[baseName] + worker.pending_stats["internal_"+baseName] + worker.pending_stats["external_"+baseName]
+                baseValueReceived = st_info[baseName]
+                worker.stats[baseName] = myWorkerBaseValue
 
-            if baseValueReceived > myWorkerBaseValue:
-                worker.stats["validations"] = baseValueReceived
-                self.logger.critical(f"Update validations to [{worker.stats['validations']}].")
-            elif baseValueReceived < myWorkerBaseValue:
-                self.logger.critical(f"Discard validations [{baseValueReceived}] from {host_port}.") 
+                if baseValueReceived > myWorkerBaseValue:
+                    worker.stats[baseName] = baseValueReceived
+                    self.logger.critical(f"Update {baseName} to [{worker.stats[baseName]}].")
+                elif baseValueReceived < myWorkerBaseValue:
+                    self.logger.critical(f"Discard {baseName} [{baseValueReceived}] from {host_port}.") 
 
-            worker.pending_stats["validations"] = worker.stats["validations"]
-            worker.pending_stats["internal_validations"] = 0
-            worker.pending_stats["external_validations"] = 0 # Not update uncommitted.
+                worker.pending_stats[baseName] = worker.stats[baseName]
+                worker.pending_stats["internal_"+baseName] = 0
+                worker.pending_stats["external_"+baseName] = 0 # Not update uncommitted.
             worker.pending_stats["numberOfResults"] = 0
 
 
     def getWorkerStats(self):
         """Get worker stats."""
-        return list(map(lambda worker: {"address": worker.worker_address, "validations": worker.pending_stats["validations"], "internal_validations": worker.pending_stats["internal_validations"]}, self.wtManager.workersDict.values()))
+        workers_stats = []
+        for worker in self.wtManager.workersDict.values():
+            worker_stats = {"address": worker.worker_address}
+            for baseName in WORKER_STATS:
+                worker_stats[baseName] = worker.pending_stats[baseName]
+                worker_stats["internal_"+baseName] = worker.pending_stats["internal_"+baseName]
+            workers_stats.append(worker_stats)
+        return workers_stats
 
     def updateNetwork(self):
         """Update network dict."""
         self.network.clear()
+        if self.membership is not None:
+            # gossip mode: the state of every member
+            for address, member in self.membership.members.items():
+                self.network[address] = member["state"]
+            return
         for worker in self.wtManager.get_alive_workers():
             self.network[worker.worker_address] = worker.network
 
+    def gossipRound(self):
+        """Gossip with `fanout` members (each one is also a probe of the member), and check the suspicions."""
+        # own counters: the stats counted since the last round
+        cache_solved, cache_invalid = self.cache.pop_answered()
+        solved = self.pending_stats["all"]["uncommitted_solved"] + cache_solved
+        invalid = self.pending_stats["all"]["uncommitted_invalid"] + cache_invalid
+        self.pending_stats["all"]["uncommitted_solved"] = self.pending_stats["all"]["uncommitted_invalid"] = 0
+        increments = {}
+        for worker in self.wtManager.workersDict.values():
+            increments[worker.worker_address] = {baseName: worker.pending_stats["uncommitted_"+baseName] for baseName in WORKER_STATS}
+            for baseName in WORKER_STATS:
+                worker.pending_stats["uncommitted_"+baseName] = 0
+        self.counters.add(solved, invalid, increments)
+
+        suspicion_timeout = self.SUSPICION_ROUNDS * log_size(self.membership.size()) * self.TIME_TO_GOSSIP
+        for address, state in self.membership.check_timeouts(self.PROBE_TIMEOUT, suspicion_timeout):
+            self.logger.warning(f"Member {address} is {state}. [Gossip]")
+            self.memberChanged(address, state)
+
+        self.gossip_rounds += 1
+        cache_entries = self.cache.pop_to_share() # new solved puzzles, piggybacked on the gossip
+        fanout = self.gossip_fanout or log_size(self.membership.size())
+        for i, address in enumerate(self.membership.select_peers(fanout)):
+            worker = self.wtManager.workersDict.get(address)
+            if worker is None:
+                continue
+            self.membership.probe_sent(address)
+            self.sendGossip(worker, full=(i == 0 and self.gossip_rounds % self.FULL_SYNC_ROUNDS == 0), cache=cache_entries)
+        self.last_gossip = time.time()
+
+        self.updateGossipStats()
+        self.updateNetwork()
+
+    def sendGossip(self, worker, reply=False, full=False, cache=None):
+        """Send the latest updates (or everything) to a member."""
+        members = self.membership.piggyback(self.MAX_PIGGYBACK, full)
+        counters = self.counters.piggyback(self.MAX_PIGGYBACK, self.membership.retransmit_limit(), full)
+        self.send_msg(worker, P2PProtocol.gossip(self.p2p_server.replyAddress, reply, full, members, counters, cache))
+
+    def receiveGossip(self, host_port, args):
+        """Merge a gossip, and answer it (if it is not an answer)."""
+        self.membership.answered(host_port)
+        for member in args["members"]:
+            state = self.membership.apply(member)
+            if state is not None:
+                self.memberChanged(member["address"], state, member)
+        self.counters.merge(args["counters"])
+        self.cache.merge(args["cache"])
+
+        worker = self.wtManager.workersDict.get(host_port)
+        if worker is None:
+            return
+        if self.membership.state(host_port) != DEAD:
+            self.wtManager.update_worker_flooding(worker) # direct sign of life
+        if not args["reply"]:
+            self.sendGossip(worker, reply=True, full=args["full"])
+
+    def memberChanged(self, address, state, member=None):
+        """Follow the state of a member in the load balancer (suspected members still get tasks)."""
+        worker = self.wtManager.workersDict.get(address)
+        if state == DEAD:
+            if worker is not None and worker.Alive:
+                self.wtManager.kill_worker(address, close_socket=worker.socket is not None)
+            return
+
+        if worker is None:
+            worker = self.wtManager.add_worker(address, socket=None) # connected when a message is sent to it
+        elif not worker.Alive:
+            self.wtManager.update_worker_flooding(worker)
+        if member is not None:
+            worker.cores = member["cores"] # bigger tasks for nodes with more cores
+            worker.calibrate(member["rate"]) # first tasks sized with the measured rate
+
+    def updateGossipStats(self):
+        """Stats of the gossip mode: the sums of the counters of every node."""
+        solved, invalid, workers = self.counters.totals()
+        isChanged = (solved, invalid) != (self.stats["all"]["solved"], self.stats["all"]["invalid"])
+        self.stats["all"]["solved"] = solved
+        self.stats["all"]["invalid"] = invalid
+
+        for address, totals in workers.items():
+            worker = self.wtManager.workersDict.get(address)
+            if worker is None:
+                worker = self.wtManager.add_worker(address, socket=None) # only known by its stats
+                worker.Alive = False
+            for baseName in WORKER_STATS:
+                if worker.stats[baseName] != totals[baseName]:
+                    worker.stats[baseName] = totals[baseName]
+                    isChanged = True
+
+        self.updateWorkersStats()
+        if isChanged:
+            self.logger.warning(f"[{self.stats['all']['solved']}, {self.stats['all']['invalid']}, {self.stats['all']['validations'] }]")
+
 
     def updateWorkersStats(self):
         """Update workers stats."""
         workers_stats = []
-        total_validations = 0
+        totals = dict.fromkeys(WORKER_STATS, 0)
         for worker in self.wtManager.workersDict.values():
             workers_stats.append(worker.stats)
-            total_validations += worker.stats["validations"]
+            for baseName in WORKER_STATS:
+                totals[baseName] += worker.stats[baseName]
         self.stats["nodes"] = sorted(workers_stats, key=lambda x: x["validations"], reverse=True)
-        self.stats["all"]["validations"] = total_validations
+        self.stats["all"].update(totals)
+        self.stats["cache"] = self.cache.get_stats()
 
     def isAlone(self):
         """Check if the node is alone."""
         return len(self.wtManager.get_alive_workers()) == 0
 
     def doTasksInDispatcher(self):
-        """Do tasks in dispatcher."""
-
-        if self.p2p_server.request_queue.empty and self.wtManager.has_tasks():
-            max_factor = 0.25
-            task_size_factor = max_factor
- 
-            p2p_time = self.p2p_server.get_average_request()/200
-            if p2p_time <= max_factor:
-                task_size_factor = p2p_time
-
-            self.myWork.task_size_factor = task_size_factor
-            
-            # self.logger.warning(self.p2p_server.get_average_request())
+        """Give tasks to the node itself, sized like the tasks of the workers (solved in the background)."""
+        while self.myWork.isAvailable and self.wtManager.has_tasks():
             task = self.wtManager.get_task_to_worker(self.myWork)
             task_id = task.task_id
+            self.wtManager.working_tasks[task_id] = task
 
-            self.wtManager.working_tasks[task_id] = task # only for updates
-
-            # Create SudokuJob object
-            sudoku_job = SudokuJob(self.wtManager.current_sudoku.sudoku, task_id.start, task_id.end, self.solverConfig)
-            
-            # Execute the task using SudokuJob
-            solution = sudoku_job.solve()
-            
-            if solution is not None:
-                self.logger.info(f"Sudoku is valid. [by Dispatcher]")
-
-            self.logger.critical(f"Task {task_id} done by Dispatcher. [{self.myWork.task_response_time}]")
-
-            self.wtManager.finish_task(task_id, solution) 
-
-            validations = task_id.end - task_id.start # update flooding stats
-            self.myWork.pending_stats["uncommitted_validations"] += validations
+            sudoku = self.wtManager.get_sudoku(task_id.sudoku_id)
+            self.startJob(self.p2p_server.replyAddress, task_id, sudoku.sudoku, sudoku.space.name)
+            self.logger.debug(f"Task {task_id} assigned to Dispatcher. [{self.myWork.task_response_time},{self.myWork.task_size}]")
 
     def setupNextRound(self):  
         self.pending_stats = {  
@@ -278,9 +535,12 @@ class Node:
             }
         }    
         for worker in self.wtManager.workersDict.values():
-            worker.pending_stats = {
-                "validations": worker.stats["validations"], "internal_validations": 0, "external_validations": 0, "uncommitted_validations": worker.pending_stats["uncommitted_validations"]
-            } 
+            pending_stats = {}
+            for baseName in WORKER_STATS:
+                pending_stats.update({
+                    baseName: worker.stats[baseName], "internal_"+baseName: 0, "external_"+baseName: 0, "uncommitted_"+baseName: worker.pending_stats["uncommitted_"+baseName]
+                })
+            worker.pending_stats = pending_stats
 
 
     def run(self):
@@ -302,21 +562,33 @@ class Node:
 
 ######### Main loop
         while True:
-            if self.isToSendFlooding():
+            if self.membership is None and self.isToSendFlooding():
+                # requests answered by the cache also count as solved/invalid
+                cache_solved, cache_invalid = self.cache.pop_answered()
+                self.pending_stats["all"]["uncommitted_solved"] += cache_solved
+                self.pending_stats["all"]["uncommitted_invalid"] += cache_invalid
+
                 # commit the pending stats and define uncommitted as 0
                 self.commitPendingStats()
                 
+                cache_entries = self.cache.pop_to_share() # new solved puzzles, piggybacked on the flooding
+                worker_stats = self.getWorkerStats()
+                aliveNodes = list(self.wtManager.get_alive_workers_address())
                 for worker in self.wtManager.get_alive_workers():
                     self.logger.debug(f"P2P: Sending flooding consensus to {worker.worker_address}.")
-                    worker_stats = self.getWorkerStats()
-                    msg = P2PProtocol.flooding_hello(self.p2p_server.replyAddress, list(self.wtManager.get_alive_workers_address()), self.pending_stats.copy(), worker_stats)
-                    self.send_msg(worker, msg)
+                    self.sendFloodingHello(worker, aliveNodes, worker_stats, cache_entries)
                 self.last_flooding = time.time()
 
                 self.updateWorkersStats()
                 self.updateNetwork()
 
-            self.wtManager.checkWorkersFloodingTimeouts() # kill inactive workers (if any)   
+            if self.membership is None:
+                self.wtManager.checkWorkersFloodingTimeouts() # kill inactive workers (if any)   
+            elif time.time() - self.last_gossip > self.TIME_TO_GOSSIP:
+                self.gossipRound() # the membership follows the suspicions instead of the flooding timeouts
+
+            if time.time() - self.last_progress > self.TIME_TO_PROGRESS:
+                self.sendProgress()
 
             # get solved sudokus (if any)
             try:
@@ -344,27 +616,50 @@ class Node:
                 task_id = solved_reply["task_id"]
                 host_port = solved_reply["replyAddress"]
                 solution = solved_reply["solution"]
+                validations = solved_reply["validations"] # less than the range if the task was cancelled
+                checks = solved_reply["checks"]
+                elapsed = solved_reply["elapsed"] # time spent in this node, the requester separates it from the round trip
+                self.running_jobs.pop((host_port, task_id), None)
+                self.progress_jobs.pop((host_port, task_id), None)
 
                 worker = self.wtManager.workersDict.get(host_port)
 
-                if solution != "INVALID":
-                    self.logger.debug(f"Sudoku is valid.")
-                    msg = P2PProtocol.solve_reply(self.p2p_server.replyAddress, task_id, solution)
+                if solution == "FAILED":
+                    # the range was not searched: no reply, the requester sends the task again when it times out
+                    self.logger.error(f"Task {task_id} of {host_port} failed, the range was not searched.")
+                    if worker is self.myWork:
+                        self.wtManager.fail_task(task_id, worker) # its own tasks do not time out
+                elif worker is self.myWork:
+                    # a task of its own sudokus
+                    self.logger.critical(f"Task {task_id} done by Dispatcher. [{self.myWork.task_response_time}]")
+                    self.finishTask(worker, task_id, solution if solution != "INVALID" else None, validations, checks, elapsed)
                 else:
-                    self.logger.debug(f"Sudoku is invalid.")
-                    msg = P2PProtocol.solve_reply(self.p2p_server.replyAddress, task_id)    
-                
-                # Send the reply
-                self.send_msg(worker, msg)
+                    if solution != "INVALID":
+                        self.logger.debug(f"Sudoku is valid.")
+                        msg = P2PProtocol.solve_reply(self.p2p_server.replyAddress, task_id, solution, validations, checks, elapsed)
+                    else:
+                        self.logger.debug(f"Sudoku is invalid.")
+                        msg = P2PProtocol.solve_reply(self.p2p_server.replyAddress, task_id, validations=validations, checks=checks, elapsed=elapsed)    
+                    
+                    # Send the reply
+                    self.send_msg(worker, msg)
 
             # Handle http requests (if any)
             if http_request is not None:
                 self.logger.debug(f"HTTP: Requested {http_request} tasks.")
                 self.isHandlingHTTP = True
 
-                sudoku = http_request
-                print(sudoku)
-                self.wtManager.add_pending_task(sudoku)                  
+                sudoku, response_queue = http_request
+                key, transform = canonicalize(sudoku)
+                sudoku_id = self.http_sudokus.get(key)
+                if sudoku_id is not None:
+                    # the same puzzle is already being solved, wait for its result
+                    self.http_replies[sudoku_id][1].append((response_queue, transform))
+                    self.logger.debug(f"HTTP: Request attached to sudoku {sudoku_id}.")
+                else:
+                    sudoku_id = self.wtManager.add_pending_task(sudoku) # solved with the other sudokus in progress
+                    self.http_sudokus[key] = sudoku_id
+                    self.http_replies[sudoku_id] = (key, [(response_queue, transform)])
       
             # Handle p2p requests (if any)     
             if p2p_request is not None:
@@ -390,6 +685,8 @@ class Node:
                         self.wtManager.update_worker_flooding(worker)
 
                     worker.network = aliveNodes # update worker network
+                    worker.cores = data["args"]["cores"] # bigger tasks for nodes with more cores
+                    worker.calibrate(data["args"]["rate"]) # first tasks sized with the measured rate
 
                     # Add nodes that current node does not have
                     for host_port in aliveNodes:
@@ -400,9 +697,13 @@ class Node:
                         if self.wtManager.workersDict.get(host_port) is None:
                             self.connectWorker(host_port)        
 
+                    #### store the puzzles solved by the peer
+                    self.cache.merge(data["args"]["cache"])
+
                     #### updating the stats
                     stats = data["args"]["stats"]
 
+                    stats["nodes"] = self.hello_deltas.merge(host_port, data["args"]["sync"], stats["nodes"]) # full list of entries
                     self.updateWithReceivedStats(stats)
 
                 elif data["command"] == "FLOODING_CONFIRMATION":
@@ -410,6 +711,7 @@ class Node:
                     host_port = data["replyAddress"]
                     stats = data["args"]["stats"]
                    
+                    stats["nodes"] = self.confirmation_deltas.merge(host_port, data["args"]["sync"], stats["nodes"]) # full list of entries
                     # host_port is only for logging!
                     self.updateWithConfirmedStats(stats, host_port)
 
@@ -420,15 +722,35 @@ class Node:
                     self.wtManager.kill_worker(host_port, close_socket=False) # kill the worker if it is already connected
                     worker.flooding_received() # if the worker is not new it is a reconnection!
 
+                    # a (re)joining node restarts its sudoku ids
+                    for key in [key for key in self.cancelled_sudokus if key[0] == host_port]:
+                        del self.cancelled_sudokus[key]
+
+                    # and its versions of the stats (full lists again)
+                    self.hello_deltas.forget(host_port)
+                    self.confirmation_deltas.forget(host_port)
+
                     # reply with the list of nodes
-                    msg = P2PProtocol.join_reply(aliveNodes=list(self.wtManager.get_alive_workers_address()))
+                    msg = P2PProtocol.join_reply(aliveNodes=list(self.wtManager.get_alive_workers_address()), rate=self.rate)
                     self.send_msg(worker, msg)
 
+                elif data["command"] == "JOIN_REPLY" and self.membership is not None:
+                    # gossip mode: exchange everything with the anchor, the other members come with the gossip
+                    anchor = self.wtManager.workersDict.get(self.anchor)
+                    if anchor is not None:
+                        anchor.calibrate(data["args"]["rate"])
+                        self.membership.probe_sent(self.anchor)
+                        self.sendGossip(anchor, full=True)
+
                 elif data["command"] == "JOIN_REPLY":
                     aliveNodes = data["args"]["aliveNodes"].copy() # list of nodes to send in next flooding
                     aliveNodes.remove(self.p2p_server.replyAddress) # himself
                     aliveNodes.append(self.anchor) # how send the join reply
 
+                    anchor = self.wtManager.workersDict.get(self.anchor)
+                    if anchor is not None:
+                        anchor.calibrate(data["args"]["rate"])
+
                     # Send flooding hello message for each node
                     for host_port in aliveNodes:
 
@@ -439,23 +761,43 @@ class Node:
 
                         if worker is not None:
                             worker_stats = self.getWorkerStats() # normally this stats are all zeros...
-                            msg = P2PProtocol.flooding_hello(self.p2p_server.replyAddress, aliveNodes, self.pending_stats.copy(), worker_stats)
-                            self.send_msg(worker, msg)
+                            self.sendFloodingHello(worker, aliveNodes, worker_stats)
 
                 elif data["command"] == "SOLVE_REQUEST":                    
                     task_id = data["args"]["task_id"]
                     sudoku = data["args"]["sudoku"]
+                    space = data["args"]["space"] # search space chosen by the requester
                     host_port = data["replyAddress"]
                     
-                    self.logger.critical(f"Task {task_id} received from {host_port}.")
-                    start, end = task_id.get_start_end()
-        
-                    # Create SudokuJob object
-                    sudoku_job = SudokuJob(sudoku, start, end, self.solverConfig)
-                    
-                    # Execute the task using SudokuJob
-                    solution = sudoku_job.run(self.solving_locker, self.internal_solved_queue, task_id, host_port)
+                    if self.isCancelled(host_port, task_id.sudoku_id):
+                        self.logger.debug(f"Task {task_id} dropped, sudoku was cancelled by {host_port}.")
+                    else:
+                        self.logger.critical(f"Task {task_id} received from {host_port}.")
+                        self.startJob(host_port, task_id, sudoku, space)
+
+                elif data["command"] == "CANCEL":
+                    host_port = data["replyAddress"]
+                    sudoku_id = data["args"]["sudoku_id"]
+                    task_id = data["args"]["task_id"] # None to cancel the whole sudoku
+
+                    if task_id is None:
+                        # forget old cancels, sudoku ids restart when a node restarts
+                        for key, cancel_time in list(self.cancelled_sudokus.items()):
+                            if time.time() - cancel_time >= self.CANCELLED_TTL:
+                                del self.cancelled_sudokus[key]
+                        self.cancelled_sudokus[(host_port, sudoku_id)] = time.time()
+
+                    # stop the running and queued jobs (they reply with the validations already done)
+                    self.cancelJobs(host_port, sudoku_id, task_id)
                     
+                elif data["command"] == "GOSSIP":
+                    self.receiveGossip(data["replyAddress"], data["args"])
+
+                elif data["command"] == "SOLVE_PROGRESS":
+                    worker = self.wtManager.workersDict.get(data["replyAddress"])
+                    for task_id, progress, checks in data["args"]["progress"]:
+                        self.wtManager.task_progress(task_id, progress, checks, worker)
+
                 elif data["command"] == "SOLVE_REPLY":
                     # Store the task as solved
                     task_id = data["args"]["task_id"]
@@ -463,16 +805,13 @@ class Node:
                     host_port = data["replyAddress"]
                     worker = self.wtManager.workersDict.get(host_port)
 
-                    self.wtManager.finish_task(task_id, solution) 
-
-                    validations = task_id.end - task_id.start
-                    # # update flooding stats
-                    worker.pending_stats["uncommitted_validations"] += validations
-                    self.logger.critical(f"Increment validations on worker {worker.worker_address}.")
+                    self.finishTask(worker, task_id, solution, data["args"]["validations"], data["args"]["checks"], data["args"]["elapsed"])
 
 
             # I will send the confirmation only when I receive the result from all ALIVE nodes 
-            if (len(self.wtManager.get_alive_workers()) > 0 and self.pending_stats["numberOfResults"] >= len(self.wtManager.get_alive_workers())):
+            if self.membership is not None:
+                pass # gossip mode: the stats are the gossiped counters (updated every round)
+            elif (len(self.wtManager.get_alive_workers()) > 0 and self.pending_stats["numberOfResults"] >= len(self.wtManager.get_alive_workers())):
                 # update the stats with the pending stats
                 isChanged = self.updateSumStats()  
 
@@ -481,7 +820,10 @@ class Node:
 
                 # broadcast the confirmation
                 for worker in self.wtManager.get_alive_workers():
-                    msg = P2PProtocol.flooding_confirmation(self.p2p_server.replyAddress, self.stats.copy())
+                    sync, changed = self.confirmation_deltas.delta(worker.worker_address, self.stats["nodes"])
+                    stats = self.stats.copy()
+                    stats["nodes"] = changed
+                    msg = P2PProtocol.flooding_confirmation(self.p2p_server.replyAddress, stats, sync)
                     self.send_msg(worker, msg)
                 
                 # setup for the next round
@@ -498,22 +840,31 @@ class Node:
 
 
             if not self.isHandlingHTTP:
+                self.flushMessages()
                 continue
             
             # Manage tasks assignments and timeouts (if any)    
             
-            # check if completed
-            if self.wtManager.isDone():
-                self.isHandlingHTTP = False
-                if self.wtManager.current_sudoku.solution is not None:
-                    solution = self.wtManager.current_sudoku.solution 
+            # check the completed sudokus
+            for sudoku in self.wtManager.pop_done_sudokus():
+                self.cache.put(sudoku.sudoku, sudoku.solution)
+                key, waiters = self.http_replies.pop(sudoku.sudoku_id)
+                del self.http_sudokus[key]
+                if sudoku.solution is not None:
+                    solution = sudoku.solution 
                     self.logger.info(f"HTTP: Task done! {solution}")
-                    self.http_server.response_queue.put(solution)
-                    self.pending_stats["all"]["uncommitted_solved"] += 1
+                    canonical_solution = waiters[0][1].apply(solution) # the first request is the solved puzzle
+                    for response_queue, transform in waiters:
+                        response_queue.put(transform.invert(canonical_solution))
+                    self.pending_stats["all"]["uncommitted_solved"] += len(waiters) # one per request
                 else:    
-                    self.http_server.response_queue.put(None)
+                    for response_queue, _ in waiters:
+                        response_queue.put(None)
                     self.logger.debug("HTTP: Task done! [No solution]")
-                    self.pending_stats["all"]["uncommitted_invalid"] += 1
+                    self.pending_stats["all"]["uncommitted_invalid"] += len(waiters)
+
+            if self.wtManager.isDone():
+                self.isHandlingHTTP = False
             else:
             # manage tasks assignments and timeouts
                 retry_tasks = self.wtManager.checkTasksTimeouts() # tasks to retry, the timeout ones were all in the pending queue!
@@ -521,8 +872,8 @@ class Node:
                 # Retry tasks
                 for task in retry_tasks:
                     # build the tasks again
-                    sudoku = self.wtManager.current_sudoku.sudoku
-                    msg = P2PProtocol.solve_request(self.p2p_server.replyAddress, task.task_id, sudoku)
+                    sudoku = self.wtManager.get_sudoku(task.task_id.sudoku_id)
+                    msg = P2PProtocol.solve_request(self.p2p_server.replyAddress, task.task_id, sudoku.sudoku, sudoku.space.name)
                     
                     # send the tasks to the worker
                     self.send_msg(task.worker, msg)
@@ -533,8 +884,8 @@ class Node:
                 # Send tasks
                 for task in tasks_to_send:
                     # build the tasks
-                    sudoku = self.wtManager.current_sudoku.sudoku
-                    msg = P2PProtocol.solve_request(self.p2p_server.replyAddress, task.task_id, sudoku)
+                    sudoku = self.wtManager.get_sudoku(task.task_id.sudoku_id)
+                    msg = P2PProtocol.solve_request(self.p2p_server.replyAddress, task.task_id, sudoku.sudoku, sudoku.space.name)
 
                     # send the tasks to the worker
                     self.send_msg(task.worker, msg)
@@ -542,4 +893,6 @@ class Node:
 
 
                 # Do some tasks (if any)
-                self.doTasksInDispatcher()
\ No newline at end of file
+                self.doTasksInDispatcher()
+
+            self.flushMessages() # the messages of this iteration, one frame per peer
@@ -0,0 +1,465 @@
+import math
+import struct
+import sys
+from array import array
+from itertools import chain
+from operator import itemgetter
+from typing import List
+from src.p2p_loadbalancer import TaskID, WORKER_STATS
+from src.p2p_gossip import STATES
+
+# Binary encoding of the P2P messages (replaces pickle: smaller, and decoding
+# peer data never runs code).
+#
+# Frame:   length of the payload (4 bytes, big endian) | payload
+# Payload: version (1 byte) | command (1 byte) | reply address | fields of the command
+#
+# Integers are varints (LEB128, at most 10 bytes), the ranges of the tasks
+# are big integers (varint length and big endian bytes, they go far beyond
+# 64 bits), strings are a varint length and UTF-8, optional values are
+# prefixed by a presence byte and floats are 8-byte doubles. Grids are the 81
+# digits packed two per byte. The per-node counters of the stats are one
+# block of integers of the same width (no per-field tags, the reader knows
+# how many; up to 8 bytes they are one array call), and lists of strings are
+# a single string separated by NUL characters (a few C calls instead of a
+# loop per field).
+# A BATCH payload has the payloads of several messages to the same peer (a
+# varint count, then each one with its varint length), sent in one frame.
+
+VERSION = 6
+LENGTH = struct.Struct(">I")
+DOUBLE = struct.Struct(">d")
+MAX_MESSAGE_SIZE = 64 * 1024 * 1024 # bigger lengths are a corrupted stream
+MAX_VARINT_SIZE = 10 # bytes (70 bits), the bigger values are big integers
+
+# widths of the blocks of integers packed by array (C loops), the wider values are big endian bytes
+_INT_ARRAYS = {array(code).itemsize: code for code in "BHIQ"}
+_SWAP = sys.byteorder == "little" # the blocks are big endian
+
+COMMANDS = ["FLOODING_HELLO", "FLOODING_CONFIRMATION", "JOIN_REQUEST", "JOIN_REPLY", "SOLVE_REQUEST", "SOLVE_REPLY", "SOLVE_PROGRESS", "CANCEL", "GOSSIP", "BATCH"]
+COMMAND_CODES = {command: code for code, command in enumerate(COMMANDS, start=1)}
+
+# grids: digits <-> hexadecimal characters (other values are rejected by fromhex or the check of the decoded digits)
+_DIGITS_TO_HEX = bytes(ord(str(value)) if value <= 9 else ord("x") for value in range(256))
+_HEX_TO_DIGITS = bytes(int(chr(char), 16) if chr(char) in "0123456789abcdef" else 255 for char in range(256))
+
+
+class EncodingError(ValueError):
+    """Payload that is not a valid message."""
+
+
+class Writer:
+    """Appends the encoded fields to a buffer."""
+
+    def __init__(self):
+        self.buffer = bytearray()
+
+    def uint(self, value: int):
+        if value < 0x80:
+            if value < 0:
+                raise EncodingError(f"Negative value {value} for an unsigned field.")
+            self.buffer.append(value)
+            return
+        if value >> (7 * MAX_VARINT_SIZE):
+            raise EncodingError(f"Value {value} is too big for a varint.")
+        while value > 0x7F:
+            self.buffer.append((value & 0x7F) | 0x80)
+            value >>= 7
+        self.buffer.append(value)
+
+    def bigint(self, value: int):
+        """Unsigned integer of any size: varint length and big endian bytes (the ranges of the tasks)."""
+        if value < 0:
+            raise EncodingError(f"Negative value {value} for an unsigned field.")
+        data = value.to_bytes((value.bit_length() + 7) // 8, "big")
+        self.uint(len(data))
+        self.buffer += data
+
+    def float(self, value: float):
+        self.buffer += DOUBLE.pack(value)
+
+    def string(self, value: str):
+        data = value.encode("utf8")
+        self.uint(len(data))
+        self.buffer += data
+
+    def strings(self, values: List[str]):
+        text = "\0".join(values)
+        if text.count("\0") != max(0, len(values) - 1):
+            raise EncodingError("Strings of a list can not have NUL characters.")
+        self.uint(len(values))
+        self.string(text)
+
+    def ints(self, values: List[int]):
+        """Block of unsigned integers of the same width (the reader knows how many): the width,
+        then the narrowest array that holds them (the counters have no upper bound)."""
+        for width, code in _INT_ARRAYS.items():
+            try:
+                block = array(code, values) # fails fast (on the first value that does not fit)
+            except OverflowError:
+                continue
+            if _SWAP:
+                block.byteswap()
+            self.uint(width)
+            self.buffer += block.tobytes()
+            return
+        if min(values) < 0:
+            raise EncodingError("Negative value for an unsigned field.")
+        width = (max(values).bit_length() + 7) // 8
+        self.uint(width)
+        self.buffer += b"".join(value.to_bytes(width, "big") for value in values)
+
+    def grid(self, grid):
+        self.grids([grid])
+
+    def grids(self, grids: list):
+        """Grids packed together (one conversion), a NUL nibble pads an odd number of grids."""
+        try:
+            rows = list(chain.from_iterable(grids))
+            digits = bytes(chain.from_iterable(rows)) + b"\0" * (len(grids) % 2)
+            if len(rows) != 9 * len(grids) or set(map(len, grids)) - {9} or set(map(len, rows)) - {9}:
+                raise ValueError
+            self.buffer += bytes.fromhex(digits.translate(_DIGITS_TO_HEX).decode("ascii"))
+        except (ValueError, TypeError):
+            raise EncodingError("A grid must be 9x9 digits.")
+
+    def task_id(self, task_id: TaskID):
+        self.uint(task_id.sudoku_id)
+        self.bigint(task_id.start)
+        self.bigint(task_id.end)
+
+    def optional(self, value, write):
+        """Presence byte, then the value written by `write` (if it is not None)."""
+        self.buffer.append(value is not None)
+        if value is not None:
+            write(value)
+
+
+class Reader:
+    """Reads the encoded fields of a payload."""
+
+    def __init__(self, data: bytes):
+        self.data = data
+        self.offset = 0
+
+    def _take(self, size: int) -> bytes:
+        end = self.offset + size
+        if end > len(self.data):
+            raise EncodingError("Truncated message.")
+        chunk = self.data[self.offset:end]
+        self.offset = end
+        return chunk
+
+    def byte(self) -> int:
+        if self.offset >= len(self.data):
+            raise EncodingError("Truncated message.")
+        self.offset += 1
+        return self.data[self.offset - 1]
+
+    def uint(self) -> int:
+        data, offset = self.data, self.offset
+        if offset < len(data) and data[offset] < 0x80:
+            self.offset = offset + 1
+            return data[offset]
+        value, shift = 0, 0
+        end = offset + MAX_VARINT_SIZE
+        for offset in range(offset, min(end, len(data))):
+            byte = data[offset]
+            value |= (byte & 0x7F) << shift
+            if byte < 0x80:
+                self.offset = offset + 1
+                return value
+            shift += 7
+        if end > len(data):
+            raise EncodingError("Truncated message.")
+        raise EncodingError("Varint too long.") # a corrupted field (the values beyond 70 bits are big integers)
+
+    def bigint(self) -> int:
+        return int.from_bytes(self._take(self.uint()), "big")
+
+    def float(self) -> float:
+        return DOUBLE.unpack(self._take(DOUBLE.size))[0]
+
+    def string(self) -> str:
+        try:
+            return self._take(self.uint()).decode("utf8")
+        except UnicodeDecodeError as e:
+            raise EncodingError(str(e))
+
+    def strings(self) -> List[str]:
+        count = self.uint()
+        text = self.string()
+        values = text.split("\0") if count > 0 else []
+        if len(values) != count or (count == 0 and text):
+            raise EncodingError("Wrong number of strings.")
+        return values
+
+    def ints(self, count: int) -> list:
+        width = self.uint()
+        data = self._take(width * count)
+        if width in _INT_ARRAYS:
+            block = array(_INT_ARRAYS[width], data)
+            if _SWAP:
+                block.byteswap()
+            return block.tolist()
+        if width == 0:
+            raise EncodingError("Integers of width 0.")
+        return [int.from_bytes(data[i:i + width], "big") for i in range(0, len(data), width)]
+
+    def grid(self) -> List[List[int]]:
+        return self.grids(1)[0]
+
+    def grids(self, count: int) -> List[List[List[int]]]:
+        size = 81 * count
+        digits = self._take((size + 1) // 2).hex().encode("ascii").translate(_HEX_TO_DIGITS)
+        if b"\xff" in digits or digits[size:].strip(b"\0"): # a-f nibbles are 255
+            raise EncodingError("A grid must be 9x9 digits.")
+        rows = [list(digits[r:r + 9]) for r in range(0, size, 9)]
+        return [rows[g:g + 9] for g in range(0, len(rows), 9)]
+
+    def task_id(self) -> TaskID:
+        return TaskID(self.uint(), self.bigint(), self.bigint())
+
+    def optional(self, read):
+        return read() if self.byte() else None
+
+    def end(self):
+        if self.offset != len(self.data):
+            raise EncodingError("Unexpected bytes after the message.")
+
+
+# Fields of each command: (write the args, read the args)
+
+_HELLO_NODE_FIELDS = [name for baseName in WORKER_STATS for name in (baseName, "internal_"+baseName)]
+_HELLO_ALL_FIELDS = ["solved", "internal_solved", "invalid", "internal_invalid"]
+
+def _stats_builder(fields: List[str]):
+    """Function (address, *counters) -> per-node stats dict. Generated once per field table, like
+    namedtuple (a dict display is about twice as fast as dict(zip())); the names are constants."""
+    arguments = ", ".join(f"v{i}" for i in range(len(fields)))
+    items = ", ".join(f"{name!r}: v{i}" for i, name in enumerate(fields))
+    return eval(f"lambda address, {arguments}: {{'address': address, {items}}}")
+
+_STATS_BUILDERS = {tuple(fields): _stats_builder(fields) for fields in (_HELLO_NODE_FIELDS, WORKER_STATS)}
+
+def _nodes_stats(addresses: List[str], values: tuple, fields: List[str]) -> List[dict]:
+    """Per-node stats from the addresses and the block of counters (len(fields) per node)."""
+    size = len(fields)
+    return list(map(_STATS_BUILDERS[tuple(fields)], addresses, *[values[i::size] for i in range(size)]))
+
+def _nodes_counters(nodes: List[dict], fields: List[str]) -> list:
+    """Block of counters of the per-node stats (len(fields) per node)."""
+    return list(chain.from_iterable(map(itemgetter(*fields), nodes)))
+
+def _write_sync(writer: Writer, sync: dict):
+    writer.uint(sync["version"])
+    writer.uint(sync["since"])
+    writer.uint(sync["ack"])
+    writer.strings(sync["removed"])
+
+def _read_sync(reader: Reader) -> dict:
+    return {"version": reader.uint(), "since": reader.uint(), "ack": reader.uint(), "removed": reader.strings()}
+
+def _write_cache(writer: Writer, cache: list):
+    # the count, a presence byte per solution, then every grid (the puzzles, then the solutions) in one block
+    writer.uint(len(cache))
+    writer.buffer += bytes(solution is not None for _, solution in cache)
+    writer.grids([sudoku for sudoku, _ in cache] + [solution for _, solution in cache if solution is not None])
+
+def _read_cache(reader: Reader) -> list:
+    count = reader.uint()
+    present = reader._take(count)
+    if present.strip(b"\1\0"):
+        raise EncodingError("Wrong presence byte.")
+    grids = reader.grids(count + sum(present))
+    solutions = iter(grids[count:])
+    return [(sudoku, next(solutions) if has_solution else None) for sudoku, has_solution in zip(grids, present)]
+
+def _write_flooding_hello(writer: Writer, args: dict):
+    writer.strings(args["aliveNodes"])
+    stats = args["stats"]
+    writer.ints([stats["all"][name] for name in _HELLO_ALL_FIELDS])
+    writer.strings([st_info["address"] for st_info in stats["nodes"]])
+    writer.ints(_nodes_counters(stats["nodes"], _HELLO_NODE_FIELDS))
+    writer.uint(args["cores"])
+    _write_cache(writer, args["cache"])
+    writer.optional(args["rate"], writer.float)
+    _write_sync(writer, args["sync"])
+
+def _read_flooding_hello(reader: Reader) -> dict:
+    aliveNodes = reader.strings()
+    stats = {"all": dict(zip(_HELLO_ALL_FIELDS, reader.ints(len(_HELLO_ALL_FIELDS))))}
+    addresses = reader.strings()
+    stats["nodes"] = _nodes_stats(addresses, reader.ints(len(addresses) * len(_HELLO_NODE_FIELDS)), _HELLO_NODE_FIELDS)
+    cores = reader.uint()
+    cache = _read_cache(reader)
+    return {"aliveNodes": aliveNodes, "stats": stats, "cores": cores, "cache": cache, "rate": reader.optional(reader.float), "sync": _read_sync(reader)}
+
+def _write_flooding_confirmation(writer: Writer, args: dict):
+    stats = args["stats"]
+    writer.ints([stats["all"]["solved"], stats["all"]["invalid"]])
+    writer.strings([st_info["address"] for st_info in stats["nodes"]])
+    writer.ints(_nodes_counters(stats["nodes"], WORKER_STATS))
+    _write_sync(writer, args["sync"])
+
+def _read_flooding_confirmation(reader: Reader) -> dict:
+    solved, invalid = reader.ints(2)
+    addresses = reader.strings()
+    nodes = _nodes_stats(addresses, reader.ints(len(addresses) * len(WORKER_STATS)), WORKER_STATS)
+    return {"stats": {"all": {"solved": solved, "invalid": invalid}, "nodes": nodes}, "sync": _read_sync(reader)}
+
+def _write_join_reply(writer: Writer, args: dict):
+    writer.strings(args["aliveNodes"])
+    writer.optional(args["rate"], writer.float)
+
+def _read_join_reply(reader: Reader) -> dict:
+    return {"aliveNodes": reader.strings(), "rate": reader.optional(reader.float)}
+
+def _write_solve_request(writer: Writer, args: dict):
+    writer.task_id(args["task_id"])
+    writer.grid(args["sudoku"])
+    writer.string(args["space"])
+
+def _read_solve_request(reader: Reader) -> dict:
+    return {"task_id": reader.task_id(), "sudoku": reader.grid(), "space": reader.string()}
+
+def _write_solve_reply(writer: Writer, args: dict):
+    writer.task_id(args["task_id"])
+    writer.optional(args["solution"], writer.grid)
+    writer.bigint(args["validations"])
+    writer.uint(args["checks"])
+    writer.optional(args["elapsed"], writer.float)
+
+def _read_solve_reply(reader: Reader) -> dict:
+    return {"task_id": reader.task_id(), "solution": reader.optional(reader.grid), "validations": reader.bigint(), "checks": reader.uint(), "elapsed": reader.optional(reader.float)}
+
+def _write_solve_progress(writer: Writer, args: dict):
+    writer.uint(len(args["progress"]))
+    for task_id, progress, checks in args["progress"]:
+        writer.task_id(task_id)
+        writer.bigint(progress)
+        writer.uint(checks)
+
+def _read_solve_progress(reader: Reader) -> dict:
+    return {"progress": [(reader.task_id(), reader.bigint(), reader.uint()) for _ in range(reader.uint())]}
+
+_MEMBER_FORMAT = "IBHd" # incarnation, state, cores, rate
+_MEMBER_SIZE = struct.calcsize(">" + _MEMBER_FORMAT)
+_STATE_CODES = {state: code for code, state in enumerate(STATES)}
+
+def _write_gossip(writer: Writer, args: dict):
+    writer.uint(args["reply"])
+    writer.uint(args["full"])
+    # members: the addresses, then a block of (incarnation, state, cores, rate) (the rate is NaN when unknown)
+    members = args["members"]
+    writer.strings([member["address"] for member in members])
+    writer.buffer += struct.pack(">" + _MEMBER_FORMAT * len(members), *[value for member in members for value in
+                                 (member["incarnation"], _STATE_CODES[member["state"]], member["cores"], member["rate"] if member["rate"] is not None else math.nan)])
+    # counters: the owners, a block of (version, solved, invalid, number of nodes), then the nodes of every owner
+    counters = args["counters"]
+    writer.strings([entry["owner"] for entry in counters])
+    writer.ints([value for entry in counters for value in (entry["version"], entry["solved"], entry["invalid"], len(entry["nodes"]))])
+    nodes = [st_info for entry in counters for st_info in entry["nodes"]]
+    writer.strings([st_info["address"] for st_info in nodes])
+    writer.ints(_nodes_counters(nodes, WORKER_STATS))
+    _write_cache(writer, args["cache"])
+
+def _read_gossip(reader: Reader) -> dict:
+    reply, full = bool(reader.uint()), bool(reader.uint())
+    addresses = reader.strings()
+    values = struct.unpack(">" + _MEMBER_FORMAT * len(addresses), reader._take(_MEMBER_SIZE * len(addresses)))
+    if addresses and max(values[1::4]) >= len(STATES):
+        raise EncodingError("Unknown member state.")
+    members = [{"address": address, "incarnation": incarnation, "state": STATES[state], "cores": cores, "rate": None if rate != rate else rate} # NaN: unknown
+               for address, incarnation, state, cores, rate in zip(addresses, values[0::4], values[1::4], values[2::4], values[3::4])]
+
+    owners = reader.strings()
+    values = reader.ints(4 * len(owners))
+    addresses = reader.strings()
+    if len(addresses) != sum(values[3::4]):
+        raise EncodingError("Wrong number of nodes.")
+    nodes = _nodes_stats(addresses, reader.ints(len(addresses) * len(WORKER_STATS)), WORKER_STATS)
+    counters, offset = [], 0
+    for i, owner in enumerate(owners):
+        version, solved, invalid, count = values[4 * i:4 * i + 4]
+        counters.append({"owner": owner, "version": version, "solved": solved, "invalid": invalid, "nodes": nodes[offset:offset + count]})
+        offset += count
+    return {"reply": reply, "full": full, "members": members, "counters": counters, "cache": _read_cache(reader)}
+
+def _write_batch(writer: Writer, args: dict):
+    writer.uint(len(args["payloads"]))
+    for payload in args["payloads"]:
+        writer.uint(len(payload))
+        writer.buffer += payload
+
+def _read_batch(reader: Reader) -> dict:
+    return {"payloads": [reader._take(reader.uint()) for _ in range(reader.uint())]}
+
+def _write_cancel(writer: Writer, args: dict):
+    writer.uint(args["sudoku_id"])
+    writer.optional(args["task_id"], writer.task_id)
+
+def _read_cancel(reader: Reader) -> dict:
+    return {"sudoku_id": reader.uint(), "task_id": reader.optional(reader.task_id)}
+
+FIELDS = {
+    "FLOODING_HELLO": (_write_flooding_hello, _read_flooding_hello),
+    "FLOODING_CONFIRMATION": (_write_flooding_confirmation, _read_flooding_confirmation),
+    "JOIN_REQUEST": (None, None),
+    "JOIN_REPLY": (_write_join_reply, _read_join_reply),
+    "SOLVE_REQUEST": (_write_solve_request, _read_solve_request),
+    "SOLVE_REPLY": (_write_solve_reply, _read_solve_reply),
+    "SOLVE_PROGRESS": (_write_solve_progress, _read_solve_progress),
+    "CANCEL": (_write_cancel, _read_cancel),
+    "GOSSIP": (_write_gossip, _read_gossip),
+    "BATCH": (_write_batch, _read_batch),
+}
+
+
+def encode_message(data: dict) -> bytes:
+    """Payload of a message (command, reply address and args)."""
+    writer = Writer()
+    command = data["command"]
+    writer.buffer.append(VERSION)
+    writer.buffer.append(COMMAND_CODES[command])
+    writer.optional(data.get("replyAddress"), writer.string)
+
+    write, _ = FIELDS[command]
+    try:
+        if write is not None:
+            write(writer, data["args"])
+    except struct.error as e:
+        raise EncodingError(str(e)) # counters or strings out of range
+    return bytes(writer.buffer)
+
+def decode_message(payload: bytes) -> dict:
+    """Message data (as built by the messages) of a payload."""
+    reader = Reader(payload)
+    version = reader.byte()
+    if version != VERSION:
+        raise EncodingError(f"Unsupported version {version}.")
+    code = reader.byte()
+    if not 1 <= code <= len(COMMANDS):
+        raise EncodingError(f"Unknown command {code}.")
+    command = COMMANDS[code - 1]
+
+    data = {"command": command}
+    replyAddress = reader.optional(reader.string)
+    if replyAddress is not None:
+        data["replyAddress"] = replyAddress
+
+    _, read = FIELDS[command]
+    if read is not None:
+        data["args"] = read(reader)
+    reader.end()
+    return data
+
+def encode_batch(payloads: List[bytes]) -> bytes:
+    """Payload of several messages to the same peer (one frame)."""
+    return encode_message({"command": "BATCH", "args": {"payloads": payloads}})
+
+def frame(payload: bytes) -> bytes:
+    """Length-prefixed frame of a payload."""
+    if len(payload) > MAX_MESSAGE_SIZE:
+        raise EncodingError(f"Message of {len(payload)} bytes is too big.")
+    return LENGTH.pack(len(payload)) + payload
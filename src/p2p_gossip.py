@@ -0,0 +1,215 @@
+import heapq
+import math
+import random
+import time
+from typing import Dict, List, Tuple
+from src.p2p_loadbalancer import WORKER_STATS
+
+# Gossip mode (instead of the full mesh flooding): every round a node sends a
+# GOSSIP to `fanout` members and each one answers with its own GOSSIP
+# (push-pull). The messages piggyback the latest membership updates and stats
+# counters: each update is sent RETRANSMIT_MULT * log2(N) times (infection
+# style), and every few rounds one of the exchanges has everything
+# (anti-entropy, repairs the updates that did not reach everyone).
+#
+# Failure detection (SWIM): a member that does not answer a GOSSIP in time is
+# suspected and the suspicion is gossiped. The member refutes it with a higher
+# incarnation, otherwise it is dead after the suspicion timeout.
+#
+# Stats: every node instance owns grow-only counters (solved, invalid and the
+# validations/checks it credited to each worker) with a version. The merge
+# keeps the highest version of each owner and the stats are the sums, so they
+# converge without rounds of agreement.
+
+ALIVE, SUSPECT, DEAD = "alive", "suspect", "dead"
+STATES = [ALIVE, SUSPECT, DEAD]
+
+RETRANSMIT_MULT = 3 # times log2(N) each update is piggybacked
+
+
+def log_size(members: int) -> int:
+    """log2 of the number of members (at least 1)."""
+    return max(1, math.ceil(math.log2(members + 1)))
+
+
+class Rumors:
+    """Updates to piggyback on the next messages (the least sent first), each sent up to a limit."""
+
+    def __init__(self):
+        self.transmissions = {} # key -> times sent
+
+    def add(self, key):
+        self.transmissions[key] = 0
+
+    def take(self, count: int, limit: int) -> List:
+        keys = heapq.nsmallest(count, self.transmissions, key=self.transmissions.get)
+        for key in keys:
+            self.transmissions[key] += 1
+            if self.transmissions[key] >= limit:
+                del self.transmissions[key]
+        return keys
+
+
+class Membership:
+    """SWIM-style membership: the state and incarnation of every member."""
+
+    def __init__(self, address: str, cores: int = 1, rate: float = None):
+        self.address = address
+        self.incarnation = int(time.time()) # a restarted node starts above its old incarnations
+        self.members: Dict[str, dict] = {
+            address: {"address": address, "incarnation": self.incarnation, "state": ALIVE, "cores": cores, "rate": rate}
+        }
+        self.suspected: Dict[str, float] = {} # address -> time of the suspicion
+        self.dead = set()
+        self.probes: Dict[str, float] = {}    # address -> time of the first GOSSIP not answered yet
+        self.order: List[str] = []            # members left to gossip with in this pass (shuffled)
+        self.rumors = Rumors()
+        self.rumors.add(address)
+
+    def size(self) -> int:
+        """Members not dead (with the node itself)."""
+        return len(self.members) - len(self.dead)
+
+    def retransmit_limit(self) -> int:
+        return RETRANSMIT_MULT * log_size(self.size())
+
+    def state(self, address: str) -> str:
+        member = self.members.get(address)
+        return member["state"] if member is not None else None
+
+    @staticmethod
+    def _overrides(new: dict, old: dict) -> bool:
+        """SWIM precedence: a higher incarnation wins, with the same incarnation suspect beats alive and dead beats both."""
+        if new["incarnation"] != old["incarnation"]:
+            return new["incarnation"] > old["incarnation"]
+        return STATES.index(new["state"]) > STATES.index(old["state"])
+
+    def apply(self, entry: dict) -> str:
+        """Merge an entry received by gossip, returns the new state of the member if it changed."""
+        address = entry["address"]
+        if address == self.address:
+            if entry["state"] != ALIVE and entry["incarnation"] >= self.incarnation:
+                # refute the suspicion (or the death) with a new incarnation
+                self.incarnation = entry["incarnation"] + 1
+                self.members[address]["incarnation"] = self.incarnation
+                self.rumors.add(address)
+            return None
+
+        current = self.members.get(address)
+        if current is not None and not self._overrides(entry, current):
+            return None
+        self.members[address] = dict(entry)
+        self.rumors.add(address)
+        if current is not None and current["state"] == entry["state"]:
+            return None
+        return self._changed(address, entry["state"])
+
+    def _changed(self, address: str, state: str) -> str:
+        if state == SUSPECT:
+            self.suspected[address] = time.time()
+        else:
+            self.suspected.pop(address, None)
+        if state == DEAD:
+            self.dead.add(address)
+            self.probes.pop(address, None)
+        else:
+            self.dead.discard(address)
+        return state
+
+    def _set_state(self, address: str, state: str) -> str:
+        """Local decision about a member (gossiped with its incarnation)."""
+        self.members[address]["state"] = state
+        self.rumors.add(address)
+        return self._changed(address, state)
+
+    def probe_sent(self, address: str):
+        self.probes.setdefault(address, time.time())
+
+    def answered(self, address: str):
+        """A message arrived from the member."""
+        self.probes.pop(address, None)
+
+    def check_timeouts(self, probe_timeout: float, suspicion_timeout: float) -> List[Tuple[str, str]]:
+        """Suspect the members that did not answer, and declare dead the suspicions that were not refuted."""
+        changes = []
+        now = time.time()
+        for address, sent_time in list(self.probes.items()):
+            if now - sent_time > probe_timeout:
+                del self.probes[address]
+                if self.state(address) == ALIVE:
+                    changes.append((address, self._set_state(address, SUSPECT)))
+        for address, suspected_time in list(self.suspected.items()):
+            if now - suspected_time > suspicion_timeout:
+                changes.append((address, self._set_state(address, DEAD)))
+        return changes
+
+    def select_peers(self, count: int) -> List[str]:
+        """Next members to gossip with (round robin over a shuffled list, every member is reached in a bounded time)."""
+        candidates = [address for address, member in self.members.items() if address != self.address and member["state"] != DEAD]
+        peers = []
+        while len(peers) < min(count, len(candidates)):
+            if not self.order:
+                self.order = [address for address in candidates if address not in peers]
+                random.shuffle(self.order)
+            address = self.order.pop()
+            if address not in peers and self.state(address) not in (None, DEAD):
+                peers.append(address)
+        return peers
+
+    def piggyback(self, count: int, full: bool = False) -> List[dict]:
+        """Member entries of the next message: the node itself and the least sent updates (or every member)."""
+        if full:
+            return list(self.members.values())
+        addresses = [address for address in self.rumors.take(count, self.retransmit_limit()) if address != self.address]
+        return [self.members[self.address]] + [self.members[address] for address in addresses]
+
+
+class GossipCounters:
+    """Grow-only stats counters of every node instance, merged by version."""
+
+    def __init__(self, owner: str):
+        self.owner = owner
+        self.table: Dict[str, dict] = {owner: {"owner": owner, "version": 0, "solved": 0, "invalid": 0, "nodes": []}}
+        self.rumors = Rumors()
+
+    def add(self, solved: int, invalid: int, workers: Dict[str, dict]):
+        """Count the stats of this node since the last call (worker address -> {baseName: increment})."""
+        workers = {address: increments for address, increments in workers.items() if any(increments.values())}
+        if solved == 0 and invalid == 0 and not workers:
+            return
+        mine = self.table[self.owner]
+        nodes = {st_info["address"]: dict(st_info) for st_info in mine["nodes"]}
+        for address, increments in workers.items():
+            st_info = nodes.setdefault(address, dict({baseName: 0 for baseName in WORKER_STATS}, address=address))
+            for baseName in WORKER_STATS:
+                st_info[baseName] += increments[baseName]
+        # a new entry (the merged copies of the peers are never modified)
+        self.table[self.owner] = {"owner": self.owner, "version": mine["version"] + 1, "solved": mine["solved"] + solved,
+                                  "invalid": mine["invalid"] + invalid, "nodes": list(nodes.values())}
+        self.rumors.add(self.owner)
+
+    def merge(self, entries: List[dict]):
+        """Keep the highest version of each owner."""
+        for entry in entries:
+            current = self.table.get(entry["owner"])
+            if current is None or entry["version"] > current["version"]:
+                self.table[entry["owner"]] = entry
+                self.rumors.add(entry["owner"])
+
+    def totals(self) -> Tuple[int, int, Dict[str, dict]]:
+        """Solved, invalid and the counters of each worker, summed over the owners."""
+        solved, invalid, workers = 0, 0, {}
+        for entry in self.table.values():
+            solved += entry["solved"]
+            invalid += entry["invalid"]
+            for st_info in entry["nodes"]:
+                totals = workers.setdefault(st_info["address"], dict.fromkeys(WORKER_STATS, 0))
+                for baseName in WORKER_STATS:
+                    totals[baseName] += st_info[baseName]
+        return solved, invalid, workers
+
+    def piggyback(self, count: int, limit: int, full: bool = False) -> List[dict]:
+        """Counter entries of the next message: the least sent updates (or every owner)."""
+        if full:
+            return list(self.table.values())
+        return [self.table[owner] for owner in self.rumors.take(count, limit)]
@@ -1,20 +1,41 @@
 import time
+import heapq
+import math
+from bisect import bisect_right
 from typing import Dict, List, Tuple, NamedTuple, Deque
 from socket import socket
+from src.sudoku_space import SearchSpace, get_space
+
+# tasks in flight per worker
+INITIAL_WINDOW = 2
+MAX_WINDOW = 8
+
+# task sizing: maximum growth of the size per response
+MAX_TASK_SIZE_GROWTH = 2
+
+# speculative backups: replies of the losing copies still expected (their validations are not counted)
+MAX_LOST_REPLIES = 1024
+
+# per-worker counters agreed by flooding: raw combinations covered, and candidates checked by the official algorithm
+WORKER_STATS = ["validations", "checks"]
 
 class Worker:
     def __init__(self, host_port: str, socket: socket, smoothing_factor: float = 0.50, task_size_factor: float = 0.75):
         self.worker_address = host_port
         self.network = {}
         self.socket = socket
+        self.registry: WorkerRegistry = None # notified when the availability or the response time change
 
         # stats
-        self.stats = {"address": host_port, "validations": 0}
-        self.pending_stats = {"address": host_port, "validations": 0, "internal_validations": 0, "external_validations": 0, "uncommitted_validations": 0}
+        self.stats = {"address": host_port, "validations": 0, "checks": 0}
+        self.pending_stats = {"address": host_port}
+        for baseName in WORKER_STATS:
+            self.pending_stats.update({baseName: 0, "internal_"+baseName: 0, "external_"+baseName: 0, "uncommitted_"+baseName: 0})
 
         # availability
         self.Alive = True       # false when worker is dead ( it means that the worker is not responding or socket was closed )
         self.isAvailable = True # false when worker is working
+        self.isLocal = False    # the node itself (its tasks run in the background of the node, they are never lost)
 
         # flooding response time
         self.last_flooding_received = time.time()
@@ -23,17 +44,69 @@ class Worker:
         self.last_task_sended = time.time()
         self.task_response_time = 10.0   # Exponential Moving Average response time
 
+        # pipelining: up to `window` tasks in flight, adapted to the round trip and the service time
+        self.in_flight: Dict[TaskID, Tuple[float, bool]] = {} # task id -> (time sent, sent to an idle worker)
+        self.window = INITIAL_WINDOW
+        self.last_task_done = 0.0
+        self.service_time = task_size_factor # Exponential Moving Average time to solve a task (without the round trip)
+        self.rtt = 0.0                       # Exponential Moving Average round trip (response time of a task sent to an idle worker - service time)
+
         # response time factor
         self.smoothing_factor = smoothing_factor
 
-        # worker task size
-        self.task_size = 1000
+        # worker task size (tasks take about task_size_factor seconds)
+        self.task_size = 1000 # per core
+        self.cores = 1
         self.task_size_factor = task_size_factor
-
-    def start_task(self):
-        """Worker start a task."""
-        self.isAvailable = False
+        self.rate = None # validations per second of a core (measured by the worker at startup, then with the completed tasks)
+
+    # availability and response time are properties: every change updates the registry indexes
+
+    @property
+    def Alive(self) -> bool:
+        return self._Alive
+
+    @Alive.setter
+    def Alive(self, value: bool):
+        self._Alive = value
+        if self.registry is not None:
+            self.registry.update(self)
+
+    @property
+    def isAvailable(self) -> bool:
+        return self._isAvailable
+
+    @isAvailable.setter
+    def isAvailable(self, value: bool):
+        self._isAvailable = value
+        if self.registry is not None:
+            self.registry.update(self)
+
+    @property
+    def task_response_time(self) -> float:
+        return self._task_response_time
+
+    @task_response_time.setter
+    def task_response_time(self, value: float):
+        self._task_response_time = value
+        if self.registry is not None:
+            self.registry.update(self)
+
+    def calibrate(self, rate: float):
+        """Seed the task size with the measured rate (only the first time, then the response times adapt it)."""
+        if self.rate is not None or not rate:
+            return
+        self.rate = rate
+        self.task_size = max(1, int(rate * self.task_size_factor)) # a task takes about task_size_factor seconds
+        self.task_response_time = self.service_time = self.task_size_factor
+        if self.registry is not None:
+            self.registry.update(self)
+
+    def start_task(self, task_id=None):
+        """Worker start a task (one more task in flight)."""
         self.last_task_sended = time.time()
+        self.in_flight[task_id] = (self.last_task_sended, len(self.in_flight) == 0)
+        self.isAvailable = len(self.in_flight) < self.window
 
     def flooding_received(self):  
         """Worker give signs of aliveness.""" 
@@ -41,24 +114,59 @@ class Worker:
         print(f"Worker {self.worker_address} is alive. {self.task_response_time}")
         self.last_flooding_received = time.time()
 
-    def task_done(self):  
-        """Worker give signs of aliveness.""" 
+    def task_done(self, task_id=None, worker_time: float = None):  
+        """Worker give signs of aliveness (a task in flight is done, it was `worker_time` seconds in the worker if known).""" 
+        sent_time, wasIdle = self.in_flight.pop(task_id, (self.last_task_sended, True))
+        validations = task_id.end - task_id.start if task_id is not None else None
+        self.update_task_response_time(sent_time, worker_time, wasIdle, validations)
+        self.isAvailable = len(self.in_flight) < self.window
+
+    def cancel_task(self, task_id):
+        """A task in flight was cancelled (its time does not measure the worker)."""
+        self.in_flight.pop(task_id, None)
+        self.isAvailable = len(self.in_flight) < self.window
+
+    def clear_tasks(self):
+        """Forget the tasks in flight (they are not working anymore)."""
+        self.in_flight.clear()
         self.isAvailable = True
-        self.update_task_response_time()
 
-    def update_task_response_time(self):
-        """Update the task response time given a new response."""
-        elapsed_time = time.time() - self.last_task_sended
-        self.last_task_sended = time.time()
+    def update_task_response_time(self, sent_time: float = None, worker_time: float = None, wasIdle: bool = True, validations: int = None):
+        """Update the task response time, the service time, the window and the task size given a new response."""
+        now = time.time()
+        sent_time = sent_time if sent_time is not None else self.last_task_sended
+        elapsed_time = now - sent_time
         self.task_response_time = (self.smoothing_factor * elapsed_time +
                                     (1 - self.smoothing_factor) * self.task_response_time)
-        
-        if self.task_size == 0:
-            self.task_size = 1 
 
-        # limit task_response_time to task_size_factor with task_size
-        self.task_size = int(self.task_size * (self.task_size_factor / self.task_response_time))
-        # print(f"TASK : {self.task_size}, {self.task_size_factor} {self.task_response_time}")
+        # worker_time: seconds the task spent in the worker (queued and solving), if known
+        if worker_time is not None:
+            rtt = max(0.0, elapsed_time - worker_time)
+            self.rtt = self.smoothing_factor * rtt + (1 - self.smoothing_factor) * self.rtt
+
+        # service time: the time between the replies if the task was queued behind another one,
+        # bounded by the time in the worker (the worker could have been idle between the replies)
+        service_time = max(0.0, elapsed_time - self.rtt) if worker_time is None else worker_time
+        if not wasIdle:
+            service_time = min(service_time, now - self.last_task_done)
+        self.service_time = self.smoothing_factor * service_time + (1 - self.smoothing_factor) * self.service_time
+        self.last_task_done = now
+
+        # enough tasks in flight to cover the round trip (bandwidth-delay product)
+        self.window = max(1, min(MAX_WINDOW, 1 + math.ceil(self.rtt / max(self.service_time, 1e-6))))
+        
+        # throughput of a core, measured with the completed range
+        if validations and service_time > 0:
+            rate = validations / self.cores / service_time
+            self.rate = rate if self.rate is None else self.smoothing_factor * rate + (1 - self.smoothing_factor) * self.rate
+        self.update_task_size()
+
+    def update_task_size(self):
+        """Size the tasks to take task_size_factor seconds with the measured rate."""
+        if self.rate is None:
+            return
+        task_size = max(1, int(self.rate * self.task_size_factor))
+        self.task_size = min(task_size, MAX_TASK_SIZE_GROWTH * self.task_size) # noisy measures of small tasks do not explode the size
 
     def isFloodingTimeout(self):
         if self.Alive == False:
@@ -71,15 +179,90 @@ class Worker:
 
         return not self.Alive
     
-    def isTaskTimeout(self):
-        elapsed_time = time.time() - self.last_task_sended
+    def isTaskTimeout(self, sent_time: float = None):
+        elapsed_time = time.time() - (sent_time if sent_time is not None else self.last_task_sended)
         return elapsed_time > 100 * self.task_response_time
 
     def crash(self):
-        """Crash the worker"""
+        """Crash the worker (once per death: the tasks it had in flight are not response time samples)."""
+        self.in_flight.clear()
+
+        # multiplicative decrease: smaller tasks when it comes back
+        if self.rate is not None:
+            self.rate /= 2
+        self.task_size = max(1, self.task_size // 2)
+
         self.Alive = False
         self.isAvailable = True # for future reconnection
-        self.update_task_response_time()
+
+# Index of the workers: the alive workers (in insertion order) and a heap of the
+# ready (alive and available) workers by task response time. Workers notify the
+# registry of every change, the heap entries of old states are discarded lazily
+# (each worker has a version, incremented on every change).
+
+class WorkerRegistry:
+    """Workers by address, with the alive workers and the best ready worker indexed."""
+
+    def __init__(self):
+        self.workers: Dict[str, Worker] = {}
+        self.alive: Dict[str, Worker] = {}
+        self.alive_list: List[Worker] = None # cached list of the alive workers (rebuilt after a change)
+        self.ready_heap: List[Tuple[float, int, int, Worker]] = [] # (task_response_time, order, version, worker)
+        self.versions: Dict[str, int] = {}
+        self.order = 0 # ties of the heap in insertion order
+        self.capacities: Dict[str, float] = {} # validations per second of each alive worker (all cores)
+        self.capacity = 0.0
+
+    def add(self, worker: Worker):
+        """Add (or replace) a worker."""
+        self.workers[worker.worker_address] = worker
+        worker.registry = self
+        self.update(worker)
+
+    def update(self, worker: Worker):
+        """Reindex a worker after a change."""
+        if self.workers.get(worker.worker_address) is not worker:
+            return
+        host_port = worker.worker_address
+        self.versions[host_port] = self.versions.get(host_port, 0) + 1
+
+        if worker.Alive != (host_port in self.alive):
+            if worker.Alive:
+                self.alive[host_port] = worker
+            else:
+                del self.alive[host_port]
+            self.alive_list = None
+
+        self.capacity -= self.capacities.pop(host_port, 0.0)
+        if worker.Alive and worker.rate is not None:
+            self.capacities[host_port] = worker.rate * worker.cores
+            self.capacity += self.capacities[host_port]
+
+        if worker.Alive and worker.isAvailable:
+            self.order += 1
+            heapq.heappush(self.ready_heap, (worker.task_response_time, self.order, self.versions[host_port], worker))
+            if len(self.ready_heap) > 2 * len(self.workers) + 16:
+                self._compact()
+
+    def best_ready(self) -> Worker:
+        """Ready worker with the lowest task response time (None if there is none)."""
+        while self.ready_heap:
+            _, _, version, worker = self.ready_heap[0]
+            if version == self.versions[worker.worker_address]:
+                return worker
+            heapq.heappop(self.ready_heap) # old state of the worker
+        return None
+
+    def get_alive(self) -> List[Worker]:
+        if self.alive_list is None:
+            self.alive_list = list(self.alive.values())
+        return self.alive_list
+
+    def _compact(self):
+        """Drop the old states of the heap."""
+        self.ready_heap = [entry for entry in self.ready_heap if entry[2] == self.versions[entry[3].worker_address]]
+        heapq.heapify(self.ready_heap)
+
 
 class TaskID(NamedTuple):
     sudoku_id: int
@@ -97,35 +280,163 @@ class TaskID(NamedTuple):
     def get_start_end(self):
         return self.start, self.end
 
+# Pending (abandoned) ranges of the sudokus, waiting for a new worker.
+#
+# The ranges of each sudoku are disjoint and kept sorted by start (a list of
+# starts for the binary searches and a dict start -> end), adjacent ranges are
+# merged when added. Tasks are carved from the last range of a sudoku (by
+# default the oldest one): splitting it only changes the last start, so
+# handing out tasks does not shift the lists.
+
+class PendingRanges:
+    """Set of pending ranges, grouped by sudoku id."""
+
+    def __init__(self):
+        self.starts: Dict[int, List[int]] = {}      # sudoku_id -> sorted starts (sudokus in insertion order)
+        self.ends: Dict[int, Dict[int, int]] = {}   # sudoku_id -> start -> end
+        self.count = 0 # number of ranges
+
+    def __len__(self) -> int:
+        return self.count
+
+    def __contains__(self, task_id: TaskID) -> bool:
+        """Check if the whole range of the task is pending."""
+        index = self._find(task_id)
+        return index is not None
+
+    def size(self, sudoku_id: int = None) -> int:
+        """Number of pending combinations (of a sudoku or of every sudoku)."""
+        sudoku_ids = [sudoku_id] if sudoku_id is not None else list(self.ends)
+        return sum(end - start for id in sudoku_ids for start, end in self.ends.get(id, {}).items())
+
+    def add(self, task_id: TaskID):
+        """Add a range (merged with the adjacent pending ranges)."""
+        if task_id.start >= task_id.end:
+            return
+        starts = self.starts.setdefault(task_id.sudoku_id, [])
+        ends = self.ends.setdefault(task_id.sudoku_id, {})
+        start, end = task_id.start, task_id.end
+
+        index = bisect_right(starts, start)
+        # merge with the next range
+        if index < len(starts) and starts[index] == end:
+            end = ends.pop(starts[index])
+            del starts[index]
+            self.count -= 1
+        # merge with the previous range
+        if index > 0 and ends[starts[index - 1]] == start:
+            ends[starts[index - 1]] = end
+            return
+
+        starts.insert(index, start)
+        ends[start] = end
+        self.count += 1
+
+    def has_sudoku(self, sudoku_id: int) -> bool:
+        """Check if a sudoku has pending ranges."""
+        return sudoku_id in self.starts
+
+    def take(self, size: int, sudoku_id: int = None) -> TaskID:
+        """Carve a task of (at most) `size` combinations (of a sudoku, by default the oldest one), None if there are no pending ranges."""
+        if sudoku_id is None:
+            sudoku_id = next(iter(self.starts), None)
+        if sudoku_id not in self.starts:
+            return None
+        starts, ends = self.starts[sudoku_id], self.ends[sudoku_id]
+
+        start = starts[-1]
+        end = ends.pop(start)
+        if end - start <= size:
+            starts.pop()
+            self.count -= 1
+            if not starts:
+                del self.starts[sudoku_id], self.ends[sudoku_id]
+            return TaskID(sudoku_id, start, end)
+
+        starts[-1] = start + size # the rest of the range keeps its position
+        ends[start + size] = end
+        return TaskID(sudoku_id, start, start + size)
+
+    def remove(self, task_id: TaskID) -> bool:
+        """Remove a range (it can be a part of a pending range). Returns False if it is not pending."""
+        index = self._find(task_id)
+        if index is None:
+            return False
+        starts, ends = self.starts[task_id.sudoku_id], self.ends[task_id.sudoku_id]
+        start = starts[index]
+        end = ends.pop(start)
+        del starts[index]
+        self.count -= 1
+
+        # keep the parts of the range outside the task
+        if end > task_id.end:
+            starts.insert(index, task_id.end)
+            ends[task_id.end] = end
+            self.count += 1
+        if start < task_id.start:
+            starts.insert(index, start)
+            ends[start] = task_id.start
+            self.count += 1
+
+        if not starts:
+            del self.starts[task_id.sudoku_id], self.ends[task_id.sudoku_id]
+        return True
+
+    def purge(self, sudoku_id: int):
+        """Remove every range of a sudoku."""
+        if sudoku_id in self.starts:
+            self.count -= len(self.starts[sudoku_id])
+            del self.starts[sudoku_id], self.ends[sudoku_id]
+
+    def _find(self, task_id: TaskID) -> int:
+        """Index of the pending range that contains the task range (None if there is none)."""
+        starts = self.starts.get(task_id.sudoku_id)
+        if not starts or task_id.start >= task_id.end:
+            return None
+        index = bisect_right(starts, task_id.start) - 1
+        if index < 0 or self.ends[task_id.sudoku_id][starts[index]] < task_id.end:
+            return None
+        return index
+
+
 class Task:
     def __init__(self, task_id: TaskID, worker: Worker, tries_limit: int = 1):
         self.task_id = task_id
         
         self.worker = worker
-        worker.start_task()
+        worker.start_task(task_id)
+        self.sent_time = time.time() # timeouts are per task (the worker can have other tasks in flight)
         
         # Limit retries of the task
         self.tries = 0
         self.tries_limit = tries_limit
 
+        self.isLost = False # a speculative copy of the task replied first (only this copy is cancelled)
+        self.progress = task_id.start # combinations before it already examined (reported by the worker)
+        self.checks = 0 # candidates of the examined combinations checked by the official algorithm
+
     def has_timed_out(self) -> bool:
         """Check if the task has exceeded its time limit."""
-        return not self.worker.Alive or self.worker.isTaskTimeout()
+        if self.worker.isLocal:
+            return False
+        return not self.worker.Alive or self.worker.isTaskTimeout(self.sent_time)
 
     def has_exceeded_tries(self) -> bool:
         """Check if the task has exceeded its retry limit."""
         return self.tries >= self.tries_limit
 
     def retry(self):
-        """Increment the number of tries."""
+        """Increment the number of tries (the task is sent again)."""
         self.tries += 1
+        self.sent_time = time.time()
 
 # Dynamic Splitter of Sudoku
 class SudokuDynamicSplitter:
-    def __init__(self, sudoku: str, sudoku_id: int):
+    def __init__(self, sudoku: str, sudoku_id: int, space: str = "digits"):
         self.sudoku = sudoku
         self.sudoku_id = sudoku_id
         self.solution = None
+        self.space: SearchSpace = get_space(space, sudoku) # combinations covered by the tasks
         
         _emptyCells = self._count_zeros(sudoku)
         if _emptyCells == 0:
@@ -133,8 +444,8 @@ class SudokuDynamicSplitter:
             self.end = 0
             self.solution = sudoku
         else:
-            self.start = int(_emptyCells * '1')
-            self.end = int("1" + _emptyCells * '0')
+            self.start = self.space.start
+            self.end = self.space.end
 
     def get_splitted_task_id(self, task_size: int) -> TaskID:
         """Get a task of a given size."""
@@ -159,101 +470,166 @@ class SudokuDynamicSplitter:
         return self.start < self.end    
 
 # Workers & Tasks Manager (load balancer)
+#
+# Many sudokus are solved at the same time (one splitter per HTTP request).
+# The workers are shared round robin: every task goes to the next sudoku with
+# tasks, so a hard sudoku does not block the easy ones queued behind it.
+
 class WTManager:
-    def __init__(self, logger):
+    def __init__(self, logger, space: str = "digits", task_time: float = 0.75):
         # workers manager
-        self.workersDict: Dict[str, Worker] = {}
+        self.registry = WorkerRegistry()
+        self.workersDict: Dict[str, Worker] = self.registry.workers
+        self.task_time = task_time # target duration of the tasks (seconds)
 
         self.sudoku_id = 0
-        self.current_sudoku : SudokuDynamicSplitter = None
+        self.sudokus: Dict[int, SudokuDynamicSplitter] = {} # sudoku_id -> sudoku being solved (in arrival order)
+        self.last_turn = 0 # sudoku id of the last task (round robin)
+        self.space = space # search space of the splitted sudokus
 
         # tasks manager
-        self.pending_tasks_queue: List[TaskID] = [] # TaskID, ..
+        self.pending_tasks = PendingRanges() # abandoned ranges
         self.working_tasks: Dict[TaskID, Task] = {} # TaskID -> Task
+        self.backup_tasks: Dict[TaskID, Task] = {} # TaskID -> speculative copy of a working task (on another worker)
+        self.lost_replies: Dict[Tuple[str, TaskID], float] = {} # (host_port, TaskID) of the copies that lost the race -> time
 
         self.logger = logger  
 
     def get_task_to_worker(self, worker: Worker) -> Task:
-        """Get the task to assign to a worker."""
-        task_size = worker.task_size
+        """Get the task to assign to a worker (from the next sudoku with tasks)."""
+        task_size = worker.task_size * worker.cores
+        sudokus = self.get_sudokus_with_tasks()
+        sudoku = self.next_sudoku(sudokus)
         
-        if self.current_sudoku.has_tasks():
-            task_id = self.current_sudoku.get_splitted_task_id(task_size)
+        if sudoku.has_tasks():
+            task_size = self.get_tail_task_size(worker, task_size, sudoku, len(sudokus))
+            task_id = sudoku.get_splitted_task_id(task_size)
             return Task(task_id, worker)
 
-        task_id = self.pending_tasks_queue[0]
-        if task_id.end - task_id.start <= task_size:
-            # this task was abandoned by another worker
-            self.pending_tasks_queue.remove(task_id)
-            return Task(task_id, worker) 
-        else:
-            task_id = self.pending_tasks_queue.pop(0)
-            
-            new_task_id = TaskID(task_id.sudoku_id, task_id.start, task_id.start + task_size)
-            old_task_id = TaskID(task_id.sudoku_id, task_id.start + task_size, task_id.end)
-            self.pending_tasks_queue.insert(0, old_task_id)
-            return Task(new_task_id, worker)
-
+        # a range abandoned by another worker (split if it is bigger than the task size)
+        task_id = self.pending_tasks.take(task_size, sudoku.sudoku_id)
+        return Task(task_id, worker)
+
+    def get_sudokus_with_tasks(self) -> List[SudokuDynamicSplitter]:
+        """Unsolved sudokus with ranges to assign (not splitted yet or abandoned)."""
+        return [sudoku for sudoku in self.sudokus.values()
+                if sudoku.solution is None and (sudoku.has_tasks() or self.pending_tasks.has_sudoku(sudoku.sudoku_id))]
+
+    def next_sudoku(self, sudokus: List[SudokuDynamicSplitter]) -> SudokuDynamicSplitter:
+        """Round robin: the first sudoku after the last one served."""
+        sudoku = next((sudoku for sudoku in sudokus if sudoku.sudoku_id > self.last_turn), sudokus[0])
+        self.last_turn = sudoku.sudoku_id
+        return sudoku
+
+    def get_tail_task_size(self, worker: Worker, task_size: int, sudoku: SudokuDynamicSplitter, sharing: int = 1) -> int:
+        """Smaller tasks at the end of the sudoku: with less than a task per worker left,
+        each worker gets its share of the remaining range (the last tasks finish together).
+        The workers are shared by the `sharing` sudokus with tasks."""
+        if worker.rate is None:
+            return task_size
+        worker_capacity = worker.rate * worker.cores
+        capacity = self.registry.capacity + (worker_capacity if worker.isLocal else 0) # the coordinator is not alive, but works
+        capacity /= sharing
+        remaining = sudoku.end - sudoku.start
+        if capacity <= 0 or remaining / capacity >= worker.task_size_factor:
+            return task_size
+        return max(1, min(task_size, math.ceil(remaining * worker_capacity / capacity)))
 
     def update_worker_flooding(self, worker):
         """Update the worker flooding time."""
         worker.flooding_received()
-        isWorking = False
-        if worker.isAvailable == False:
-            for task in self.working_tasks.values():
-                if task.worker == worker:
-                    isWorking = True
-            if not isWorking:
-                worker.task_done() 
-                self.logger.info("UPDATE WORKER FLOODING: Worker is available again.") # with low probability!       
-
-    def add_pending_task(self, sudoku: str):
-        """Add a task to the pending queue."""
+        if worker.in_flight and not any(task_id in self.working_tasks for task_id in worker.in_flight):
+            worker.clear_tasks()
+            self.logger.info("UPDATE WORKER FLOODING: Worker is available again.") # with low probability!       
+
+    def add_pending_task(self, sudoku: str) -> int:
+        """Add a sudoku to solve. Returns its id."""
         
         self.sudoku_id += 1 
-        self.current_sudoku = SudokuDynamicSplitter(sudoku, self.sudoku_id)
+        self.sudokus[self.sudoku_id] = SudokuDynamicSplitter(sudoku, self.sudoku_id, self.space)
+        return self.sudoku_id
+
+    def get_sudoku(self, sudoku_id: int) -> SudokuDynamicSplitter:
+        """Get a sudoku being solved (None if it is done)."""
+        return self.sudokus.get(sudoku_id)
 
     def add_worker(self, host_port: str, socket: socket) -> Worker:
         """Create and add a worker to the workers list."""
-        worker = Worker(host_port, socket)
-        self.workersDict[host_port] = worker
+        worker = Worker(host_port, socket, task_size_factor=self.task_time)
+        self.registry.add(worker)
         return worker
 
-    def finish_task(self, task_id: TaskID, solution: str = None):
-        """Remove a task from the working list."""
+    def finish_task(self, task_id: TaskID, solution: str = None, worker_time: float = None, worker: Worker = None) -> List[Task]:
+        """Remove a task from the working list (`worker` replied, by default the worker of the task).
+        Returns the tasks cancelled by a solution and the speculative copy that lost the race."""
+        cancelled_tasks = []
         task = self.working_tasks.get(task_id)
-        if task is not None:
-            task.worker.task_done()
+        backup = self.backup_tasks.get(task_id)
+        if task is not None and worker is not None and worker is not task.worker and (backup is None or worker is not backup.worker):
+            pass # a late reply of a dead worker whose task went to its speculative copy (only its solution is used)
+        elif task is not None:
+            winner, loser = task, self.backup_tasks.pop(task_id, None)
+            if loser is not None and worker is loser.worker:
+                winner, loser = loser, winner # the speculative copy replied first
+
+            winner.worker.task_done(task_id, worker_time)
             del self.working_tasks[task_id]
+
+            if loser is not None:
+                loser.worker.cancel_task(task_id)
+                loser.isLost = True
+                cancelled_tasks.append(loser)
+                self.add_lost_reply(loser)
         else:
-            try:
-                if task_id in self.pending_tasks_queue:
-                    self.pending_tasks_queue.remove(task_id) # the responser is a dead worker
-            except ValueError:
-                pass # the task was already done
-
-        if solution is not None:
-            self.current_sudoku.solution = solution
+            self.pending_tasks.remove(task_id) # the responser is a dead worker (nothing to do if the task was already done)
+
+        if solution is not None and task_id.sudoku_id in self.sudokus:
+            self.sudokus[task_id.sudoku_id].solution = solution
             
             # remove the sudoku from other workers 
             working_copy = self.working_tasks.copy()
             for t in working_copy.keys():
                 if t.sudoku_id == task_id.sudoku_id:
-                    self.working_tasks[t].worker.task_done() # worker is available again
+                    self.working_tasks[t].worker.cancel_task(t) # worker is available again
+                    cancelled_tasks.append(self.working_tasks[t])
                     del self.working_tasks[t]    
+
+            for t in [t for t in self.backup_tasks if t.sudoku_id == task_id.sudoku_id]:
+                backup = self.backup_tasks.pop(t)
+                backup.worker.cancel_task(t)
+                cancelled_tasks.append(backup)
+                self.add_lost_reply(backup) # the original task already counts the range
             
-            pending_copy = self.pending_tasks_queue.copy()
-            for t in pending_copy:
-                if t.sudoku_id == task_id.sudoku_id:
-                    self.pending_tasks_queue.remove(t)    
+            self.pending_tasks.purge(task_id.sudoku_id)
+
+        return cancelled_tasks
+
+    def add_lost_reply(self, task: Task):
+        """The reply of this copy of the task must not be counted again."""
+        self.lost_replies[(task.worker.worker_address, task.task_id)] = time.time()
+        if len(self.lost_replies) > MAX_LOST_REPLIES:
+            del self.lost_replies[next(iter(self.lost_replies))] # the oldest (its worker probably died)
+
+    def is_lost_reply(self, host_port: str, task_id: TaskID) -> bool:
+        """Check if a reply comes from a copy that lost the race (its validations are already counted)."""
+        return self.lost_replies.pop((host_port, task_id), None) is not None
 
     def isDone(self) -> bool:
-        """Check if all tasks are done."""
-        return self.current_sudoku.solution is not None or (not self.current_sudoku.has_tasks() and not self.has_pending_tasks() and not self.has_working_tasks())
+        """Check if every sudoku is done."""
+        return len(self.sudokus) == 0
+
+    def pop_done_sudokus(self) -> List[SudokuDynamicSplitter]:
+        """Remove and return the sudokus that are done (solved, or every range checked without a solution)."""
+        working = {task_id.sudoku_id for task_id in self.working_tasks}
+        done = [sudoku for sudoku in self.sudokus.values()
+                if sudoku.solution is not None or (not sudoku.has_tasks() and not self.pending_tasks.has_sudoku(sudoku.sudoku_id) and sudoku.sudoku_id not in working)]
+        for sudoku in done:
+            del self.sudokus[sudoku.sudoku_id]
+        return done
 
     def has_pending_tasks(self) -> bool:
         """Check if there are pending tasks."""
-        return len(self.pending_tasks_queue) > 0
+        return len(self.pending_tasks) > 0
 
     def has_working_tasks(self) -> bool:
         """Check if there are working tasks."""
@@ -261,12 +637,12 @@ class WTManager:
 
     def has_tasks(self) -> bool:
         """Check if there are tasks available."""
-        return (self.has_pending_tasks() or self.current_sudoku.has_tasks())
+        return len(self.get_sudokus_with_tasks()) > 0
 
     def kill_worker(self, host_port: str, close_socket = True):
         """Kill a worker."""
         worker = self.workersDict.get(host_port)
-        worker.crash()
+        worker.crash() # once, not per task in flight
 
         # close the socket if connection to worker fail!
         if close_socket:
@@ -279,19 +655,59 @@ class WTManager:
             if task.worker == worker:
                 self.unassign_task(task) 
 
+        # the original tasks of its speculative copies go on
+        for task_id in [task_id for task_id, backup in self.backup_tasks.items() if backup.worker == worker]:
+            del self.backup_tasks[task_id]
+
     def unassign_task(self, task: Task):
-        """Remove a task from the working list and add it back to the pending queue."""
-        self.pending_tasks_queue.append(task.task_id)
-        task.worker.crash()
-        del self.working_tasks[task.task_id]
+        """Remove a task from the working list and add it back to the pending queue (or keep its speculative copy).
+        Only the range not examined yet goes back, the examined part counts as validations and checks of the worker."""
+        task_id = task.task_id
+        backup = self.backup_tasks.pop(task_id, None)
+        if backup is not None:
+            self.working_tasks[task_id] = backup
+            self.add_lost_reply(task) # the speculative copy counts the range, not a late reply of the dead worker
+        else:
+            self.pending_tasks.add(TaskID(task_id.sudoku_id, task.progress, task_id.end))
+            del self.working_tasks[task_id]
+            if task.progress > task_id.start:
+                task.worker.pending_stats["uncommitted_validations"] += task.progress - task_id.start
+                task.worker.pending_stats["uncommitted_checks"] += task.checks
+                self.add_lost_reply(task) # a late reply of the task is not counted again
+
+    def fail_task(self, task_id: TaskID, worker: Worker):
+        """A worker could not search a task (it failed in the pool): the range goes back to the pending queue, nothing counts as searched."""
+        task = self.working_tasks.get(task_id)
+        backup = self.backup_tasks.get(task_id)
+        if backup is not None and backup.worker is worker:
+            del self.backup_tasks[task_id] # the original task goes on
+        elif task is not None and task.worker is worker:
+            if backup is not None:
+                self.working_tasks[task_id] = self.backup_tasks.pop(task_id) # its speculative copy goes on
+            else:
+                self.pending_tasks.add(task_id)
+                del self.working_tasks[task_id]
+        else:
+            return
+        worker.cancel_task(task_id)
+
+    def task_progress(self, task_id: TaskID, progress: int, checks: int, worker: Worker):
+        """A worker examined the combinations of a task before `progress` (with `checks` official checks)."""
+        task = self.working_tasks.get(task_id)
+        backup = self.backup_tasks.get(task_id)
+        if backup is not None and backup.worker is worker:
+            task = backup
+        if task is not None and task.worker is worker:
+            task.progress = max(task.progress, min(progress, task_id.end))
+            task.checks = max(task.checks, checks)
 
     def get_ready_workers(self) -> List[Worker]:
         """Get the list of ready workers."""
-        return [worker for worker in self.workersDict.values() if worker.isAvailable and worker.Alive]
+        return [worker for worker in self.get_alive_workers() if worker.isAvailable]
 
     def get_alive_workers(self) -> List[Worker]:
         """Get the list of alive workers."""
-        return [worker for worker in self.workersDict.values() if worker.Alive]
+        return self.registry.get_alive()
     
     def get_alive_workers_address(self) -> List[str]:
         """Get the list of alive workers addresses."""
@@ -315,7 +731,7 @@ class WTManager:
                 if task.has_exceeded_tries():
                     self.logger.warning(f"Task {task.task_id} has timed out. [Exceeded Retries]")
                     # task expired
-                    self.kill_worker(task.worker)
+                    self.kill_worker(task.worker.worker_address)
                 else:
                     retry_tasks.append(task) # client must retry !!
                     task.retry()
@@ -324,11 +740,7 @@ class WTManager:
 
     def get_best_worker(self) -> Worker:
         """Get the worker with the lowest task response time."""
-        best_worker = None
-        for worker in self.get_ready_workers():
-            if best_worker is None or worker.task_response_time < best_worker.task_response_time:
-                best_worker = worker
-        return best_worker
+        return self.registry.best_ready()
 
     def get_tasks_to_send(self) -> List[Task]:
         """Get new tasks with associated workers."""
@@ -345,8 +757,46 @@ class WTManager:
 
             worker = self.get_best_worker() # get the next best worker
 
+        if not self.has_tasks():
+            new_work_tasks += self.get_backup_tasks()
+
         return new_work_tasks
 
+    def get_backup_tasks(self) -> List[Task]:
+        """Speculative copies of the slowest working tasks on idle workers (only at the end of a sudoku)."""
+        idle_workers = sorted((worker for worker in self.get_ready_workers() if not worker.in_flight), key=lambda worker: worker.task_response_time)
+        if not idle_workers:
+            return []
+
+        # longest running first
+        running = sorted((task for task_id, task in self.working_tasks.items() if task_id not in self.backup_tasks), key=lambda task: task.sent_time)
+
+        backups = []
+        for task in running:
+            if not idle_workers:
+                break
+            worker = idle_workers[0]
+            if worker is task.worker or not self.is_straggler(task, worker):
+                continue
+
+            idle_workers.pop(0)
+            backup = Task(task.task_id, worker)
+            self.backup_tasks[task.task_id] = backup
+            backups.append(backup)
+            self.logger.info(f"Speculative copy of task {task.task_id} on {worker.worker_address} (running on {task.worker.worker_address}).")
+        return backups
+
+    def is_straggler(self, task: Task, worker: Worker) -> bool:
+        """Check if the idle worker is expected to finish the task before its worker."""
+        now = time.time()
+        size = task.task_id.end - task.task_id.start
+        expected_end = task.sent_time + task.worker.task_response_time
+        if worker.rate:
+            backup_end = now + worker.rtt + size / (worker.rate * worker.cores)
+        else:
+            backup_end = now + worker.task_response_time
+        return backup_end < expected_end or now - task.sent_time > 2 * task.worker.task_response_time
+
 
     
 
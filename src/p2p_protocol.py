@@ -1,6 +1,7 @@
 from socket import socket
-import pickle
+from typing import List
 from src.p2p_loadbalancer import TaskID
+from src.p2p_encoding import LENGTH, MAX_MESSAGE_SIZE, EncodingError, encode_message, decode_message, frame
 
 class Message:
     """Message Type."""
@@ -11,12 +12,15 @@ class Message:
             self.data["replyAddress"] = replyAddress
 
     def to_bytes(self) -> bytes:
-        return pickle.dumps(self.data)
+        return encode_message(self.data)
     
+# Versions of the stats entries of the flooding messages (see StatsDeltas): not versioned, all the entries
+FULL_SYNC = {"version": 0, "since": 0, "ack": 0, "removed": []}
+
 class FloodingHelloMessage(Message):
     """Message to communicate baseValue and incrementedValue."""
     
-    def __init__(self, replyAddress: str, aliveNodes: list, pending_stats: dict):
+    def __init__(self, replyAddress: str, aliveNodes: list, pending_stats: dict, cores: int = 1, cache: list = None, rate: float = None, sync: dict = None):
         super().__init__("FLOODING_HELLO", replyAddress)       
          
         stats = {
@@ -28,12 +32,12 @@ class FloodingHelloMessage(Message):
                 st_info for st_info in pending_stats["nodes"]
             ]
         } 
-        self.data["args"] = {"aliveNodes": aliveNodes, "stats": stats}
+        self.data["args"] = {"aliveNodes": aliveNodes, "stats": stats, "cores": cores, "cache": cache if cache is not None else [], "rate": rate, "sync": sync if sync is not None else FULL_SYNC}
         
 class FloodingConfirmationMessage(Message):
     """Message to confirm the flooding result."""
 
-    def __init__(self, replyAddress: str, stats: dict):
+    def __init__(self, replyAddress: str, stats: dict, sync: dict = None):
         super().__init__("FLOODING_CONFIRMATION", replyAddress)
         
         stats = {
@@ -45,7 +49,7 @@ class FloodingConfirmationMessage(Message):
                 st_info for st_info in stats["nodes"]
             ] 
         } 
-        self.data["args"] = {"stats": stats}
+        self.data["args"] = {"stats": stats, "sync": sync if sync is not None else FULL_SYNC}
         
 class JoinRequestMessage(Message):
     """Message to join the P2P network."""
@@ -56,38 +60,59 @@ class JoinRequestMessage(Message):
 class JoinReplyMessage(Message):
     """Message to replay to a joining node."""
     
-    def __init__(self, aliveNodes: list):
+    def __init__(self, aliveNodes: list, rate: float = None):
         super().__init__("JOIN_REPLY")
-        self.data["args"] = {"aliveNodes": aliveNodes}
+        self.data["args"] = {"aliveNodes": aliveNodes, "rate": rate}
 
 class SolveRequestMessage(Message):
     """Message to request to solve a task."""
     
-    def __init__(self, replyAddress:str, task_id: TaskID, sudoku: str):
+    def __init__(self, replyAddress:str, task_id: TaskID, sudoku: str, space: str = "digits"):
         super().__init__("SOLVE_REQUEST", replyAddress)
-        self.data["args"] = {"task_id": task_id, "sudoku": sudoku}
+        self.data["args"] = {"task_id": task_id, "sudoku": sudoku, "space": space}
 
 class SolveReplyMessage(Message):
     """Message to reply a solve request."""
     
-    def __init__(self, replyAddress: str, task_id: TaskID, solution: str = None):
+    def __init__(self, replyAddress: str, task_id: TaskID, solution: str = None, validations: int = 0, checks: int = 0, elapsed: float = None):
         super().__init__("SOLVE_REPLY", replyAddress)
-        self.data["args"] = {"task_id": task_id, "solution": solution}
+        self.data["args"] = {"task_id": task_id, "solution": solution, "validations": validations, "checks": checks, "elapsed": elapsed}
+
+class SolveProgressMessage(Message):
+    """Message to report the combinations already examined of the running tasks."""
+
+    def __init__(self, replyAddress: str, progress: list):
+        super().__init__("SOLVE_PROGRESS", replyAddress)
+        self.data["args"] = {"progress": progress} # [(task_id, first combination not examined, checks so far), ..]
+
+class CancelMessage(Message):
+    """Message to cancel the tasks of a sudoku (or a single task)."""
+
+    def __init__(self, replyAddress: str, sudoku_id: int, task_id: TaskID = None):
+        super().__init__("CANCEL", replyAddress)
+        self.data["args"] = {"sudoku_id": sudoku_id, "task_id": task_id}
+
+class GossipMessage(Message):
+    """Message of the gossip mode: membership updates and stats counters (answered with another one if it is not an answer)."""
+
+    def __init__(self, replyAddress: str, reply: bool, full: bool, members: list, counters: list, cache: list = None):
+        super().__init__("GOSSIP", replyAddress)
+        self.data["args"] = {"reply": reply, "full": full, "members": members, "counters": counters, "cache": cache if cache is not None else []}
 
     
 class P2PProtocol:
     """P2P Protocol."""
         
     @classmethod
-    def flooding_hello(cls, replyAddress: str, aliveNodes: list, pending_stats: dict, workers_stats: list) -> FloodingHelloMessage:
+    def flooding_hello(cls, replyAddress: str, aliveNodes: list, pending_stats: dict, workers_stats: list, cores: int = 1, cache: list = None, rate: float = None, sync: dict = None) -> FloodingHelloMessage:
         """Creates a SolveRequestMessage object."""
         pending_stats["nodes"] = workers_stats
-        return FloodingHelloMessage(replyAddress, aliveNodes, pending_stats)
+        return FloodingHelloMessage(replyAddress, aliveNodes, pending_stats, cores, cache, rate, sync)
 
     @classmethod
-    def flooding_confirmation(cls, replyAddress: str, stats: dict ) -> FloodingConfirmationMessage:
+    def flooding_confirmation(cls, replyAddress: str, stats: dict, sync: dict = None) -> FloodingConfirmationMessage:
         """Creates a FloodingConfirmationMessage object."""
-        return FloodingConfirmationMessage(replyAddress, stats)
+        return FloodingConfirmationMessage(replyAddress, stats, sync)
 
     @classmethod
     def join_request(cls, replyAddress: str) -> JoinRequestMessage:
@@ -95,64 +120,137 @@ class P2PProtocol:
         return JoinRequestMessage(replyAddress)
 
     @classmethod
-    def join_reply(cls, aliveNodes: list) -> JoinReplyMessage:
+    def join_reply(cls, aliveNodes: list, rate: float = None) -> JoinReplyMessage:
         """Creates a JoinReplyMessage object."""
-        return JoinReplyMessage(aliveNodes)
+        return JoinReplyMessage(aliveNodes, rate)
 
     @classmethod
-    def solve_request(cls, replyAddress: str, task_id: TaskID, sudoku: str) -> SolveRequestMessage:
+    def solve_request(cls, replyAddress: str, task_id: TaskID, sudoku: str, space: str = "digits") -> SolveRequestMessage:
         """Creates a SolveRequestMessage object."""
-        return SolveRequestMessage(replyAddress, task_id, sudoku)
+        return SolveRequestMessage(replyAddress, task_id, sudoku, space)
     
     @classmethod
-    def solve_reply(cls, replyAddress: str, task_id: TaskID, solution: str = None) -> SolveReplyMessage:
+    def solve_reply(cls, replyAddress: str, task_id: TaskID, solution: str = None, validations: int = 0, checks: int = 0, elapsed: float = None) -> SolveReplyMessage:
         """Creates a SolveRequestMessage object."""
-        return SolveReplyMessage(replyAddress, task_id, solution)
+        return SolveReplyMessage(replyAddress, task_id, solution, validations, checks, elapsed)
+
+    @classmethod
+    def solve_progress(cls, replyAddress: str, progress: list) -> SolveProgressMessage:
+        """Creates a SolveProgressMessage object."""
+        return SolveProgressMessage(replyAddress, progress)
+
+    @classmethod
+    def cancel(cls, replyAddress: str, sudoku_id: int, task_id: TaskID = None) -> CancelMessage:
+        """Creates a CancelMessage object."""
+        return CancelMessage(replyAddress, sudoku_id, task_id)
+
+    @classmethod
+    def gossip(cls, replyAddress: str, reply: bool, full: bool, members: list, counters: list, cache: list = None) -> GossipMessage:
+        """Creates a GossipMessage object."""
+        return GossipMessage(replyAddress, reply, full, members, counters, cache)
     
     @classmethod
     def send_msg(cls, socket: socket, msg: Message):
-        """Sends through a socket a Message object."""
+        """Sends through a (blocking) socket a Message object."""
 
-        # Object message -> Bytes (via pickle)
-        message = msg.to_bytes()
-
-        # Create a header with the length
-        header = len(message).to_bytes(2, byteorder='big')
+        # Object message -> Bytes (binary encoding), with a header with the length
+        message = frame(msg.to_bytes())
 
         # Send through the socket
-        socket.send(header + message)
+        socket.sendall(message)
 
     @classmethod
     def recv_msg(cls, socket: socket) -> Message:
-        """Receives through a connection a Message object."""
+        """Receives through a (blocking) connection a Message object."""
         
         # Receive message size
-        size = int.from_bytes(socket.recv(2),'big')
+        header = cls._recv_exactly(socket, LENGTH.size)
+
+        if header is None: return None # Client disconnected
+
+        size = LENGTH.unpack(header)[0]
+        if size > MAX_MESSAGE_SIZE:
+            raise P2PProtocolBadFormat(header)
+
+        received = cls._recv_exactly(socket, size)
+        if received is None: return None # Client disconnected in the middle of the message
 
-        if (size == 0): return None # Client disconnected
+        return cls.decode_msg(received)
 
-        received = socket.recv(size)
+    @classmethod
+    def _recv_exactly(cls, socket: socket, size: int) -> bytes:
+        """Exactly `size` bytes (recv can return less), None if the connection is closed."""
+        chunks = []
+        while size > 0:
+            chunk = socket.recv(size)
+            if len(chunk) == 0:
+                return None
+            chunks.append(chunk)
+            size -= len(chunk)
+        return b"".join(chunks)
+
+    @classmethod
+    def read_frames(cls, buffer: bytearray) -> List[bytes]:
+        """Removes from the buffer the complete frames and returns their payloads (a partial frame stays in the buffer)."""
+        payloads = []
+        offset = 0
+        while len(buffer) - offset >= LENGTH.size:
+            size = LENGTH.unpack_from(buffer, offset)[0]
+            if size > MAX_MESSAGE_SIZE:
+                raise P2PProtocolBadFormat(bytes(buffer[offset:offset + LENGTH.size]))
+            end = offset + LENGTH.size + size
+            if end > len(buffer):
+                break # the rest of the message has not arrived yet
+            payloads.append(bytes(buffer[offset + LENGTH.size:end]))
+            offset = end
+        del buffer[:offset] # once per read (not per frame)
+        return payloads
 
+    @classmethod
+    def decode_msgs(cls, received: bytes) -> List[Message]:
+        """Payload of a frame -> Message objects (every message of a BATCH)."""
         try:
-            # decoding PICKLE to Message
-            data = pickle.loads(received) 
-        except Exception:
-            raise P2PProtocolBadFormat(received)     
+            data = decode_message(received)
+        except EncodingError:
+            raise P2PProtocolBadFormat(received)
+
+        if data["command"] != "BATCH":
+            return [cls.decode_msg(received, data)]
+        return [cls.decode_msg(payload) for payload in data["args"]["payloads"]] # a nested BATCH is rejected
+
+    @classmethod
+    def decode_msg(cls, received: bytes, data: dict = None) -> Message:
+        """Payload of a frame -> Message object."""
+
+        if data is None:
+            try:
+                # decoding the binary payload to Message
+                data = decode_message(received) 
+            except EncodingError:
+                raise P2PProtocolBadFormat(received)     
         
         command = data.get("command") 
+        if "replyAddress" not in data and command != "JOIN_REPLY":
+            raise P2PProtocolBadFormat(received) # every other message is answered to its sender
 
         if command == "FLOODING_HELLO":
-            return FloodingHelloMessage(data["replyAddress"], data["args"]["aliveNodes"], data["args"]["stats"])
+            return FloodingHelloMessage(data["replyAddress"], data["args"]["aliveNodes"], data["args"]["stats"], data["args"]["cores"], data["args"]["cache"], data["args"]["rate"], data["args"]["sync"])
         elif command == "FLOODING_CONFIRMATION":
-            return FloodingConfirmationMessage(data["replyAddress"], data["args"]["stats"])    
+            return FloodingConfirmationMessage(data["replyAddress"], data["args"]["stats"], data["args"]["sync"])    
         elif command == "JOIN_REQUEST":
             return JoinRequestMessage(data["replyAddress"])
         elif command == "JOIN_REPLY":
-            return JoinReplyMessage(data["args"]["aliveNodes"])
+            return JoinReplyMessage(data["args"]["aliveNodes"], data["args"]["rate"])
         elif command == "SOLVE_REQUEST":
-            return SolveRequestMessage(data["replyAddress"], data["args"]["task_id"], data["args"]["sudoku"])
+            return SolveRequestMessage(data["replyAddress"], data["args"]["task_id"], data["args"]["sudoku"], data["args"]["space"])
         elif command == "SOLVE_REPLY":
-            return SolveReplyMessage(data["replyAddress"], data["args"]["task_id"], data["args"]["solution"])
+            return SolveReplyMessage(data["replyAddress"], data["args"]["task_id"], data["args"]["solution"], data["args"]["validations"], data["args"]["checks"], data["args"]["elapsed"])
+        elif command == "SOLVE_PROGRESS":
+            return SolveProgressMessage(data["replyAddress"], data["args"]["progress"])
+        elif command == "CANCEL":
+            return CancelMessage(data["replyAddress"], data["args"]["sudoku_id"], data["args"]["task_id"])
+        elif command == "GOSSIP":
+            return GossipMessage(data["replyAddress"], data["args"]["reply"], data["args"]["full"], data["args"]["members"], data["args"]["counters"], data["args"]["cache"])
         else:
             raise P2PProtocolBadFormat(received)
 
@@ -167,4 +265,4 @@ class P2PProtocolBadFormat(Exception):
     @property
     def original_msg(self) -> str:
         """Retrieve original message as a string."""
-        return self._original.decode("utf-8")
+        return self._original.decode("utf-8", errors="replace")
@@ -1,9 +1,10 @@
 import socket
 import selectors
 import time
-from threading import Thread
+from threading import Thread, Lock
 from queue import Queue
-from src.p2p_protocol import P2PProtocol
+from src.p2p_protocol import P2PProtocol, P2PProtocolBadFormat, Message
+from src.p2p_encoding import frame, encode_batch
 
 class P2PServer(Thread):
     def __init__(self, logger, host, port):
@@ -17,6 +18,16 @@ class P2PServer(Thread):
 
         self.selector = selectors.DefaultSelector()
 
+        # Per-connection buffers (non-blocking sockets: recv and send can move only part of a message)
+        self.recv_buffers = {}          # incoming socket -> bytes of the next (incomplete) frames
+        self.send_buffers = {}          # outgoing socket -> bytes not sent yet (waiting for EVENT_WRITE)
+        self.send_locker = Lock()       # the node thread sends, this thread flushes the rest
+        self.write_requests = []        # outgoing sockets to register for EVENT_WRITE (only this thread uses the selector)
+        self._wakeup_recv, self._wakeup_send = socket.socketpair() # wakes up the select for the write requests
+        self._wakeup_recv.setblocking(False)
+        self._wakeup_send.setblocking(False)
+        self.RECV_SIZE = 256 * 1024     # bytes per recv call
+
         self.last_request = time.time()
         self.average_request = 0
         
@@ -41,6 +52,7 @@ class P2PServer(Thread):
 
         self.logger.info(f"P2P Server started {self.replyAddress}")
         self.selector.register(self._socket, selectors.EVENT_READ, self.handle_new_connection)
+        self.selector.register(self._wakeup_recv, selectors.EVENT_READ, self.handle_write_requests)
 
         while True:
             # Wait for events
@@ -62,21 +74,136 @@ class P2PServer(Thread):
         self.logger.debug(f"P2P: New connection from {addr}")
 
         # Handle future data from this client  
-        self.selector.register(socket, mask, self.handle_requests)  
+        with self.send_locker:
+            self._drop_closed() # its file descriptor can be the one of a closed socket
+            self.recv_buffers[socket] = bytearray()
+            self.selector.register(socket, selectors.EVENT_READ, self.handle_requests)  
         
     def handle_requests(self, sock, mask):
-        """Handle incoming data."""
-        message = P2PProtocol.recv_msg(sock)
-        
-        # Client disconnected
-        if message == None:
-            self.logger.debug(f"Client {sock.getpeername()} disconnected.")
-            self.selector.unregister(sock)
-            sock.close()
-            return
-        
-        #self.logger.debug(f"Received message {message} from {sock.getpeername()}")
-        self.last_request = time.time()
-        self.request_queue.put(message)
+        """Handle incoming data (every complete message of the available bytes)."""
+        buffer = self.recv_buffers[sock]
+        disconnected = False
 
+        # Pull the available bytes
+        while True:
+            try:
+                chunk = sock.recv(self.RECV_SIZE)
+            except BlockingIOError:
+                break
+            except OSError:
+                disconnected = True
+                break
+            if len(chunk) == 0:
+                disconnected = True # Client disconnected
+                break
+            buffer += chunk
+            if len(chunk) < self.RECV_SIZE:
+                break # nothing more for now
+
+        # Extract the complete frames (a partial frame waits for the next event)
+        try:
+            payloads = P2PProtocol.read_frames(buffer)
+        except P2PProtocolBadFormat as e:
+            self.logger.error(f"P2P: Corrupted stream from {self._peer(sock)}: {e.original_msg!r}")
+            payloads, disconnected = [], True
+
+        for payload in payloads:
+            try:
+                messages = P2PProtocol.decode_msgs(payload)
+            except P2PProtocolBadFormat as e:
+                self.logger.error(f"P2P: Bad message from {self._peer(sock)}: {e.original_msg!r}")
+                continue # the frame was complete, the next ones are still aligned
+            
+            for message in messages:
+                #self.logger.debug(f"Received message {message} from {sock.getpeername()}")
+                self.request_queue.put(message)
+        if payloads:
+            self.last_request = time.time()
+
+        if disconnected:
+            self.logger.debug(f"Client {self._peer(sock)} disconnected.")
+            with self.send_locker:
+                self.selector.unregister(sock)
+                del self.recv_buffers[sock]
+            sock.close()
 
+    def handle_write_requests(self, sock, mask):
+        """Wait to write to the sockets where the node thread queued bytes."""
+        try:
+            sock.recv(4096)
+        except BlockingIOError:
+            pass
+        with self.send_locker:
+            self._drop_closed() # their file descriptors can be the ones of the new sockets
+            requests, self.write_requests = self.write_requests, []
+            for sock in requests:
+                if sock in self.send_buffers:
+                    self.selector.register(sock, selectors.EVENT_WRITE, self.handle_writes)
+
+    def handle_writes(self, sock, mask):
+        """Send the rest of the queued messages of a peer."""
+        with self.send_locker:
+            if sock not in self.send_buffers:
+                return # dropped after the select
+            try:
+                self._flush(sock)
+            except OSError:
+                self.logger.debug(f"P2P: Failed to send to {self._peer(sock)}.")
+                self._discard(sock)
+                sock.close() # the next send raises, and the node kills the worker
+
+    def send(self, sock, msg: Message):
+        """Send a message through a (non-blocking) socket to a peer. The bytes that do not fit in
+        the socket are queued in order and sent by this thread. Raises OSError if the connection failed."""
+        self._send_frame(sock, frame(msg.to_bytes()))
+
+    def send_batch(self, sock, payloads: list):
+        """Send encoded messages to a peer in one frame (a BATCH if there are several)."""
+        self._send_frame(sock, frame(payloads[0] if len(payloads) == 1 else encode_batch(payloads)))
+
+    def _send_frame(self, sock, data: bytes):
+        with self.send_locker:
+            if sock in self.send_buffers:
+                self.send_buffers[sock] += data # after the queued messages
+                return
+
+            try:
+                sent = sock.send(data)
+            except BlockingIOError:
+                sent = 0 # the socket buffer is full
+            if sent < len(data):
+                self.send_buffers[sock] = bytearray(data[sent:])
+                self.write_requests.append(sock) # registered by this thread (the selector is not thread-safe)
+                try:
+                    self._wakeup_send.send(b"\0")
+                except BlockingIOError:
+                    pass # a wakeup is already pending
+
+    def _flush(self, sock):
+        """Send as much as possible of the queued bytes (with the lock)."""
+        buffer = self.send_buffers[sock]
+        while buffer:
+            try:
+                sent = sock.send(buffer)
+            except BlockingIOError:
+                return
+            del buffer[:sent]
+        self._discard(sock) # everything sent
+
+    def _discard(self, sock):
+        """Stop waiting to write to a socket (with the lock)."""
+        del self.send_buffers[sock]
+        self.selector.unregister(sock)
+
+    def _drop_closed(self):
+        """Forget the outgoing sockets closed by the node with queued bytes (with the lock)."""
+        for sock in [sock for sock in self.send_buffers if sock.fileno() == -1]:
+            del self.send_buffers[sock]
+            if sock not in self.write_requests:
+                self.selector.unregister(sock)
+
+    def _peer(self, sock):
+        try:
+            return sock.getpeername()
+        except OSError:
+            return "closed socket"
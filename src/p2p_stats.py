@@ -0,0 +1,90 @@
+from typing import Dict, List, Tuple
+
+# Per-node entries of the flooding stats sent as deltas.
+#
+# Every message to a peer has a version (counted per peer), the version it is
+# relative to (`since`, the last version acknowledged by the peer, 0 for a full
+# list) and the last version received from the peer (`ack`). It carries only the
+# entries that changed since `since` and the addresses removed since then. The
+# receiver rebuilds the full list from its copy of version `since`, so the
+# consensus gets the same lists as before. When the receiver does not have that
+# version (it restarted, or the sender forgot its acks) it acknowledges 0 and
+# the next message is a full list.
+
+def _entries(nodes: List[dict]) -> Dict[str, dict]:
+    """address -> copy of the entry."""
+    return {st_info["address"]: dict(st_info) for st_info in nodes}
+
+
+class StatsDeltas:
+    """Versions of the stats entries sent to and received from each peer (of one message type)."""
+
+    MAX_UNACKED = 8 # versions kept per peer while waiting for its ack
+
+    def __init__(self):
+        self.sent = {}              # peer -> {version: entries} sent and not acknowledged yet (and the last acknowledged)
+        self.acked = {}             # peer -> last version acknowledged by the peer
+        self.versions = {}          # peer -> last version sent to the peer
+        self.received = {}          # peer -> {version: entries} rebuilt lists of the peer (still usable as a base)
+        self.last_received = {}     # peer -> last version received from the peer (0 asks for a full list)
+
+    def delta(self, peer: str, nodes: List[dict]) -> Tuple[dict, List[dict]]:
+        """Sync info (with the removed addresses) and changed entries of the next message to a peer."""
+        sent = self.sent.setdefault(peer, {})
+        since = self.acked.get(peer, 0)
+        base = sent.get(since, {}) if since > 0 else {}
+        if since > 0 and since not in sent:
+            since = 0 # acknowledged a version this node no longer has (it restarted): full list
+
+        version = self.versions.get(peer, 0) + 1
+        self.versions[peer] = version
+        entries = _entries(nodes)
+        sent[version] = entries
+        for old in [old for old in sent if old <= version - self.MAX_UNACKED]:
+            del sent[old] # the peer is not acknowledging (an ack of these versions gets a full list)
+
+        changed = [st_info for address, st_info in entries.items() if base.get(address) != st_info]
+        removed = [address for address in base if address not in entries]
+        sync = {"version": version, "since": since, "ack": self.last_received.get(peer, 0), "removed": removed}
+        return sync, changed
+
+    def merge(self, peer: str, sync: dict, nodes: List[dict]) -> List[dict]:
+        """Full list of entries of a received message (the changed entries on top of the base version)."""
+        self._acknowledged(peer, sync["ack"])
+        if sync["version"] == 0:
+            return nodes # not versioned, always a full list
+
+        received = self.received.setdefault(peer, {})
+        since = sync["since"]
+        if since > 0 and since not in received:
+            # diverged: use the entries of the message and ask for a full list
+            self.last_received[peer] = 0
+            received.clear()
+            return nodes
+
+        if since == 0:
+            received.clear() # a full list starts again the copy of the peer
+        entries = dict(received.get(since, {}))
+        for address in sync["removed"]:
+            entries.pop(address, None)
+        entries.update(_entries(nodes))
+
+        # the sender only uses versions from `since` on
+        for version in [version for version in received if version < since]:
+            del received[version]
+        received[sync["version"]] = entries
+        self.last_received[peer] = sync["version"]
+        return list(entries.values())
+
+    def _acknowledged(self, peer: str, version: int):
+        """The peer has the list of this version (0: it wants a full list)."""
+        self.acked[peer] = version
+        sent = self.sent.get(peer, {})
+        if version in sent:
+            for old in [old for old in sent if old < version]:
+                del sent[old]
+
+    def forget(self, peer: str):
+        """Full lists again with a peer (it joined again, with a fresh state)."""
+        for versions in [self.sent, self.acked, self.versions, self.received, self.last_received]:
+            versions.pop(peer, None)
@@ -0,0 +1,121 @@
+from collections import OrderedDict
+from threading import Lock
+from typing import List, Tuple
+from src.sudoku_canonical import canonicalize
+from src.sudoku_store import SudokuStore
+
+class SudokuCache:
+    """Node-local LRU cache: puzzle -> solution (None when the puzzle has no solution).
+
+    Entries are keyed by the canonical form of the puzzle (and store the canonical
+    solution), so equivalent puzzles (relabelled, permuted, transposed) share them.
+
+    With a store, the entries are also persisted and the misses are looked up
+    in the store (a restarted node answers the puzzles solved before).
+
+    It is shared by the HTTP threads (lookups) and the node main loop (results
+    and entries received from the peers), so every access holds the locker.
+    """
+
+    def __init__(self, max_size: int = 1000, store: SudokuStore = None):
+        self.max_size = max_size
+        self.store = store
+        self.entries = OrderedDict() # key -> solution, most recently used at the end
+        self.locker = Lock()
+
+        # entries solved by this node, not yet sent to the peers
+        self.to_share: List[Tuple[list, list]] = []
+
+        # counters
+        self.hits = 0
+        self.misses = 0
+        self.answered_solved = 0   # hits answered with a solution, not yet committed to the stats
+        self.answered_invalid = 0  # hits answered without a solution, not yet committed to the stats
+
+    def get(self, sudoku) -> Tuple[bool, list]:
+        """Look up a puzzle. Returns (hit, solution)."""
+        if self.max_size <= 0 and self.store is None:
+            return False, None
+
+        key, transform = canonicalize(sudoku)
+        with self.locker:
+            isCached = key in self.entries
+            if isCached:
+                self.entries.move_to_end(key)
+                solution = self.entries[key]
+
+        if not isCached:
+            isStored, solution = self.store.get(key) if self.store is not None else (False, None)
+            if not isStored:
+                with self.locker:
+                    self.misses += 1
+                return False, None
+
+            solution = [list(solution[r * 9:(r + 1) * 9]) for r in range(9)] if solution is not None else None
+            with self.locker:
+                self._insert(key, solution)
+
+        with self.locker:
+            self.hits += 1
+            if solution is not None:
+                self.answered_solved += 1
+            else:
+                self.answered_invalid += 1
+
+        # canonical solution -> solution of the requested puzzle
+        return True, transform.invert(solution) if solution is not None else None
+
+    def put(self, sudoku, solution, share: bool = True):
+        """Store the result of a puzzle (shared with the peers in the next flooding)."""
+        self._put(sudoku, solution, share)
+        if self.store is not None:
+            self.store.flush()
+
+    def _put(self, sudoku, solution, share: bool):
+        """Store the result of a puzzle, the store is not flushed."""
+        if self.max_size <= 0 and self.store is None:
+            return
+
+        key, transform = canonicalize(sudoku)
+        canonical_solution = transform.apply(solution) if solution is not None else None
+        with self.locker:
+            isNew = key not in self.entries
+            self._insert(key, canonical_solution)
+
+            if share and isNew:
+                self.to_share.append((sudoku, solution))
+
+        if self.store is not None:
+            self.store.put(key, tuple(value for row in canonical_solution for value in row) if canonical_solution is not None else None)
+
+    def _insert(self, key, canonical_solution):
+        """Insert in the LRU (the locker must be held)."""
+        self.entries[key] = canonical_solution
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_size:
+            self.entries.popitem(last=False) # least recently used
+
+    def pop_to_share(self) -> List[Tuple[list, list]]:
+        """Entries to piggyback in the next flooding message."""
+        with self.locker:
+            entries, self.to_share = self.to_share, []
+        return entries
+
+    def merge(self, entries: List[Tuple[list, list]]):
+        """Store the entries received from a peer (not shared again, every node floods its own)."""
+        for sudoku, solution in entries:
+            self._put(sudoku, solution, share=False)
+        if self.store is not None:
+            self.store.flush() # one fsync for the whole message
+
+    def pop_answered(self) -> Tuple[int, int]:
+        """Number of (solved, invalid) requests answered by the cache since the last call."""
+        with self.locker:
+            answered = (self.answered_solved, self.answered_invalid)
+            self.answered_solved = self.answered_invalid = 0
+        return answered
+
+    def get_stats(self) -> dict:
+        """Cache counters (exposed in /stats)."""
+        with self.locker:
+            return {"hits": self.hits, "misses": self.misses, "size": len(self.entries)}
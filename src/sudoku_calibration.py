@@ -0,0 +1,62 @@
+import time
+from src.sudoku_algorithm import SudokuAlgorithm
+from src.sudoku_engine import SudokuEngine, solve_grid
+from src.sudoku_job import SudokuJob
+from src.sudoku_space import get_space
+
+# Startup benchmark of the node: validations per second (per core) of the node
+# engine, search space, pre-filter and handicap, advertised to the peers so the
+# first tasks sent to the node already have a realistic size.
+#
+# The calibration puzzle is fixed (53 empty cells, a single solution) and in
+# every search space its solution is after the measured ranges, so every
+# combination is covered. The engines whose speed does not depend on the size
+# of the range (see SudokuEngine.measurable) are not calibrated.
+
+SOLVED_GRID = [
+    [9, 5, 7, 6, 1, 3, 2, 8, 4],
+    [4, 8, 3, 2, 5, 7, 1, 9, 6],
+    [6, 1, 2, 8, 4, 9, 5, 3, 7],
+    [1, 7, 8, 3, 6, 4, 9, 5, 2],
+    [5, 2, 4, 9, 7, 1, 3, 6, 8],
+    [3, 6, 9, 5, 2, 8, 7, 4, 1],
+    [8, 4, 5, 7, 9, 2, 6, 1, 3],
+    [2, 9, 1, 4, 3, 6, 8, 7, 5],
+    [7, 3, 6, 1, 8, 5, 4, 2, 9],
+]
+EMPTY_CELLS = [ # row * 9 + col
+    3, 4, 6, 7, 8, 9, 10, 11, 12, 13, 14, 16, 17, 18, 20, 21, 23, 27, 28, 29, 31, 32, 34, 35, 39, 40, 41,
+    42, 44, 45, 46, 47, 51, 52, 53, 55, 56, 58, 59, 60, 61, 62, 63, 64, 66, 68, 71, 72, 73, 74, 75, 78, 79,
+]
+
+
+def calibration_grid():
+    grid = [row.copy() for row in SOLVED_GRID]
+    for cell in EMPTY_CELLS:
+        grid[cell // 9][cell % 9] = 0
+    return grid
+
+
+def measure_rate(handicap: float, engine: SudokuEngine, space: str = "digits", prefilter: str = "none", duration: float = 0.5) -> float:
+    """Validations per second of a single core (ranges of doubling size are solved for `duration` seconds), None if the engine is not measurable."""
+    if not engine.measurable:
+        return None
+
+    grid = calibration_grid()
+    search_space = get_space(space, grid)
+    limit = search_space.encode(solve_grid(grid)) # the solution is not measured
+    solverConfig = SudokuAlgorithm(handicap=handicap)
+
+    start, size = search_space.start, 100
+    validations, elapsed = 0, 0.0
+    while elapsed < duration and start + size <= limit:
+        sudoku_job = SudokuJob(grid, start, start + size, solverConfig, engine, space, prefilter=prefilter)
+        begin = time.time()
+        sudoku_job.solve()
+        elapsed += time.time() - begin
+
+        validations += sudoku_job.validations()
+        start += size
+        size *= 2
+
+    return validations / elapsed if elapsed > 0 else 0.0
@@ -0,0 +1,126 @@
+from itertools import islice, permutations, product
+from typing import List, NamedTuple, Tuple
+
+# Canonical form of a puzzle under the sudoku symmetries: digit relabelling,
+# row (column) permutations inside a band (stack), band (stack) permutations
+# and transposition.
+#
+# Rows and columns are first ordered by keys that do not change with those
+# symmetries (number of clues, refined by the clue counts of the crossing
+# lines). Only the orderings left ambiguous by the keys are tried, and the
+# smallest relabelled grid is the canonical form. If there are too many ties
+# the search is truncated: the result is still an equivalent grid (so it is
+# always safe to use), just not always the same for every equivalent puzzle.
+
+MAX_CANDIDATES = 256 # orderings tried per transposition
+
+
+class Transform(NamedTuple):
+    """Symmetry that maps a grid to its canonical form."""
+    transpose: bool
+    rows: Tuple[int, ...]   # canonical row i is the row rows[i] (of the transposed grid, if transpose)
+    cols: Tuple[int, ...]   # canonical col j is the col cols[j]
+    digits: Tuple[int, ...] # canonical digit of each digit (digits[0] == 0)
+
+    def apply(self, grid) -> List[List[int]]:
+        """Transform a grid (e.g. the solution of the original puzzle) to the canonical space."""
+        grid = _transposed(grid) if self.transpose else grid
+        return [[self.digits[grid[r][c]] for c in self.cols] for r in self.rows]
+
+    def invert(self, grid) -> List[List[int]]:
+        """Transform a canonical grid (e.g. a cached solution) back to the original puzzle space."""
+        inverse_digits = [0] * 10
+        for digit, canonical_digit in enumerate(self.digits):
+            inverse_digits[canonical_digit] = digit
+
+        original = [[0] * 9 for _ in range(9)]
+        for i, r in enumerate(self.rows):
+            for j, c in enumerate(self.cols):
+                original[r][c] = inverse_digits[grid[i][j]]
+        return _transposed(original) if self.transpose else original
+
+
+def canonicalize(grid) -> Tuple[Tuple[int, ...], Transform]:
+    """Canonical form of a grid (81 values, row-major) and the transform that produced it."""
+    best, best_transform = None, None
+
+    for transpose in (False, True):
+        g = _transposed(grid) if transpose else grid
+
+        row_counts = [sum(1 for c in range(9) if g[r][c]) for r in range(9)]
+        col_counts = [sum(1 for r in range(9) if g[r][c]) for c in range(9)]
+        row_keys = [(row_counts[r], sorted(col_counts[c] for c in range(9) if g[r][c])) for r in range(9)]
+        col_keys = [(col_counts[c], sorted(row_counts[r] for r in range(9) if g[r][c])) for c in range(9)]
+
+        orderings = product(_orderings(row_keys), _orderings(col_keys))
+        for rows, cols in islice(orderings, MAX_CANDIDATES):
+            relabelled = _relabel(g, rows, cols, best)
+            if relabelled is not None:
+                best, digits = relabelled
+                best_transform = Transform(transpose, rows, cols, digits)
+
+    return best, best_transform
+
+
+def _transposed(grid) -> List[List[int]]:
+    return [[grid[r][c] for r in range(9)] for c in range(9)]
+
+
+def _orderings(keys):
+    """Every line ordering allowed by the keys (sorted bands, sorted lines inside each band, ties permuted)."""
+    bands = []
+    for band in range(3):
+        lines = sorted(range(band * 3, band * 3 + 3), key=lambda line: keys[line])
+        bands.append((tuple(keys[line] for line in lines), lines))
+    bands.sort(key=lambda band: band[0])
+
+    # groups of bands with the same keys can be in any order
+    band_orders = _tie_permutations([band[0] for band in bands], [band[1] for band in bands])
+    for band_order in band_orders:
+        # inside each band, lines with the same key can be in any order
+        line_orders = [_tie_permutations([keys[line] for line in lines], lines) for lines in band_order]
+        for lines in product(*line_orders):
+            yield tuple(line for band_lines in lines for line in band_lines)
+
+
+def _tie_permutations(keys, items) -> List[list]:
+    """Every order of the (sorted) items that only permutes items with the same key."""
+    groups, start = [], 0
+    for i in range(1, len(items) + 1):
+        if i == len(items) or keys[i] != keys[start]:
+            groups.append(items[start:i])
+            start = i
+    return [[item for group in chosen for item in group] for chosen in product(*[list(permutations(group)) for group in groups])]
+
+
+def _relabel(grid, rows, cols, best) -> Tuple[Tuple[int, ...], Tuple[int, ...]]:
+    """Grid in the given line order with the digits renamed by order of appearance.
+    Returns None as soon as it is known not to be smaller than `best`."""
+    digits = [0] * 10
+    next_digit = 1
+    values = []
+    isSmaller = best is None # once a value is smaller than best, the rest is not compared
+    for r in rows:
+        grid_row = grid[r]
+        for c in cols:
+            value = grid_row[c]
+            if value and not digits[value]:
+                digits[value] = next_digit
+                next_digit += 1
+            value = digits[value]
+            if not isSmaller:
+                best_value = best[len(values)]
+                if value > best_value:
+                    return None
+                isSmaller = value < best_value
+            values.append(value)
+
+    if not isSmaller:
+        return None # equal to best
+
+    # digits without clues get the remaining labels (in order)
+    for digit in range(1, 10):
+        if not digits[digit]:
+            digits[digit] = next_digit
+            next_digit += 1
+    return tuple(values), tuple(digits)
@@ -0,0 +1,372 @@
+from typing import Dict, List
+
+try:
+    import numpy as np
+except ImportError:
+    np = None # optional, only used by the vectorized engine
+
+# Bitmask of the digits 1..9 (bit `d` set means digit `d`)
+ALL_DIGITS = 0b1111111110
+
+# Static geometry of the 9x9 grid (cell index = row * 9 + col)
+CELL_ROW = [i // 9 for i in range(81)]
+CELL_COL = [i % 9 for i in range(81)]
+CELL_BOX = [(i // 27) * 3 + (i % 9) // 3 for i in range(81)]
+UNITS = (
+    [[r * 9 + c for c in range(9)] for r in range(9)] +                   # rows
+    [[r * 9 + c for r in range(9)] for c in range(9)] +                   # columns
+    [[(b // 3) * 27 + (b % 3) * 3 + (i // 3) * 9 + i % 3 for i in range(9)] for b in range(9)]  # boxes
+)
+DIGIT_OF_BIT = {1 << d: d for d in range(1, 10)}
+
+
+class SudokuEngine:
+    """Solver engine used by a SudokuJob to search its [start, end) range."""
+    name = None
+    measurable = True # its validations per second do not depend on the puzzle (startup calibration)
+
+    def __init__(self, **options):
+        pass # engine options (from the node arguments) that this engine does not use
+
+    def solve(self, job) -> List[List[int]]:
+        """Return the solution found in the job range (or None)."""
+        raise NotImplementedError
+
+
+class ReferenceEngine(SudokuEngine):
+    """Brute-force enumerator: every combination of the range is decoded and checked."""
+    name = "reference"
+
+    def solve(self, job):
+        # 1. Fill the sudoku with the combinations from start to end
+        for chunk_start in range(job.start, job.end, job.stop_interval):
+            if job.is_stopped(chunk_start):
+                return None
+
+            for comb in range(chunk_start, min(chunk_start + job.stop_interval, job.end)):
+                sudoku = job.space.decode(comb)
+
+                # 2. Check if the sudoku is valid.
+                if job.check(sudoku):
+                    return sudoku
+        return None
+
+
+class PropagationEngine(SudokuEngine):
+    """Candidate-bitmask solver (naked/hidden singles + MRV backtracking).
+
+    The grid is solved directly and the solution is only reported by the job
+    whose range holds the combination of the solution, so the distributed
+    splitting keeps its meaning (exactly one task replies with the solution).
+    """
+    name = "propagation"
+    measurable = False # the grid is solved whatever the range
+
+    def solve(self, job):
+        values = solve_grid(job.grid)
+        if values is None:
+            return None
+
+        # combination of the solution in the job search space
+        comb = job.space.encode(values)
+        if comb is None or not (job.start <= comb < job.end):
+            return None
+
+        solution = [values[r * 9:(r + 1) * 9] for r in range(9)]
+        # Confirm the final grid with the official algorithm
+        if job.check(solution):
+            return solution
+        return None
+
+
+class OdometerEngine(SudokuEngine):
+    """Incremental enumerator: the combination is stepped like an odometer, only the
+    positions that changed are rewritten, and running row/column/box bitmasks find
+    the first conflicting position. A conflicting prefix skips its whole subrange.
+    """
+    name = "odometer"
+    measurable = False # the skipped subranges depend on the puzzle
+
+    def solve(self, job):
+        space = job.space
+        count = len(space.radixes)
+        rows, cols, boxes = [0] * 9, [0] * 9, [0] * 9
+        grid = [v for row in job.grid for v in row]
+
+        for i, v in enumerate(grid):
+            if v == 0:
+                continue
+            bit = 1 << v
+            r, c, b = CELL_ROW[i], CELL_COL[i], CELL_BOX[i]
+            if (rows[r] | cols[c] | boxes[b]) & bit:
+                return None # repeated clue, no combination is valid
+            rows[r] |= bit
+            cols[c] |= bit
+            boxes[b] |= bit
+
+        # weight of each position (last position is the least significant)
+        weights = [1] * count
+        for p in reversed(range(count - 1)):
+            weights[p] = weights[p + 1] * space.radixes[p + 1]
+
+        comb = job.start
+        indexes = []
+        rest = comb
+        for p in range(count):
+            index, rest = divmod(rest, weights[p])
+            indexes.append(index)
+
+        placed = [] # options written in the grid and masks for the positions [0, len(placed))
+        steps = 0
+        while comb < job.end:
+            steps += 1
+            if steps % job.stop_interval == 0 and job.is_stopped(comb):
+                return None
+
+            # Place the positions that changed, stop at the first conflict
+            while len(placed) < count:
+                values = space.options[len(placed)][indexes[len(placed)]]
+                if not self._place(grid, rows, cols, boxes, space.positions[len(placed)], values):
+                    break
+                placed.append(values)
+
+            if len(placed) == count:
+                sudoku = [grid[r * 9:(r + 1) * 9] for r in range(9)]
+                if job.check(sudoku):
+                    return sudoku
+                step = count - 1 # next combination
+            else:
+                step = len(placed) # skip every combination with this invalid prefix
+
+            comb = (comb // weights[step] + 1) * weights[step]
+
+            # Odometer increment at the step position (with carry)
+            while step > 0 and indexes[step] + 1 == space.radixes[step]:
+                step -= 1
+            indexes[step] += 1
+            for p in range(step + 1, count):
+                indexes[p] = 0
+
+            # Erase the positions that changed
+            while len(placed) > step:
+                self._remove(grid, rows, cols, boxes, space.positions[len(placed) - 1], placed.pop())
+
+        return None
+
+    def _place(self, grid, rows, cols, boxes, cells, values) -> bool:
+        """Write the values in the cells if they do not conflict (nothing is written otherwise)."""
+        for n, (cell, value) in enumerate(zip(cells, values)):
+            bit = 1 << value
+            r, c, b = CELL_ROW[cell], CELL_COL[cell], CELL_BOX[cell]
+            if not bit & ALL_DIGITS or (rows[r] | cols[c] | boxes[b]) & bit:
+                self._remove(grid, rows, cols, boxes, cells[:n], values[:n])
+                return False
+            grid[cell] = value
+            rows[r] |= bit
+            cols[c] |= bit
+            boxes[b] |= bit
+        return True
+
+    def _remove(self, grid, rows, cols, boxes, cells, values):
+        """Erase values previously written by _place."""
+        for cell, value in zip(cells, values):
+            bit = 1 << value
+            grid[cell] = 0
+            rows[CELL_ROW[cell]] ^= bit
+            cols[CELL_COL[cell]] ^= bit
+            boxes[CELL_BOX[cell]] ^= bit
+
+
+class VectorizedEngine(SudokuEngine):
+    """Batched enumerator: blocks of combinations are decoded into a (B, 9, 9) array
+    and the grids with a repeated digit in a row, column or box are rejected with
+    array operations. Only the survivors are checked by the official algorithm.
+    """
+    name = "vectorized"
+
+    def __init__(self, block_size: int = 4096, **options):
+        super().__init__(**options)
+        if np is None:
+            raise ImportError("The vectorized engine requires numpy (pip install numpy).")
+        self.block_size = max(1, block_size)
+
+    def solve(self, job):
+        for block_start in range(job.start, job.end, self.block_size):
+            if job.is_stopped(block_start):
+                return None
+
+            block_end = min(block_start + self.block_size, job.end)
+            grids = decode_block(job.space, block_start, block_end)
+
+            # Survivors are in order, so the first one checked as valid is the first solution of the range
+            for index in np.flatnonzero(valid_grids(grids)):
+                sudoku = grids[index].tolist()
+                if job.check(sudoku):
+                    return sudoku
+        return None
+
+
+def decode_block(space, block_start: int, block_end: int):
+    """Decode the combinations [block_start, block_end) of a search space into a (B, 9, 9) uint8 array."""
+    count = block_end - block_start
+
+    # Low positions: smallest suffix of positions able to hold the block offsets (fits in int64)
+    low, low_size = len(space.radixes), 1
+    while low > 0 and low_size < count:
+        low -= 1
+        low_size *= space.radixes[low]
+
+    high_comb, low_base = divmod(block_start, low_size)
+    offsets = low_base + np.arange(count, dtype=np.int64)
+    carries = offsets // low_size # 0 or 1 (low_size >= count > low_base)
+    low_indexes = offsets % low_size
+
+    # High positions are decoded once (at most two values with the carry)
+    grids = np.empty((count, 81), dtype=np.uint8)
+    for carry in np.unique(carries):
+        high_grid = space.decode((high_comb + int(carry)) * low_size)
+        grids[carries == carry] = np.array(high_grid, dtype=np.uint8).reshape(81)
+
+    # Low positions are decoded as arrays (last position is the least significant)
+    for position in reversed(range(low, len(space.radixes))):
+        radix = space.radixes[position]
+        cells = list(space.positions[position])
+        options = np.array(space.options[position], dtype=np.uint8).reshape(radix, len(cells))
+        grids[:, cells] = options[low_indexes % radix]
+        low_indexes //= radix
+
+    return grids.reshape(count, 9, 9)
+
+
+def valid_grids(grids):
+    """Mask of the grids whose rows, columns and boxes hold the digits 1..9 exactly once."""
+    bits = np.left_shift(np.uint16(1), grids.astype(np.uint16)) # digit d -> bit d
+    count = len(grids)
+    rows = np.bitwise_or.reduce(bits, axis=2)
+    cols = np.bitwise_or.reduce(bits, axis=1)
+    boxes = np.bitwise_or.reduce(bits.reshape(count, 3, 3, 3, 3).transpose(0, 1, 3, 2, 4).reshape(count, 9, 9), axis=2)
+    return (rows == ALL_DIGITS).all(axis=1) & (cols == ALL_DIGITS).all(axis=1) & (boxes == ALL_DIGITS).all(axis=1)
+
+
+def solve_grid(grid) -> List[int]:
+    """Solve a 9x9 grid, returns the 81 values (row-major) or None if there is no solution."""
+    values = [v for row in grid for v in row]
+    rows, cols, boxes = [0] * 9, [0] * 9, [0] * 9
+
+    for i, v in enumerate(values):
+        if v == 0:
+            continue
+        bit = 1 << v
+        r, c, b = CELL_ROW[i], CELL_COL[i], CELL_BOX[i]
+        if (rows[r] | cols[c] | boxes[b]) & bit:
+            return None # repeated clue
+        rows[r] |= bit
+        cols[c] |= bit
+        boxes[b] |= bit
+
+    return _search(values, rows, cols, boxes)
+
+
+def _place(values, rows, cols, boxes, i, bit):
+    values[i] = DIGIT_OF_BIT[bit]
+    rows[CELL_ROW[i]] |= bit
+    cols[CELL_COL[i]] |= bit
+    boxes[CELL_BOX[i]] |= bit
+
+
+def _propagate(values, rows, cols, boxes) -> bool:
+    """Place naked and hidden singles until nothing changes. Returns False on a contradiction."""
+    changed = True
+    while changed:
+        changed = False
+
+        # Naked singles (a cell with only one candidate)
+        for i in range(81):
+            if values[i]:
+                continue
+            cand = ALL_DIGITS & ~(rows[CELL_ROW[i]] | cols[CELL_COL[i]] | boxes[CELL_BOX[i]])
+            if cand == 0:
+                return False
+            if cand & (cand - 1) == 0:
+                _place(values, rows, cols, boxes, i, cand)
+                changed = True
+
+        # Hidden singles (a digit with only one place in a unit)
+        for unit in UNITS:
+            once = twice = placed = 0
+            cands = []
+            for i in unit:
+                if values[i]:
+                    placed |= 1 << values[i]
+                    continue
+                cand = ALL_DIGITS & ~(rows[CELL_ROW[i]] | cols[CELL_COL[i]] | boxes[CELL_BOX[i]])
+                cands.append((i, cand))
+                twice |= once & cand
+                once |= cand
+
+            missing = ALL_DIGITS & ~placed
+            if missing & ~once:
+                return False # a digit has no place left in this unit
+            hidden = once & ~twice & missing
+            if hidden == 0:
+                continue
+
+            for i, cand in cands:
+                bit = cand & hidden
+                if bit == 0:
+                    continue
+                if bit & (bit - 1) or values[i]:
+                    return False # two hidden singles in the same cell
+                if (rows[CELL_ROW[i]] | cols[CELL_COL[i]] | boxes[CELL_BOX[i]]) & bit:
+                    return False # placed meanwhile in this pass
+                _place(values, rows, cols, boxes, i, bit)
+                changed = True
+
+    return True
+
+
+def _search(values, rows, cols, boxes) -> List[int]:
+    if not _propagate(values, rows, cols, boxes):
+        return None
+
+    # MRV: branch on the empty cell with fewer candidates
+    best, best_cand, best_count = None, 0, 10
+    for i in range(81):
+        if values[i]:
+            continue
+        cand = ALL_DIGITS & ~(rows[CELL_ROW[i]] | cols[CELL_COL[i]] | boxes[CELL_BOX[i]])
+        count = bin(cand).count("1")
+        if count < best_count:
+            best, best_cand, best_count = i, cand, count
+            if count == 2:
+                break
+
+    if best is None:
+        return values # solved
+
+    while best_cand:
+        bit = best_cand & -best_cand
+        best_cand ^= bit
+
+        branch_values, branch_rows, branch_cols, branch_boxes = values.copy(), rows.copy(), cols.copy(), boxes.copy()
+        _place(branch_values, branch_rows, branch_cols, branch_boxes, best, bit)
+        solved = _search(branch_values, branch_rows, branch_cols, branch_boxes)
+        if solved is not None:
+            return solved
+
+    return None
+
+
+ENGINES: Dict[str, SudokuEngine] = {
+    ReferenceEngine.name: ReferenceEngine,
+    PropagationEngine.name: PropagationEngine,
+    OdometerEngine.name: OdometerEngine,
+    VectorizedEngine.name: VectorizedEngine,
+}
+
+def get_engine(name: str, **options) -> SudokuEngine:
+    """Create a solver engine from its name (options are the engine parameters, e.g. block_size)."""
+    engine = ENGINES.get(name)
+    if engine is None:
+        raise ValueError(f"Unknown solver engine '{name}' (available: {', '.join(ENGINES)}).")
+    return engine(**options)
@@ -0,0 +1,72 @@
+from functools import lru_cache
+from typing import List
+from src.sudoku_space import clue_digits
+
+# Pre-filters of the candidates of a job: every filled grid produced by an
+# engine goes through the node pre-filter before the (throttled) official
+# check, so the combinations that are obviously not a solution do not pay
+# the throttle. A pre-filter never rejects a valid solution.
+
+class SudokuFilter:
+    """Accept every candidate (every combination is checked by the official algorithm)."""
+    name = "none"
+
+    def __init__(self, grid):
+        self.grid = grid
+
+    def accepts(self, sudoku) -> bool:
+        return True
+
+
+class CluesFilter(SudokuFilter):
+    """Reject candidates with empty cells or with digits already used by the clues of the row, column or box."""
+    name = "clues"
+
+    def __init__(self, grid):
+        super().__init__(grid)
+        # allowed digits of each empty cell
+        self.cells: List[tuple] = [
+            (r, c, frozenset(range(1, 10)) - clue_digits(grid, r, c)) for r in range(9) for c in range(9) if grid[r][c] == 0
+        ]
+
+    def accepts(self, sudoku) -> bool:
+        for r, c, allowed in self.cells:
+            if sudoku[r][c] not in allowed:
+                return False
+        return True
+
+
+class UnitsFilter(CluesFilter):
+    """Also reject candidates with repeated digits in a row, column or box (only solutions are checked)."""
+    name = "units"
+
+    def accepts(self, sudoku) -> bool:
+        if not super().accepts(sudoku):
+            return False
+
+        for i in range(9):
+            if len(set(sudoku[i])) != 9:
+                return False
+            if len({sudoku[r][i] for r in range(9)}) != 9:
+                return False
+            box_row, box_col = 3 * (i // 3), 3 * (i % 3)
+            if len({sudoku[box_row + r][box_col + c] for r in range(3) for c in range(3)}) != 9:
+                return False
+        return True
+
+
+FILTERS = {
+    SudokuFilter.name: SudokuFilter,
+    CluesFilter.name: CluesFilter,
+    UnitsFilter.name: UnitsFilter,
+}
+
+@lru_cache(maxsize=16)
+def _get_filter(name: str, grid: tuple) -> SudokuFilter:
+    return FILTERS[name]([list(row) for row in grid])
+
+def get_filter(name: str, grid) -> SudokuFilter:
+    """Get the pre-filter of a sudoku (the last ones are cached, every task of a sudoku uses the same)."""
+    if name not in FILTERS:
+        raise ValueError(f"Unknown pre-filter '{name}' (available: {', '.join(FILTERS)}).")
+    return _get_filter(name, tuple(tuple(row) for row in grid))
@@ -1,71 +1,78 @@
 from src.sudoku_algorithm import SudokuAlgorithm
+from src.sudoku_engine import SudokuEngine, ReferenceEngine
+from src.sudoku_space import SearchSpace, get_space
+from src.sudoku_filter import SudokuFilter, get_filter
+import time
 from threading import Thread
 
-class Found(Exception): pass # Exception to stop the loop
-
 class SudokuJob:
-    def __init__(self, sudoku, start, end, solverConfig):
+    def __init__(self, sudoku, start, end, solverConfig, engine: SudokuEngine = None, space: str = "digits", stop_event=None, stop_interval: int = 1000, prefilter: str = "none"):
         self.solverConfig = solverConfig
+        self.engine = engine if engine is not None else ReferenceEngine()
+        self.space_name = space
+        self.space: SearchSpace = None # how combinations are decoded (built when the job starts)
+        self.prefilter_name = prefilter
+        self.prefilter: SudokuFilter = None # candidates rejected before the official check (built when the job starts)
+
+        # the engine stops (without solution) when the event is set, checked every `stop_interval` combinations
+        self.stop_event = stop_event
+        self.stop_interval = stop_interval
 
         self.grid = sudoku
         self.start = start
         self.end = end
         self.solution = None
 
+        # combinations [start, progress) already examined (validations done, even if stopped)
+        self.progress = start
+        self.stopped = False
+        self.checks = 0 # candidates checked by the (throttled) official algorithm
+        self.received_time = time.time() # the reply reports the time spent in this node (queued and solving)
+
     def run(self, locker, queue, task_id, host_port):
-        
+
         thread = Thread(target=self.solve_locking, args=(locker, queue, task_id, host_port))
         thread.daemon = True
         thread.start()
 
     def solve_locking(self, locker=None, queue=None, task_id=None, host_port=None):
         with locker:
-            # 1. Fill the sudoku with the combinations from start to end
             try:
-                for comb in range(self.start, self.end):
-                    sudoku = self.grid.copy()
-                    fill_comb = comb
-                    for i in reversed(range(0, 9)):
-                        sudoku[i] = self.grid[i].copy() # copy() is a shallow copy!
-                        for j in reversed(range(0, 9)):
-                            if sudoku[i][j] == 0:
-                                sudoku[i][j] = fill_comb % (10)
-                                fill_comb = fill_comb // 10
+                self.solve()
+                # If solution is found, put it in the queue
+                solution = self.solution if self.solution is not None else "INVALID"
+            except Exception as e: # e.g. an unknown space or pre-filter
+                if self.solverConfig.logger is not None:
+                    self.solverConfig.logger.error(f"Task {task_id} failed: {e}")
+                solution, self.progress, self.checks = "FAILED", self.start, 0 # not INVALID: the range must be searched again
 
-                        # 2. Check if the sudoku is valid. If yes, raise Found             
-                        if self.solverConfig.checkWithParams(sudoku):
-                            self.solution = sudoku
-                            raise Found
-            except Found: pass
-            # 3. If solution is found, put it in the queue
-
-            solution = self.solution if self.solution is not None else "INVALID"
-            queue.put({"solution": solution, "task_id": task_id, "replyAddress": host_port})
+            queue.put({"solution": solution, "task_id": task_id, "replyAddress": host_port, "validations": self.validations(), "checks": self.checks, "elapsed": time.time() - self.received_time})
 
     def solve(self):
-        # 1. Fill the sudoku with the combinations from start to end
-        try:
-            for comb in range(self.start, self.end):
-                sudoku = self.grid.copy()
-                fill_comb = comb
-                for i in reversed(range(0, 9)):
-                    sudoku[i] = self.grid[i].copy() # copy() is a shallow copy!
-                    for j in reversed(range(0, 9)):
-                        if sudoku[i][j] == 0:
-                            sudoku[i][j] = fill_comb % (10)
-                            fill_comb = fill_comb // 10
-
-                    # 2. Check if the sudoku is valid. If yes, raise Found             
-                    if self.solverConfig.checkWithParams(sudoku):
-                        self.solution = sudoku
-                        raise Found
-        except Found: pass
-        # 3. If solution is found, return True
-
-        return self.solution        
+        self.space = get_space(self.space_name, self.grid)
+        self.prefilter = get_filter(self.prefilter_name, self.grid)
 
+        # Search the range [start, end) with the node engine
+        self.progress = self.start
+        self.solution = self.engine.solve(self)
+        if not self.stopped:
+            self.progress = self.end # the whole range was covered (or the solution was found)
 
+        return self.solution
 
+    def is_stopped(self, progress: int) -> bool:
+        """Check if the job was asked to stop, combinations before `progress` are already examined."""
+        self.progress = progress
+        self.stopped = self.stop_event is not None and self.stop_event.is_set()
+        return self.stopped
 
+    def validations(self) -> int:
+        """Number of combinations covered by the job."""
+        return self.progress - self.start
 
-        
\ No newline at end of file
+    def check(self, sudoku) -> bool:
+        """Check a filled grid: the pre-filter first, then the (throttled) official algorithm."""
+        if not self.prefilter.accepts(sudoku):
+            return False
+        self.checks += 1
+        return self.solverConfig.checkWithParams(sudoku)
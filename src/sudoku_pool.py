@@ -0,0 +1,137 @@
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor
+from threading import Lock
+from src.sudoku_algorithm import SudokuAlgorithm
+from src.sudoku_engine import SudokuEngine
+from src.sudoku_job import SudokuJob
+
+# Stop flags shared by the processes (one slot per running job)
+MAX_RUNNING_JOBS = 1024
+
+# Process globals (set by the pool initializer)
+_solverConfig: SudokuAlgorithm = None
+_engine: SudokuEngine = None
+_stop_flags = None
+_prefilter: str = "none"
+
+
+class StopFlag:
+    """Event-like view of a shared stop flag slot."""
+
+    def __init__(self, slot: int):
+        self.slot = slot
+
+    def is_set(self) -> bool:
+        return self.slot is not None and _stop_flags[self.slot] == 1
+
+
+def _init_process(handicap, engine, stop_flags, prefilter):
+    global _solverConfig, _engine, _stop_flags, _prefilter
+    _solverConfig = SudokuAlgorithm(handicap=handicap) # each process has its own throttle
+    _engine = engine
+    _stop_flags = stop_flags
+    _prefilter = prefilter
+
+
+def _solve_range(sudoku, start, end, space, slot):
+    """Solve a sub-range inside a worker process."""
+    sudoku_job = SudokuJob(sudoku, start, end, _solverConfig, _engine, space, StopFlag(slot), prefilter=_prefilter)
+    solution = sudoku_job.solve()
+    return solution, sudoku_job.validations(), sudoku_job.checks
+
+
+class PooledJob:
+    """Sub-ranges of a SudokuJob running in the pool, merged into one reply."""
+
+    def __init__(self, pool, queue, task_id, host_port, slot, parts, size):
+        self.pool = pool
+        self.queue = queue
+        self.task_id = task_id
+        self.host_port = host_port
+        self.slot = slot
+
+        self.remaining = parts
+        self.size = size # combinations of the whole range
+        self.solution = None
+        self.failed = False # a sub-range raised: its part of the range was not searched
+        self.validations = 0
+        self.checks = 0
+        self.received_time = time.time()
+        self.locker = Lock()
+
+    def set(self):
+        """Stop every sub-range of the job (cancellation)."""
+        with self.locker:
+            if self.slot is not None and self.remaining > 0:
+                self.pool.stop_flags[self.slot] = 1
+
+
+class SudokuJobPool:
+    """Per-node pool of processes: each SudokuJob range is split across the cores."""
+
+    def __init__(self, logger, cores: int, handicap: float, engine: SudokuEngine, prefilter: str = "none"):
+        self.logger = logger
+        self.cores = cores
+
+        context = multiprocessing.get_context("spawn") # the node has running threads, do not fork them
+        self.stop_flags = context.RawArray('b', MAX_RUNNING_JOBS)
+        self.free_slots = list(range(MAX_RUNNING_JOBS))
+        self.slots_locker = Lock()
+
+        self.executor = ProcessPoolExecutor(max_workers=cores, mp_context=context, initializer=_init_process, initargs=(handicap, engine, self.stop_flags, prefilter))
+
+    def run(self, sudoku_job: SudokuJob, queue, task_id, host_port) -> PooledJob:
+        """Split the job range across the cores, the merged reply is put in the queue.
+        Returns the pooled job (its set() stops the job)."""
+        start, end = sudoku_job.start, sudoku_job.end
+        parts = max(1, min(self.cores, end - start))
+        part_size = (end - start) // parts
+
+        with self.slots_locker:
+            slot = self.free_slots.pop() if self.free_slots else None # without a slot siblings are not stopped
+        if slot is not None:
+            self.stop_flags[slot] = 0
+
+        pooled_job = PooledJob(self, queue, task_id, host_port, slot, parts, end - start)
+        for part in range(parts):
+            part_start = start + part * part_size
+            part_end = end if part == parts - 1 else part_start + part_size
+
+            future = self.executor.submit(_solve_range, sudoku_job.grid, part_start, part_end, sudoku_job.space_name, slot)
+            future.add_done_callback(lambda future: self._part_done(pooled_job, future))
+
+        return pooled_job
+
+    def _part_done(self, pooled_job: PooledJob, future):
+        """Merge a sub-range result (runs in the executor thread)."""
+        failed = False
+        try:
+            solution, validations, checks = future.result()
+        except Exception as e:
+            self.logger.error(f"Task {pooled_job.task_id} failed in the pool: {e}")
+            solution, validations, checks, failed = None, 0, 0, True
+
+        with pooled_job.locker:
+            pooled_job.remaining -= 1
+            pooled_job.failed |= failed
+            pooled_job.validations += validations
+            pooled_job.checks += checks
+            if solution is not None and pooled_job.solution is None:
+                pooled_job.solution = solution
+                if pooled_job.slot is not None:
+                    self.stop_flags[pooled_job.slot] = 1 # stop the sibling sub-ranges
+            if pooled_job.remaining > 0:
+                return
+
+        if pooled_job.slot is not None:
+            with self.slots_locker:
+                self.free_slots.append(pooled_job.slot)
+
+        if pooled_job.solution is not None:
+            solution, validations = pooled_job.solution, pooled_job.size # as a single job, the solution covers the range
+        elif pooled_job.failed:
+            solution, validations = "FAILED", 0 # not INVALID: the range must be searched again
+        else:
+            solution, validations = "INVALID", pooled_job.validations
+        pooled_job.queue.put({"solution": solution, "task_id": pooled_job.task_id, "replyAddress": pooled_job.host_port, "validations": validations, "checks": pooled_job.checks, "elapsed": time.time() - pooled_job.received_time})
@@ -0,0 +1,128 @@
+from functools import lru_cache
+from itertools import permutations
+from typing import Dict, List, Tuple
+
+# Search spaces of a sudoku: a TaskID range [start, end) is a range of integers
+# (combinations) and a search space maps each combination to a filled grid.
+#
+# Every space is a mixed-radix number system: the empty cells are grouped in
+# positions (the first position is the most significant digit), and each
+# position has a list of options (the values written in its cells).
+
+class SearchSpace:
+    """Mixed-radix search space of a sudoku."""
+    name = None
+
+    def __init__(self, grid):
+        self.grid = grid
+        self.positions: List[Tuple[int, ...]] = []        # cells (row * 9 + col) of each position
+        self.options: List[List[Tuple[int, ...]]] = []    # values of each option of each position
+        self.start = 0
+        self.end = 0
+
+    def _build(self):
+        """Compute the radixes and the range of the space."""
+        self.radixes = [len(options) for options in self.options]
+        self.option_index: List[Dict[Tuple[int, ...], int]] = [
+            {option: index for index, option in enumerate(options)} for options in self.options
+        ]
+        self.size = 1
+        for radix in self.radixes:
+            self.size *= radix
+        self.end = self.start + self.size
+
+    def empty_cells(self) -> List[int]:
+        return [r * 9 + c for r in range(9) for c in range(9) if self.grid[r][c] == 0]
+
+    def decode(self, comb: int) -> List[List[int]]:
+        """Fill the grid with the combination."""
+        sudoku = [row.copy() for row in self.grid]
+        for cells, options, radix in zip(reversed(self.positions), reversed(self.options), reversed(self.radixes)):
+            comb, index = divmod(comb, radix)
+            for cell, value in zip(cells, options[index]):
+                sudoku[cell // 9][cell % 9] = value
+        return sudoku
+
+    def encode(self, values) -> int:
+        """Combination of a filled grid (81 values in row-major order), None if it is out of the space."""
+        comb = 0
+        for cells, option_index, radix in zip(self.positions, self.option_index, self.radixes):
+            index = option_index.get(tuple(values[cell] for cell in cells))
+            if index is None:
+                return None
+            comb = comb * radix + index
+        return comb
+
+
+class DigitSpace(SearchSpace):
+    """Every base-10 digit string of the empty cells (the original enumeration)."""
+    name = "digits"
+
+    def __init__(self, grid):
+        super().__init__(grid)
+        cells = self.empty_cells()
+        self.positions = [(cell,) for cell in cells]
+        self.options = [[(digit,) for digit in range(10)] for _ in cells]
+        self._build()
+        if cells:
+            self.start = int(len(cells) * '1')
+
+
+class CandidateSpace(SearchSpace):
+    """Only the candidate digits of each empty cell (digits not used by the clues of its row, column and box)."""
+    name = "candidates"
+
+    def __init__(self, grid):
+        super().__init__(grid)
+        for cell in self.empty_cells():
+            used = clue_digits(grid, cell // 9, cell % 9)
+            self.positions.append((cell,))
+            self.options.append([(digit,) for digit in range(1, 10) if digit not in used])
+        self._build()
+
+
+class PermutationSpace(SearchSpace):
+    """Only the permutations of the missing digits of each row compatible with the column and box clues."""
+    name = "permutations"
+
+    def __init__(self, grid):
+        super().__init__(grid)
+        for r in range(9):
+            cells = tuple(r * 9 + c for c in range(9) if grid[r][c] == 0)
+            if not cells:
+                continue
+            missing = [digit for digit in range(1, 10) if digit not in grid[r]]
+            candidates = [clue_digits(grid, r, cell % 9) for cell in cells]
+            self.positions.append(cells)
+            self.options.append([
+                option for option in permutations(missing, len(cells))
+                if all(value not in used for value, used in zip(option, candidates))
+            ])
+        self._build()
+
+
+def clue_digits(grid, row, col) -> set:
+    """Digits of the clues in the row, column and box of a cell."""
+    box_row, box_col = 3 * (row // 3), 3 * (col // 3)
+    used = set(grid[row])
+    used.update(grid[i][col] for i in range(9))
+    used.update(grid[box_row + i][box_col + j] for i in range(3) for j in range(3))
+    used.discard(0)
+    return used
+
+
+SPACES = {
+    DigitSpace.name: DigitSpace,
+    CandidateSpace.name: CandidateSpace,
+    PermutationSpace.name: PermutationSpace,
+}
+
+@lru_cache(maxsize=16)
+def _get_space(name: str, grid: tuple) -> SearchSpace:
+    return SPACES[name]([list(row) for row in grid])
+
+def get_space(name: str, grid) -> SearchSpace:
+    """Get the search space of a sudoku (the last ones are cached, every task of a sudoku uses the same)."""
+    if name not in SPACES:
+        raise ValueError(f"Unknown search space '{name}' (available: {', '.join(SPACES)}).")
+    return _get_space(name, tuple(tuple(row) for row in grid))
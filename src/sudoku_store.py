@@ -0,0 +1,98 @@
+import os
+import struct
+import zlib
+from threading import Lock
+from typing import Dict, List, Tuple
+
+# Append-only log of solved (and proven unsolvable) puzzles.
+#
+# File: HEADER + records. Record (fixed size):
+#   kind (1 byte: 1 solved, 0 no solution) | puzzle (81 bytes, one digit per byte)
+#   | solution (81 bytes, zeros if no solution) | crc32 of the previous bytes (4 bytes)
+#
+# A crash in the middle of an append leaves a short or corrupted last record:
+# it fails the size/crc check when loading and the file is truncated there.
+
+HEADER = b"SDKS\x01" # magic + version
+RECORD = struct.Struct(">B81s81sI")
+SOLVED, NO_SOLUTION = 1, 0
+
+
+class SudokuStore:
+    """Persistent puzzle -> solution store (puzzles are the canonical keys of the cache)."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.index: Dict[bytes, bytes] = None # puzzle -> solution (None if no solution), loaded on first use
+        self.locker = Lock()
+        self.pending: List[bytes] = [] # records not yet written (see flush)
+        self.writer = Lock() # appends in order, without holding the locker during the fsync
+
+        # create the file, records are only read on the first lookup
+        with open(self.path, "ab") as file:
+            if file.tell() == 0:
+                file.write(HEADER)
+                file.flush()
+                os.fsync(file.fileno())
+
+    def _load(self):
+        """Read every valid record (and cut a torn tail)."""
+        self.index = {}
+        with open(self.path, "rb") as file:
+            data = file.read()
+
+        if not data.startswith(HEADER):
+            raise ValueError(f"{self.path} is not a sudoku store.")
+
+        offset = len(HEADER)
+        while offset + RECORD.size <= len(data):
+            kind, puzzle, solution, crc = RECORD.unpack_from(data, offset)
+            if zlib.crc32(data[offset:offset + RECORD.size - 4]) != crc:
+                break
+            self.index[puzzle] = solution if kind == SOLVED else None
+            offset += RECORD.size
+
+        if offset != len(data):
+            with open(self.path, "r+b") as file:
+                file.truncate(offset) # next appends start after the last valid record
+
+    def get(self, key: Tuple[int, ...]) -> Tuple[bool, Tuple[int, ...]]:
+        """Look up a puzzle (81 values). Returns (hit, solution as 81 values or None)."""
+        with self.locker:
+            if self.index is None:
+                self._load()
+            puzzle = bytes(key)
+            if puzzle not in self.index:
+                return False, None
+            solution = self.index[puzzle]
+        return True, tuple(solution) if solution is not None else None
+
+    def put(self, key: Tuple[int, ...], solution: Tuple[int, ...]):
+        """Add a result (puzzles already stored are skipped), written to the file by the next flush."""
+        with self.locker:
+            if self.index is None:
+                self._load()
+            puzzle = bytes(key)
+            if puzzle in self.index:
+                return
+
+            kind = SOLVED if solution is not None else NO_SOLUTION
+            solution = bytes(solution) if solution is not None else bytes(81)
+            record = RECORD.pack(kind, puzzle, solution, 0)
+            record = record[:-4] + struct.pack(">I", zlib.crc32(record[:-4]))
+
+            self.pending.append(record)
+            self.index[puzzle] = solution if kind == SOLVED else None
+
+    def flush(self):
+        """Append the pending records (one write and one fsync for all of them)."""
+        with self.writer:
+            with self.locker:
+                records, self.pending = self.pending, []
+            if not records:
+                return
+
+            with open(self.path, "ab") as file:
+                file.write(b"".join(records))
+                file.flush()
+                os.fsync(file.fileno())